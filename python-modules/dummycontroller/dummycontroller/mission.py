@@ -50,6 +50,8 @@ class MissionController(K8sCRHandler):
         self._active_mission: Dict[str, Dict] = {}
         self._missions: TOrderedDict[str, Dict] = OrderedDict()
         self._missions_lock = threading.RLock()
+        # Seconds between two mission state requests to the robot
+        self.mission_state_interval = 2.0
 
         # Init CR superclass
         labels = {}
@@ -399,7 +401,7 @@ class MissionController(K8sCRHandler):
 
         # Wait until movement was successfull or failed
         while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
-            time.sleep(2.0)
+            time.sleep(self.mission_state_interval)
             try:
                 state_resp = self._dummy_robot.get_mission_state(mission_queue_id)
             except RequestException:
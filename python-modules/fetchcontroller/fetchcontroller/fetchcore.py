@@ -16,9 +16,11 @@ import os
 import logging
 import json
 import time
+import hashlib
 import threading
 
-from typing import Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import requests
 
@@ -50,6 +52,11 @@ def identify_requests_exception(exception: BaseException) -> bool:
 class FetchInterface:
     """Interface class to FetchCore."""
 
+    # Number of list entries per page when streaming list endpoints
+    PAGE_SIZE = 100
+    # Seconds to wait for connect and for the response of one page
+    PAGE_TIMEOUT = (5.0, 30.0)
+
     def __init__(self) -> None:
         """Construct."""
         self.init_fetchcore_fromenv()
@@ -57,6 +64,9 @@ class FetchInterface:
         self._bearer_expires = time.time()
         self._auth_error = False
         self.refresh_bearer_thread = threading.Thread(target=self._refresh_bearer, daemon=True)
+        # Workers requesting the next page while the current one is processed
+        self._prefetch_executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix='fetch_prefetch')
 
     def init_fetchcore_fromenv(self) -> None:
         """Initialize FetchCore from environment variables."""
@@ -123,10 +133,10 @@ class FetchInterface:
 
     @retry(retry_on_exception=identify_requests_exception, wait_fixed=1000,
            stop_max_attempt_number=5)
-    def http_get(self, endpoint: str) -> Dict:
+    def http_get(self, endpoint: str, page_size: int = 999999) -> Dict:
         """Perform a HTTP GET request to the given FetchCore endpoint."""
         headers = {'Authorization': 'Bearer {}'.format(self._bearer)}
-        params = {'page_size': 999999}
+        params = {'page_size': page_size}
         url = 'https://{}{}'.format(self._fetchcore_host, endpoint)
         resp = requests.get(url, params=params, headers=headers)
         if resp.status_code == 200:
@@ -141,6 +151,81 @@ class FetchInterface:
             _LOGGER.error('%s error calling %s', resp.status_code, url)
             raise HTTPstatusCodeFailed
 
+    def http_get_pages(
+            self, endpoint: str, versions: Optional[List[str]] = None,
+            page_size: Optional[int] = None) -> Iterator[Tuple[Optional[Dict], str]]:
+        """
+        Get a FetchCore list endpoint page by page.
+
+        Yields the content of each page and its version. The next page is requested while the
+        current one is processed. Versions are the ones yielded by a previous call, one per page.
+        They are the ETag of a page or a hash of its content if FetchCore does not send an ETag.
+        If a page did not change since that version, None is yielded instead of its content.
+        """
+        cls = self.__class__
+        if page_size is None:
+            page_size = cls.PAGE_SIZE
+        if versions is None:
+            versions = []
+
+        def request_page(page: int) -> Future:
+            version = versions[page - 1] if page <= len(versions) else None
+            return self._prefetch_executor.submit(
+                self._http_get_page, endpoint, page, page_size, version)
+
+        page = 1
+        next_page: Optional[Future] = request_page(page)
+        while next_page is not None:
+            content, version = next_page.result()
+            if content is None:
+                # Page is unchanged, thus the number of entries and pages is unchanged too
+                has_next = page < len(versions)
+            else:
+                has_next = bool(content.get('next'))
+            next_page = None
+            if has_next:
+                page += 1
+                next_page = request_page(page)
+            yield content, version
+
+    def http_get_results(self, endpoint: str, page_size: Optional[int] = None) -> Iterator[Dict]:
+        """Get the results of a FetchCore list endpoint one by one, requesting page by page."""
+        for content, _ in self.http_get_pages(endpoint, page_size=page_size):
+            if content is not None:
+                yield from content.get('results', [])
+
+    @retry(retry_on_exception=identify_requests_exception, wait_fixed=1000,
+           stop_max_attempt_number=5)
+    def _http_get_page(
+            self, endpoint: str, page: int, page_size: int,
+            version: Optional[str] = None) -> Tuple[Optional[Dict], str]:
+        """Perform a HTTP GET request of one page if it changed since the given version."""
+        cls = self.__class__
+        headers = {'Authorization': 'Bearer {}'.format(self._bearer)}
+        if version and not version.startswith('sha1:'):
+            headers['If-None-Match'] = version
+        params = {'page': page, 'page_size': page_size}
+        url = 'https://{}{}'.format(self._fetchcore_host, endpoint)
+        resp = requests.get(url, params=params, headers=headers, timeout=cls.PAGE_TIMEOUT)
+        if resp.status_code == 304:
+            return None, str(version)
+        elif resp.status_code == 200:
+            etag = resp.headers.get('ETag')
+            new_version = etag if etag else 'sha1:{}'.format(
+                hashlib.sha1(resp.content).hexdigest())
+            if new_version == version:
+                return None, new_version
+            return json.loads(resp.text), new_version
+        elif resp.status_code == 401:
+            _LOGGER.error('401 error calling %s', url)
+            self._auth_error = True
+            raise HTTPAuthError
+        elif resp.status_code == 404:
+            raise HTTPstatusNotFound
+        else:
+            _LOGGER.error('%s error calling %s', resp.status_code, url)
+            raise HTTPstatusCodeFailed
+
     @retry(retry_on_exception=identify_requests_exception, wait_fixed=1000,
            stop_max_attempt_number=5)
     def http_patch(self, endpoint: str, body: Dict) -> Dict:
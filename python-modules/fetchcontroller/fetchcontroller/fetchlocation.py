@@ -14,7 +14,7 @@
 
 import logging
 
-from typing import Dict
+from typing import Dict, List, Set
 
 import attr
 
@@ -48,7 +48,12 @@ class FetchMap:
         self.map_id = map_id
         self.name = ''
         self._fetch_api = fetch_api
+        # Poses by name and by ID
         self._poses: Dict[str, FetchPose] = {}
+        self._poses_by_id: Dict[int, FetchPose] = {}
+        # Version and pose IDs of each page of poses from last update
+        self._poses_versions: List[str] = []
+        self._page_pose_ids: List[Set[int]] = []
 
     @property
     def poses(self) -> Dict:
@@ -64,6 +69,15 @@ class FetchMap:
 
         return pose
 
+    def get_pose_by_id(self, pose_id: int) -> FetchPose:
+        """Get instance of one pose by its ID."""
+        try:
+            pose = self._poses_by_id[pose_id]
+        except KeyError:
+            raise ValueError('Pose ID {} is unknown on map {}'.format(pose_id, self.name))
+
+        return pose
+
     def update_map(self) -> None:
         """Update map data."""
         # Call FetchcCore API
@@ -78,19 +92,54 @@ class FetchMap:
             self.name = fetch_map['name']
 
     def update_poses(self) -> None:
-        """Update poses of this map."""
+        """Update poses of this map if they changed in FetchCore."""
         # Call FetchcCore API
         endpoint = '/api/v1/maps/{}/annotations/poses/'.format(self.map_id)
+        versions: List[str] = []
+        page_pose_ids: List[Set[int]] = []
+        changed = False
         try:
-            fetch_poses = self._fetch_api.http_get(endpoint)
+            for i, (fetch_poses, version) in enumerate(
+                    self._fetch_api.http_get_pages(endpoint, self._poses_versions)):
+                versions.append(version)
+                if fetch_poses is None:
+                    page_pose_ids.append(self._page_pose_ids[i])
+                else:
+                    changed = True
+                    page_pose_ids.append(self._apply_poses(fetch_poses['results']))
         except HTTPstatusNotFound:
             _LOGGER.error('Map ID %s not found in FetchCore', self.map_id)
         except RequestException as err:
             _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
         else:
-            poses = {}
-            for result in fetch_poses['results']:
-                pose = FetchPose(
-                    result['name'], result['id'], result['x'], result['y'], result['theta'])
-                poses[pose.name] = pose
-            self._poses = poses
+            if changed or len(versions) != len(self._poses_versions):
+                self._remove_poses(set().union(*page_pose_ids))
+            self._poses_versions = versions
+            self._page_pose_ids = page_pose_ids
+
+    def _apply_poses(self, results: List[Dict]) -> Set[int]:
+        """Apply changed and new poses to the pose indexes and return their IDs."""
+        pose_ids: Set[int] = set()
+        for result in results:
+            pose_id = result['id']
+            pose_ids.add(pose_id)
+            pose = self._poses_by_id.get(pose_id)
+            if (pose is not None and pose.name == result['name'] and pose.x == result['x']
+                    and pose.y == result['y'] and pose.theta == result['theta']):
+                continue
+            # Poses are replaced instead of changed, readers never see a half updated pose
+            new_pose = FetchPose(
+                result['name'], pose_id, result['x'], result['y'], result['theta'])
+            if pose is not None and self._poses.get(pose.name) is pose:
+                del self._poses[pose.name]
+            self._poses_by_id[pose_id] = new_pose
+            self._poses[new_pose.name] = new_pose
+
+        return pose_ids
+
+    def _remove_poses(self, seen: Set[int]) -> None:
+        """Remove poses which are not in FetchCore anymore."""
+        for pose_id in set(self._poses_by_id) - seen:
+            pose = self._poses_by_id.pop(pose_id)
+            if self._poses.get(pose.name) is pose:
+                del self._poses[pose.name]
@@ -17,12 +17,14 @@ import threading
 import time
 import math
 
-from typing import Dict, List, Set, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Set, Optional
 from requests import RequestException
 from prometheus_client import Gauge, Histogram
 
 from .fetchcore import FetchInterface, HTTPstatusNotFound
 from .fetchlocation import FetchMap
+from .metrics import GaugeSnapshot, LabeledChildren
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -96,6 +98,15 @@ class FetchRobot:
         self.active_map: Optional[str] = None
         self.fetch_map: Optional[FetchMap] = None
         self.installed_actions: List[str] = []
+        # Prometheus metrics of this robot
+        cls = self.__class__
+        self._p_gauges = GaugeSnapshot({
+            'battery_percentage': cls.p_battery_percentage,
+            'position_x': cls.p_position_x,
+            'position_y': cls.p_position_y,
+            'orientation': cls.p_orientation,
+            'theta': cls.p_theta}, robot=self.name)
+        self._p_state = LabeledChildren(cls.p_state, robot=self.name)
 
     def cancel_task(self, task_id: int) -> bool:
         """Cancel a task."""
@@ -424,9 +435,8 @@ class FetchRobot:
             self.state = RobcoRobotStates.STATE_UNDEFINED
 
         if self.state != state_old:
-            self.p_state.labels(  # pylint: disable=no-member
-                robot=self.name, state=state_old).observe(
-                    time.time() - self.last_state_change_ts)
+            self._p_state.labels(state=state_old).observe(
+                time.time() - self.last_state_change_ts)
             self.last_state_change_ts = time.time()
 
     def update_trolley_attached(self, robots: Dict) -> None:
@@ -487,26 +497,213 @@ class FetchRobot:
         self.pos_orientation = math.degrees(self.pos_theta)
 
         # Update prometheus metrics
-        self.p_battery_percentage.labels(  # pylint: disable=no-member
-            robot=self.name).set(self.battery_percentage)
-        self.p_position_x.labels(  # pylint: disable=no-member
-            robot=self.name).set(self.pos_x)
-        self.p_position_y.labels(  # pylint: disable=no-member
-            robot=self.name).set(self.pos_y)
-        self.p_orientation.labels(  # pylint: disable=no-member
-            robot=self.name).set(self.pos_orientation)
-        self.p_theta.labels(  # pylint: disable=no-member
-            robot=self.name).set(self.pos_theta)
+        self._p_gauges.update(
+            battery_percentage=self.battery_percentage,
+            position_x=self.pos_x,
+            position_y=self.pos_y,
+            orientation=self.pos_orientation,
+            theta=self.pos_theta)
+
+
+class TaskStatusPoller:
+    """
+    Poll status of all active FetchCore tasks with one list request per cycle.
+
+    Mission threads register their task and wait until its status changes. A poller thread
+    requests all registered tasks at once and wakes up the waiting threads. Tasks which are
+    not in the list response are requested one by one.
+
+    The list request filters tasks with the id__in query parameter. If FetchCore ignores it
+    and returns tasks which were not requested, the poller falls back to request each task
+    one by one.
+    """
+
+    POLL_INTERVAL = 0.5
+    # Seconds a waiting thread is blocked at most without a status change
+    WAIT_TIMEOUT = 10.0
+
+    def __init__(self, fetch_api: FetchInterface) -> None:
+        """Construct."""
+        self._fetch_api = fetch_api
+        # Task ID -> name of robot executing the task
+        self._tasks: Dict[int, str] = {}
+        # Task ID -> last known RobCo mission state
+        self._statuses: Dict[int, str] = {}
+        # Task ID -> time when a thread waited for the task the last time
+        self._last_wait: Dict[int, float] = {}
+        self._cycle = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # Filter list requests by task ID until FetchCore returns tasks which were not requested
+        self._id_filter = True
+        # Statistics
+        self.requests = 0
+
+    def _start(self) -> None:
+        """Start poller thread if not running."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._poll_loop, name='task-status-poller', daemon=True)
+            self._thread.start()
+
+    def wait_for_status(self, robot: str, task_id: int, status: str) -> Optional[str]:
+        """
+        Wait for the next status of a task which differs from the given one.
+
+        Returns the latest status when there was no change within WAIT_TIMEOUT and None if the
+        status is unknown. Raises ValueError if task is not a task of the robot.
+        """
+        cls = self.__class__
+        with self._condition:
+            self._tasks[task_id] = robot
+            self._last_wait[task_id] = time.time()
+            self._start()
+            # Wait for at least one new poll cycle
+            cycle = self._cycle
+            self._condition.wait_for(
+                lambda: self._cycle > cycle and self._statuses.get(task_id) != status
+                or self._tasks.get(task_id) != robot, timeout=cls.WAIT_TIMEOUT)
+            if self._tasks.get(task_id) != robot:
+                raise ValueError('Task {} is not a task of robot {}'.format(task_id, robot))
+            new_status = self._statuses.get(task_id)
+            if new_status not in (
+                    None, RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
+                # Task finished, stop polling it
+                self._forget(task_id)
+
+        return new_status
+
+    def _poll_loop(self) -> None:
+        """Poll tasks while there are registered tasks."""
+        cls = self.__class__
+        _LOGGER.info('Task status poller started')
+        try:
+            while True:
+                started = time.time()
+                with self._condition:
+                    # Forget tasks nobody is waiting for anymore
+                    for task_id, last_wait in list(self._last_wait.items()):
+                        if started - last_wait > 2 * cls.WAIT_TIMEOUT:
+                            self._forget(task_id)
+                    if not self._tasks:
+                        self._thread = None
+                        break
+                    tasks = dict(self._tasks)
+                try:
+                    self._poll_cycle(tasks)
+                except Exception as err:  # pylint: disable=broad-except
+                    _LOGGER.error('Error polling status of tasks: %s', err, exc_info=True)
+                time.sleep(max(0.0, started + cls.POLL_INTERVAL - time.time()))
+        finally:
+            # Next waiting thread restarts the poller if it stopped unexpectedly
+            with self._condition:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+        _LOGGER.info('Task status poller stopped')
+
+    def _poll_cycle(self, tasks: Dict[int, str]) -> None:
+        """Poll status of tasks once and wake up waiting threads."""
+        statuses = self._poll(tasks)
+        with self._condition:
+            for task_id, (robot, status) in statuses.items():
+                if robot != tasks[task_id]:
+                    _LOGGER.error('Task %s is not a task of robot %s', task_id, tasks[task_id])
+                    self._forget(task_id)
+                elif status is not None and task_id in self._tasks:
+                    self._statuses[task_id] = status
+            self._cycle += 1
+            self._condition.notify_all()
+
+    def _forget(self, task_id: int) -> None:
+        """Stop polling a task."""
+        self._tasks.pop(task_id, None)
+        self._statuses.pop(task_id, None)
+        self._last_wait.pop(task_id, None)
+
+    def _poll(self, tasks: Dict[int, str]) -> Dict[int, tuple]:
+        """Get robot and status of tasks from FetchCore."""
+        results: Dict[int, tuple] = {}
+        if self._id_filter:
+            results = self._poll_list(tasks)
+
+        # Request tasks missing in list one by one
+        for task_id in tasks:
+            if task_id in results:
+                continue
+            endpoint = '/api/v1/tasks/{}/'.format(task_id)
+            try:
+                self.requests += 1
+                task = self._fetch_api.http_get(endpoint)
+            except HTTPstatusNotFound:
+                _LOGGER.error('Task %s does not exist in FetchCore', task_id)
+            except RequestException as err:
+                _LOGGER.error(
+                    'Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
+            else:
+                results[task_id] = (
+                    task.get('robot'), RobcoMissionStates.FETCH_TO_ROBCO.get(task.get('status')))
+
+        return results
+
+    def _poll_list(self, tasks: Dict[int, str]) -> Dict[int, tuple]:
+        """Get robot and status of tasks from FetchCore with one filtered list request."""
+        results: Dict[int, tuple] = {}
+        endpoint = '/api/v1/tasks/?id__in={}'.format(','.join(str(t) for t in sorted(tasks)))
+        try:
+            self.requests += 1
+            resp = self._fetch_api.http_get(endpoint, page_size=len(tasks))
+        except RequestException as err:
+            _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
+            return results
+        unrequested = False
+        for task in resp.get('results', []):
+            if task.get('id') in tasks:
+                results[task['id']] = (
+                    task.get('robot'), RobcoMissionStates.FETCH_TO_ROBCO.get(task.get('status')))
+            else:
+                unrequested = True
+        if unrequested or resp.get('count', 0) > len(tasks):
+            _LOGGER.warning(
+                'FetchCore does not filter tasks by ID, requesting status of tasks one by one')
+            self._id_filter = False
+
+        return results
 
 
 class FetchRobots:
     """All RobCo relevant FetchCore robots."""
 
+    # Seconds between updates from FetchCore
+    ROBOTS_INTERVAL = 2.0
+    STATES_INTERVAL = 1.0
+    # Maps and their poses change rarely
+    MAPS_INTERVAL = 30.0
+
     def __init__(self, fetch_api: FetchInterface) -> None:
         """Construct."""
+        cls = self.__class__
         self._robots: Dict[str, FetchRobot] = {}
         self._active_maps: Dict[str, FetchMap] = {}
         self._fetch_api = fetch_api
+        # Poller for status of running tasks of all robots
+        self.task_poller = TaskStatusPoller(fetch_api)
+        # Long-lived workers for periodic updates, one per update job
+        self._update_jobs: Dict[str, Callable[[], None]] = {
+            'robots': self.update_robots,
+            'states': self.update_robots_states,
+            'maps': self.update_active_maps}
+        self._update_intervals = {
+            'robots': cls.ROBOTS_INTERVAL,
+            'states': cls.STATES_INTERVAL,
+            'maps': cls.MAPS_INTERVAL}
+        self._update_executor = ThreadPoolExecutor(
+            max_workers=len(self._update_jobs), thread_name_prefix='fetch_update')
+        # Update job -> time when it is due next / future of its last run
+        self._update_due: Dict[str, float] = {}
+        self._update_futures: Dict[str, Future] = {}
+        self._scheduler_wakeup = threading.Event()
+        self._scheduler_thread: Optional[threading.Thread] = None
+        self._scheduler_run = False
 
     @property
     def robots(self) -> Dict:
@@ -547,52 +744,98 @@ class FetchRobots:
             _LOGGER.warning('Robot %s is not in robot list', name)
 
     def update(self) -> None:
-        """Update all robots, their states and maps in parallel."""
-        # Create threads
-        ur_thread = threading.Thread(target=self.update_robots, name='update_robots')
-        urs_thread = threading.Thread(target=self.update_robots_states, name='update_robot_states')
-        uam_thread = threading.Thread(target=self.update_active_maps, name='update_active_maps')
-        # Start threads
-        ur_thread.start()
-        urs_thread.start()
-        uam_thread.start()
-        # Wait for threads to finish
-        ur_thread.join()
-        urs_thread.join()
-        uam_thread.join()
+        """Update all robots, their states and maps in parallel and wait until finished."""
+        futures = [self._update_executor.submit(job) for job in self._update_jobs.values()]
+        wait(futures)
+        for future in futures:
+            future.result()
+
+    def start_updates(self) -> None:
+        """Start updating robots, their states and maps periodically."""
+        if self._scheduler_thread is None:
+            self._scheduler_run = True
+            self._scheduler_thread = threading.Thread(
+                target=self._update_scheduler, name='fetch_update_scheduler', daemon=True)
+            self._scheduler_thread.start()
+
+    def stop_updates(self) -> None:
+        """Stop periodic updates."""
+        self._scheduler_run = False
+        self._scheduler_wakeup.set()
+        if self._scheduler_thread is not None:
+            self._scheduler_thread.join()
+            self._scheduler_thread = None
+        self._update_executor.shutdown(wait=True)
+
+    def schedule_update(self, job: str) -> None:
+        """Run an update job as soon as possible."""
+        self._update_due[job] = 0.0
+        self._scheduler_wakeup.set()
+
+    def _update_scheduler(self) -> None:
+        """Submit update jobs to the workers when they are due."""
+        _LOGGER.info('FetchCore update scheduler started')
+        while self._scheduler_run:
+            self._scheduler_wakeup.clear()
+            now = time.time()
+            next_due = now + max(self._update_intervals.values())
+            for job, func in self._update_jobs.items():
+                due = self._update_due.get(job, 0.0)
+                future = self._update_futures.get(job)
+                if due <= now and (future is None or future.done()):
+                    # Next run relative to the start of this one, skip if still running
+                    due = now + self._update_intervals[job]
+                    self._update_due[job] = due
+                    self._update_futures[job] = self._update_executor.submit(
+                        self._run_update, job, func)
+                next_due = min(next_due, due)
+            self._scheduler_wakeup.wait(max(0.0, next_due - time.time()))
+        _LOGGER.info('FetchCore update scheduler stopped')
+
+    def _run_update(self, job: str, func: Callable[[], None]) -> None:
+        """Run one update job."""
+        try:
+            func()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error('Error in FetchCore %s update: %s', job, err, exc_info=True)
+        finally:
+            # Job might be overdue already
+            self._scheduler_wakeup.set()
 
     def update_robots(self) -> None:
         """Update all robots in list."""
         # Call FetchcCore API
         endpoint = '/api/v1/robots/'
         try:
-            results = self._fetch_api.http_get(endpoint).get('results', [])
-        except RequestException as err:
-            _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
-        else:
-            # Update robots
-            for result in results:
+            # Update robots while streaming them page by page
+            for result in self._fetch_api.http_get_results(endpoint):
                 robot = self._robots.get(result.get('name'))
                 if robot:
                     robot.update_active_map(result)
                     robot.update_robot_state(result)
                     robot.update_trolley_attached(result)
                     robot.update_installed_actions(result)
+        except RequestException as err:
+            _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
+        else:
+            # Load maps and poses for robots on a new map right away
+            for robot in self._robots.values():
+                if robot.active_map and robot.active_map not in self._active_maps:
+                    self.schedule_update('maps')
+                    break
 
     def update_robots_states(self) -> None:
         """Update states of all robots in list."""
         # Call FetchCore API
         endpoint = '/api/v1/robots/states/'
         try:
-            results = self._fetch_api.http_get(endpoint).get('results', [])
-        except RequestException as err:
-            _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
-        else:
-            # Update robots
-            for result in results:
+            # Update robots while streaming their states page by page
+            for result in self._fetch_api.http_get_results(endpoint):
                 robot = self._robots.get(result.get('robot'))
                 if robot:
                     robot.update_status_attributes(result)
+        except RequestException as err:
+            _LOGGER.error('Exception %s when connecting to FetchCore endpoint %s', err, endpoint)
 
     def update_active_maps(self) -> None:
         """Update maps and their poses."""
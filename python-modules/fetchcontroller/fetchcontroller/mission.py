@@ -322,8 +322,7 @@ class MissionController(K8sCRHandler):
 
         # Wait until movement was successfull or failed
         while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
-            time.sleep(0.5)
-            status_new = self._fetch_robots.get_robot(robot).get_task_status(task_id)
+            status_new = self._fetch_robots.task_poller.wait_for_status(robot, task_id, status)
             if status_new:
                 status = status_new
             # Update status CR when status changes to RUNNING
@@ -397,8 +396,7 @@ class MissionController(K8sCRHandler):
 
         # Wait until movement was successfull or failed
         while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
-            time.sleep(0.5)
-            status_new = self._fetch_robots.get_robot(robot).get_task_status(task_id)
+            status_new = self._fetch_robots.task_poller.wait_for_status(robot, task_id, status)
             if status_new:
                 status = status_new
             # Update status CR when status changes to RUNNING
@@ -472,8 +470,7 @@ class MissionController(K8sCRHandler):
 
         # Wait until movement was successfull or failed
         while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
-            time.sleep(0.5)
-            status_new = self._fetch_robots.get_robot(robot).get_task_status(task_id)
+            status_new = self._fetch_robots.task_poller.wait_for_status(robot, task_id, status)
             if status_new:
                 status = status_new
             # Update status CR when status changes to RUNNING
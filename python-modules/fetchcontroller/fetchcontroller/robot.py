@@ -128,7 +128,8 @@ class RobotController(K8sCRHandler):
         self.robottype_controller.run(reprocess, multiple_executor_threads)
         super().run(reprocess, multiple_executor_threads)
 
-        # Start update thread
+        # Start periodic updates from FetchCore and update thread
+        self._fetch_robots.start_updates()
         self.robot_status_update_thread.start()
 
     def stop_watcher(self) -> None:
@@ -136,6 +137,8 @@ class RobotController(K8sCRHandler):
         # Stop robottype and robot watchers
         self.robottype_controller.stop_watcher()
         super().stop_watcher()
+        # Stop periodic updates from FetchCore
+        self._fetch_robots.stop_updates()
 
     def _update_robot_status_loop(self) -> None:
         """Run update robot status continiously."""
@@ -157,8 +160,7 @@ class RobotController(K8sCRHandler):
     def update_robot_status(self) -> None:
         """Continously update status of robot CR."""
         status = deepcopy(self.robot_template_cr)['status']
-        # Get updated robot states from FetchCore
-        self._fetch_robots.update()
+        # Robot states are updated from FetchCore periodically in the background
         # Update robot CR status
         for name, robot in self._fetch_robots.robots.items():
             status['configuration']['trolleyAttached'] = robot.trolley_attached
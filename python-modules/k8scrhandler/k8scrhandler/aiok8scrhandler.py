@@ -0,0 +1,778 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Asyncio K8s custom resource handler."""
+
+import os
+import asyncio
+import logging
+import copy
+import time
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+
+from typing import (
+    DefaultDict, Dict, Callable, Iterable, List, Optional, OrderedDict as TOrderedDict, Set)
+
+from aiohttp import ClientError
+from kubernetes_asyncio import client, config, watch
+from kubernetes_asyncio.client.rest import ApiException
+
+from .helper import get_label_selector
+from .informer import parse_too_old_failure
+from .k8scrhandler import K8sCRHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncK8sCRHandler:
+    """
+    Handle K8s custom resources on an asyncio event loop.
+
+    Provides the API of K8sCRHandler with coroutines for all K8s API calls. Watcher, cache
+    synchronization and CR reprocessing are running as tasks on a single event loop instead of
+    dedicated threads. Callbacks could be coroutine functions, which are awaited on the event
+    loop, or regular functions, which are run in a thread pool of the handler with one worker by
+    default like in K8sCRHandler.
+    """
+
+    VALID_EVENT_TYPES = K8sCRHandler.VALID_EVENT_TYPES
+    REQUEST_TIMEOUT = K8sCRHandler.REQUEST_TIMEOUT
+    ROBOT_LABEL = K8sCRHandler.ROBOT_LABEL
+
+    # Callback registration is the same as in the threaded handler
+    get_callback_dict = staticmethod(K8sCRHandler.get_callback_dict)
+    set_controller_reference = staticmethod(K8sCRHandler.set_controller_reference)
+    register_callback = K8sCRHandler.register_callback
+    unregister_callback = K8sCRHandler.unregister_callback
+
+    def __init__(self,
+                 group: str,
+                 version: str,
+                 plural: str,
+                 namespace: str,
+                 template_cr: Dict,
+                 labels: Dict,
+                 robot_label_selector: bool = False) -> None:
+        """
+        Construct.
+
+        If robot_label_selector is True, only custom resources labeled with the name of a robot
+        which has registered callbacks on this handler are watched.
+        """
+        # K8s APIs are instantiated in connect(), because config is loaded asynchronously
+        self.api_client: Optional[client.ApiClient] = None
+        self.crd_api: Optional[client.ApiextensionsV1Api] = None
+        self.co_api: Optional[client.CustomObjectsApi] = None
+        # Set in connect() depending on status subresource in CRD
+        self.status_update_method: Optional[Callable] = None
+
+        # K8s stream watcher
+        self.watcher = watch.Watch()
+
+        # Configs set to specify which CRs to monitor/control
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.namespace = namespace
+
+        self._base_label_selector = ','.join(
+            '{}={}'.format(k, val) for k, val in sorted(labels.items()))
+        # Set based selector on robot name label
+        self.robot_label_selector = robot_label_selector
+        self._selector_robots: Set[str] = set()
+        self._selector_lock = threading.Lock()
+        self.label_selector = self._get_label_selector()
+        # Robots added to label selector since last list, only their CRs are replayed
+        self._replay_robots: Optional[Set[str]] = None
+
+        # Latest resource version processed by watcher
+        self.resv_watcher = ''
+
+        # CR Cache
+        self._cr_cache: Dict[str, Dict] = {}
+        self._cr_cache_initialized = asyncio.Event()
+
+        # Callback stack for watch on cr
+        self.callbacks: Dict[
+            str, TOrderedDict[str, Callable]] = self.get_callback_dict()
+        self.robot_callbacks: Dict[
+            str, Dict[str, TOrderedDict[str, Callable]]] = {}
+        # Registration might happen from other threads than the one running the event loop
+        self.callbacks_lock = threading.Lock()
+
+        # JSON template used while creating custom resources
+        self.raw_cr = template_cr
+
+        # Waiting time to reprocess all custom resource if function is enabled
+        self.reprocess_waiting_time = 10.0
+
+        # Lock objects to synchronize processing of CRs
+        self.cr_locks: DefaultDict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # Dict to save task exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
+        # Running tasks of this handler
+        self.tasks: List[asyncio.Task] = []
+        self._callback_tasks: Dict[asyncio.Task, None] = {}
+        # Control flag for tasks
+        self.thread_run = True
+        # Event loop running the tasks of this handler
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Executor for callbacks which are no coroutine functions
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _get_label_selector(self) -> str:
+        """Get label selector including robots of this handler."""
+        cls = self.__class__
+        return get_label_selector(
+            self._base_label_selector, cls.ROBOT_LABEL,
+            self._selector_robots if self.robot_label_selector else None)
+
+    def add_selector_robots(self, robot_names: Iterable[str], replay: bool = True) -> None:
+        """
+        Add robots to the label selector of this handler.
+
+        A running watcher is restarted with a fresh list of all CRs when the current watch stream
+        returns. ADDED events are sent for the custom resources of the new robots only, unless
+        replay is False. Could be called from any thread.
+        """
+        if not self.robot_label_selector:
+            return
+        with self._selector_lock:
+            new_robots = {r for r in robot_names if r} - self._selector_robots
+            if not new_robots:
+                return
+            self._selector_robots = self._selector_robots | new_robots
+            label_selector = self._get_label_selector()
+            _LOGGER.info(
+                '%s/%s: Changing label selector to "%s"', self.group, self.plural,
+                label_selector)
+            self.label_selector = label_selector
+            if self._cr_cache_initialized.is_set() and self._loop is not None:
+                self._replay_robots = self._replay_robots or set()
+                if replay:
+                    self._replay_robots |= new_robots
+                # Watcher belongs to the event loop, stop it there
+                self._loop.call_soon_threadsafe(self._restart_watcher)
+
+    def _restart_watcher(self) -> None:
+        """Restart watcher with a fresh list of all CRs."""
+        self.resv_watcher = ''
+        self.watcher.stop()
+
+    async def connect(self) -> None:
+        """Load K8s config and instantiate K8s APIs."""
+        if self.api_client is not None:
+            return
+        if 'KUBERNETES_PORT' in os.environ:
+            _LOGGER.info(
+                '%s/%s: Handler starting "incluster_config" mode', self.group, self.plural)
+            config.load_incluster_config()
+        else:
+            _LOGGER.info('%s/%s: Handler starting "kube_config" mode', self.group, self.plural)
+            await config.load_kube_config()
+
+        self.api_client = client.ApiClient()
+        self.crd_api = client.ApiextensionsV1Api(self.api_client)
+        self.co_api = client.CustomObjectsApi(self.api_client)
+
+        # Identify from CRD which method should be used to update CR status
+        await self.get_status_update_method()
+
+    async def get_status_update_method(self) -> None:
+        """
+        Get status update method from CRD.
+
+        Depends on status subresource is set or unset in CRD.
+        """
+        cls = self.__class__
+        name = '{}.{}'.format(self.plural, self.group)
+        self.status_update_method = self.co_api.patch_namespaced_custom_object
+        try:
+            api_response = await self.crd_api.read_custom_resource_definition(
+                name, _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when calling ApiextensionsV1Api->'
+                'read_custom_resource_definition: %s', self.group, self.plural, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully read custom resource definition %s', self.group, self.plural,
+                name)
+            if api_response.spec.versions[0].subresources is not None:
+                if api_response.spec.versions[0].subresources.status is not None:
+                    self.status_update_method = self.co_api.patch_namespaced_custom_object_status
+                    _LOGGER.info('There is a status subresource defined in CRD %s', name)
+                    return
+
+            _LOGGER.info('There is no status subresource defined in CRD %s', name)
+
+    async def run(self, reprocess: bool = False, multiple_executor_threads: bool = False) -> None:
+        """
+        Start running all callbacks.
+
+        Supporting multiple executor threads for blocking callbacks.
+        """
+        if self.thread_run:
+            self._loop = asyncio.get_running_loop()
+            # Restart ThreadPoolExecutor when not running with default max_worker=1
+            if multiple_executor_threads:
+                self.executor.shutdown()
+                self.executor = ThreadPoolExecutor(max_workers=5)
+            await self.connect()
+            _LOGGER.info(
+                'Watching for changes on %s.%s/%s', self.plural, self.group, self.version)
+            self.tasks.append(self._create_task(self._watch_on_crs_loop(), 'watcher'))
+            # Wait until cache is initialized
+            await self._cr_cache_initialized.wait()
+            self.tasks.append(
+                self._create_task(self._synchronize_cache_loop(), 'cr-cache-synchronizer'))
+            if reprocess:
+                self.tasks.append(self._create_task(self._reprocess_crs_loop(), 'reprocessor'))
+        else:
+            _LOGGER.error(
+                'Runner tasks for %s/%s are currently deactivated', self.group, self.plural)
+
+    def _create_task(self, coro, name: str) -> asyncio.Task:
+        """Create a named task of this handler."""
+        return asyncio.get_running_loop().create_task(
+            coro, name='{}/{}: {}'.format(self.group, self.plural, name))
+
+    def _submit_callback(self, name: str, labels: Dict, operation: str,
+                         custom_res: Dict) -> asyncio.Task:
+        """Run callbacks of a custom resource operation in a task."""
+        task = self._create_task(
+            self._callback(name, labels, operation, custom_res), 'callback {}'.format(name))
+        # Keep a reference until the task is done
+        self._callback_tasks[task] = None
+        task.add_done_callback(self._callback_tasks.pop)
+        return task
+
+    def _cache_custom_resource(self, name: str, operation: str, custom_res: Dict) -> None:
+        """Cache this custom resource."""
+        if operation in ('ADDED', 'MODIFIED'):
+            self._cr_cache[name] = custom_res
+        elif operation == 'DELETED':
+            self._cr_cache.pop(name, None)
+
+    async def _refresh_custom_resource_cache(self) -> Dict:
+        """Refresh custom resource cache from a list with custom resources."""
+        _LOGGER.debug("Refreshing custom resource cache")
+        cr_resp = await self._list_all_cr()
+        cr_cache = {}
+        for obj in cr_resp['items']:
+            metadata = obj.get('metadata')
+            if not metadata:
+                continue
+            name = metadata['name']
+            cr_cache[name] = obj
+        self._cr_cache = cr_cache
+
+        return cr_resp
+
+    async def _synchronize_cache_loop(self) -> None:
+        """Synchronize custom resource cache every 5 minutes."""
+        while self.thread_run:
+            await asyncio.sleep(300)
+            try:
+                await self._refresh_custom_resource_cache()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error refreshing CR cache: %s', self.group, self.plural, err,
+                    exc_info=True)
+                # On uncovered exception in task save the exception
+                self.thread_exceptions['cr-cache-synchronizer'] = err
+                # Stop the watcher
+                self.stop_watcher()
+
+    async def _callback(
+            self, name: str, labels: Dict, operation: str, custom_res: Dict) -> None:
+        """Process custom resource operation."""
+        robot_name = labels.get(self.ROBOT_LABEL, '')
+        # Run all registered callback functions
+        with self.callbacks_lock:
+            callbacks = list(self.callbacks[operation].values())
+            if self.robot_callbacks.get(robot_name) is not None:
+                callbacks.extend(self.robot_callbacks[robot_name][operation].values())
+        loop = asyncio.get_running_loop()
+        async with self.cr_locks[name]:
+            _LOGGER.debug('CR "%s" locked by operation "%s"', name, operation)
+            try:
+                for callback in callbacks:
+                    if asyncio.iscoroutinefunction(callback):
+                        await callback(name, custom_res)
+                    else:
+                        await loop.run_in_executor(self.executor, callback, name, custom_res)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error in callback when processing CR %s: %s', self.group,
+                    self.plural, name, err, exc_info=True)
+            else:
+                _LOGGER.debug(
+                    '%s/%s: Successfully processed custom resource %s', self.group, self.plural,
+                    name)
+            finally:
+                if operation == 'DELETED':
+                    self.cr_locks.pop(name, None)
+
+    async def _watch_on_crs(self) -> None:
+        """Stream events on custom resources and execute callbacks."""
+        _LOGGER.info(
+            '%s/%s: Starting watcher at resourceVersion "%s"',
+            self.group, self.plural, self.resv_watcher)
+        try:
+            self.watcher = watch.Watch()
+            async with self.watcher.stream(
+                    self.co_api.list_namespaced_custom_object,
+                    self.group,
+                    self.version,
+                    self.namespace,
+                    self.plural,
+                    label_selector=self.label_selector,
+                    resource_version=self.resv_watcher) as stream:
+                async for event in stream:
+                    # Break loop when task stops
+                    if not self.thread_run:
+                        break
+                    # Process event
+                    obj = event['object']
+                    operation = event['type']
+                    # Too old resource version error handling
+                    if obj.get('code') == 410:
+                        new_version = parse_too_old_failure(obj.get('message'))
+                        if new_version is not None:
+                            await self._handle_too_old_resource_version(new_version)
+                            break
+
+                    # Skip CRs without a spec or without metadata
+                    metadata = obj.get('metadata')
+                    if not metadata:
+                        continue
+                    name = metadata['name']
+                    labels = metadata.get('labels', {})
+                    _LOGGER.debug(
+                        '%s/%s: Handling %s on %s', self.group, self.plural,
+                        operation, name)
+                    # Cache custom resource
+                    self._cache_custom_resource(name, operation, obj)
+                    if metadata.get('resourceVersion'):
+                        self.resv_watcher = metadata['resourceVersion']
+                    # Run callbacks in a separate task
+                    self._submit_callback(name, labels, operation, obj)
+        except ApiException as err:
+            if err.status == 410:
+                new_version = parse_too_old_failure(err.reason)
+                if new_version is not None:
+                    await self._handle_too_old_resource_version(new_version)
+                    return
+
+            # If resource version could not be updated, reset it to allow a clean restart
+            self.resv_watcher = ''
+            _LOGGER.error(
+                '%s/%s: Exception when watching CustomObjectsApi: %s',
+                self.group, self.plural, err)
+
+            # On unknown errors backoff for 5 seconds
+            _LOGGER.info('%s/%s: Backing off for 5 seconds', self.group, self.plural)
+            await asyncio.sleep(5)
+        except (asyncio.TimeoutError, ClientError) as err:
+            _LOGGER.error(
+                '%s/%s: %s when watching CustomObjectsApi. Restarting watcher',
+                self.group, self.plural, err.__class__.__name__)
+
+    async def _handle_too_old_resource_version(self, new_version: int) -> None:
+        """Restart watcher at a newer resource version."""
+        self.resv_watcher = str(new_version)
+        _LOGGER.error(
+            'Updating resource version to %s due to "too old resource version" error',
+            new_version)
+        # CRD could be the reason for a too old resource version error
+        # Refresh status update method
+        await self.get_status_update_method()
+
+    async def _init_watcher(self) -> None:
+        """Initialize CR watcher."""
+        cls = self.__class__
+        with self._selector_lock:
+            replay_robots, self._replay_robots = self._replay_robots, None
+        # Sync cache
+        cr_resp = await self._refresh_custom_resource_cache()
+        self._cr_cache_initialized.set()
+        _LOGGER.debug(
+            '%s/%s: Initialize CR watcher: Got all CRs. Cache synced', self.group, self.plural)
+        if cr_resp:
+            # Set resource version for watcher to the version of the list
+            resource_version = cr_resp.get('metadata', {}).get('resourceVersion')
+            if resource_version is None:
+                _LOGGER.error('Could not determine resourceVersion. Start from the beginning')
+                self.resv_watcher = ''
+            else:
+                self.resv_watcher = resource_version
+
+            # Process custom resources
+            for obj in cr_resp['items']:
+                metadata = obj.get('metadata')
+                if not metadata:
+                    continue
+                name = metadata['name']
+                labels = metadata.get('labels', {})
+                if replay_robots is not None and labels.get(cls.ROBOT_LABEL) not in replay_robots:
+                    continue
+                self._submit_callback(name, labels, 'ADDED', obj)
+
+    async def _watch_on_crs_loop(self) -> None:
+        """Start watching on custom resources in a loop."""
+        _LOGGER.info(
+            '%s/%s: Start watching on custom resources', self.group, self.plural)
+        while self.thread_run:
+            try:
+                if self.resv_watcher == '':
+                    await self._init_watcher()
+                await self._watch_on_crs()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error reprocessing custom resources: %s', self.group, self.plural, err,
+                    exc_info=True)
+                # On uncovered exception in task save the exception
+                self.thread_exceptions['watcher'] = err
+                # Stop the watcher
+                self.stop_watcher()
+                # Release tasks waiting for cache initialization
+                self._cr_cache_initialized.set()
+            finally:
+                if self.thread_run:
+                    _LOGGER.debug('%s/%s: Restarting watcher', self.group, self.plural)
+
+        _LOGGER.info("Custom resource watcher stopped")
+
+    async def update_cr_status(self, name: str, status: Dict) -> None:
+        """Update the status field of named cr."""
+        cls = self.__class__
+        custom_res = {'status': status}
+        try:
+            await self.status_update_method(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                name,
+                custom_res,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when updating CR status of %s: %s', self.group, self.plural,
+                name, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully updated status of CR %s', self.group, self.plural, name)
+
+    async def update_cr_spec(
+            self, name: str, spec: Dict, labels: Optional[Dict] = None,
+            owner_cr: Optional[Dict] = None) -> None:
+        """Update the spec field of named cr."""
+        cls = self.__class__
+        custom_res = {'spec': spec}
+        # Optionally change labels
+        if labels is not None:
+            custom_res['metadata'] = {'labels': labels}
+        # Optionally add controller reference
+        if owner_cr is not None:
+            custom_res = self.set_controller_reference(custom_res, owner_cr)
+        try:
+            await self.co_api.patch_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                name,
+                custom_res,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when updating CR spec of %s: %s', self.group, self.plural,
+                name, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully updated spec of CR %s', self.group, self.plural, name)
+
+    async def delete_cr(self, name: str) -> None:
+        """Delete specific custom resource by name."""
+        cls = self.__class__
+        try:
+            await self.co_api.delete_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                name,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when deleting CR of %s: %s', self.group, self.plural,
+                name, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully deleted CR %s', self.group, self.plural, name)
+
+    async def create_cr(
+            self, name: str, labels: Dict, spec: Dict, owner_cr: Optional[Dict] = None) -> None:
+        """Create custom resource having json parameter as spec."""
+        cls = self.__class__
+        custom_res = copy.deepcopy(self.raw_cr)
+        custom_res['metadata']['name'] = name
+        custom_res['metadata']['namespace'] = self.namespace
+        custom_res['metadata']['labels'] = labels
+        custom_res['spec'] = spec
+        if owner_cr is not None:
+            custom_res = self.set_controller_reference(custom_res, owner_cr)
+        try:
+            await self.co_api.create_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                custom_res,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when creating CR %s: %s', self.group, self.plural, name, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully created CR %s', self.group, self.plural, name)
+
+    async def get_cr(self, name: str, use_cache: bool = True) -> Dict:
+        """Retrieve a specific custom resource by name."""
+        cls = self.__class__
+        if use_cache is True:
+            try:
+                return copy.deepcopy(self._cr_cache[name])
+            except KeyError as err:
+                _LOGGER.error(
+                    '%s/%s: Exception when retrieving CR %s: not found', self.group, self.plural,
+                    name)
+                raise ApiException(status=404) from err
+
+        try:
+            api_response = await self.co_api.get_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                name,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when retrieving CR %s: %s', self.group, self.plural, name, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully retrieved CR %s', self.group, self.plural, name)
+            return api_response
+
+    async def check_cr_exists(self, name: str, use_cache: bool = True) -> bool:
+        """Check if a cr exists by name."""
+        cls = self.__class__
+        if use_cache is True:
+            return bool(self._cr_cache.get(name))
+
+        try:
+            await self.co_api.get_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                name,
+                _request_timeout=cls.REQUEST_TIMEOUT)
+        except ApiException as err:
+            if err.status == 404:
+                return False
+            _LOGGER.error(
+                '%s/%s: Exception when retrieving CR %s: %s', self.group, self.plural, name, err)
+            raise
+        else:
+            return True
+
+    async def list_all_cr(self, use_cache: bool = True) -> List[Dict]:
+        """List all currently available custom resources of a kind."""
+        if use_cache is True:
+            return copy.deepcopy(list(self._cr_cache.values()))
+
+        return (await self._list_all_cr()).get('items', [])
+
+    async def _list_all_cr(self) -> Dict:
+        """List all currently available custom resources of a kind internally."""
+        cls = self.__class__
+        try:
+            api_response = await self.co_api.list_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                label_selector=self.label_selector,
+                _request_timeout=cls.REQUEST_TIMEOUT
+            )
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when listing of CRs: %s', self.group, self.plural, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully listed all CRs', self.group, self.plural)
+            return api_response
+
+    async def process_all_crs(
+            self, operation: str = 'REPROCESS', robot_name: Optional[str] = None) -> None:
+        """
+        Reprocess custom resources.
+
+        This method processes all existing custom resources with the given operation.
+        If robot_name is set, only custom resources labeled with this robot are processed.
+        """
+        cls = self.__class__
+        _LOGGER.debug('%s/%s: CR reprocess started', self.group, self.plural)
+        crs = copy.deepcopy(list(self._cr_cache.values()))
+
+        tasks: List[asyncio.Task] = []
+
+        for obj in crs:
+            metadata = obj.get('metadata')
+            if not metadata:
+                continue
+            name = metadata['name']
+            labels = metadata.get('labels', {})
+            if robot_name is not None and labels.get(cls.ROBOT_LABEL) != robot_name:
+                continue
+            tasks.append(self._submit_callback(name, labels, operation, obj))
+
+        # Wait for all tasks
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _reprocess_crs_loop(self) -> None:
+        """Reprocess existing custom resources in a loop."""
+        _LOGGER.info(
+            'Start continiously reprocessing existing custom resources')
+        last_run = time.time()
+        while self.thread_run:
+            try:
+                await self.process_all_crs()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error reprocessing custom resources: %s', self.group, self.plural, err,
+                    exc_info=True)
+                self.thread_exceptions['reprocessor'] = err
+                # Stop the watcher
+                self.stop_watcher()
+            finally:
+                # Wait up to self.reprocess_waiting_time seconds
+                if self.thread_run:
+                    await asyncio.sleep(
+                        max(0, last_run - time.time() + self.reprocess_waiting_time))
+                    last_run = time.time()
+
+        _LOGGER.info("Reprocessing custom resources stopped")
+
+    def stop_watcher(self) -> None:
+        """Stop watching CR stream."""
+        self.thread_run = False
+        _LOGGER.info('Stopping watcher for %s/%s', self.group, self.plural)
+        self.watcher.stop()
+        current_task = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current_task:
+                task.cancel()
+        _LOGGER.info('Stopping ThreadPoolExecutor')
+        self.executor.shutdown(wait=False)
+
+    async def close(self) -> None:
+        """Stop watcher and close K8s API client."""
+        self.stop_watcher()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.api_client is not None:
+            await self.api_client.close()
+
+    async def add_finalizer(self, name: str, finalizer: str) -> bool:
+        """Add a finalizer to a CR."""
+        cls = self.__class__
+        if await self.check_cr_exists(name):
+            # Get current finalizers
+            cr_resp = await self.get_cr(name)
+            finalizers = cr_resp['metadata'].get('finalizers', [])
+            # Add finalize to list
+            finalizers.append(finalizer)
+            custom_res = {'metadata': {'finalizers': finalizers}}
+            # Update CR
+            try:
+                await self.co_api.patch_namespaced_custom_object(
+                    self.group,
+                    self.version,
+                    self.namespace,
+                    self.plural,
+                    name,
+                    custom_res,
+                    _request_timeout=cls.REQUEST_TIMEOUT)
+            except ApiException as err:
+                _LOGGER.error(
+                    '%s/%s: Exception when adding finalizer to CR %s: %s', self.group, self.plural,
+                    name, err)
+                raise
+            else:
+                _LOGGER.debug('Added finalizer %s to CR %s', finalizer, name)
+                return True
+        else:
+            _LOGGER.error('Unable to add finalizer to CR %s. CR not found', name)
+            return False
+
+    async def remove_finalizer(self, name: str, finalizer: str) -> bool:
+        """Remove a finalizer from a CR."""
+        cls = self.__class__
+        if await self.check_cr_exists(name):
+            # Get current finalizers
+            cr_resp = await self.get_cr(name)
+            finalizers = cr_resp['metadata'].get('finalizers', [])
+            # Remove finalizer from list
+            try:
+                finalizers.remove(finalizer)
+            except ValueError:
+                _LOGGER.error(
+                    'Unable to remove finalizer from CR %s. Finalizer %s not found', name,
+                    finalizer)
+                return False
+            custom_res = {'metadata': {'finalizers': finalizers}}
+            # Update CR
+            try:
+                await self.co_api.patch_namespaced_custom_object(
+                    self.group,
+                    self.version,
+                    self.namespace,
+                    self.plural,
+                    name,
+                    custom_res,
+                    _request_timeout=cls.REQUEST_TIMEOUT)
+            except ApiException as err:
+                _LOGGER.error(
+                    '%s/%s: Exception when removing finalizer from CR %s: %s', self.group,
+                    self.plural, name, err)
+                raise
+            else:
+                _LOGGER.debug('Removed finalizer %s from CR %s', finalizer, name)
+                return True
+        else:
+            _LOGGER.error('Unable to remove finalizer from CR %s. CR not found', name)
+            return False
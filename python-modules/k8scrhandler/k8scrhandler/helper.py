@@ -17,7 +17,7 @@ import cProfile
 import pstats
 import functools
 
-from typing import Callable, Any
+from typing import Any, Callable, Iterable, Optional
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -38,3 +38,23 @@ def run_cprofile(func: Callable) -> Callable:
             pstats.Stats(profile).sort_stats('cumulative').print_stats(30)
             _LOGGER.info('End of profiling results for "%s"', func)
     return profiled_func
+
+
+def get_label_selector(
+        base_label_selector: str, robot_label: str, robots: Optional[Iterable[str]]) -> str:
+    """
+    Get label selector for custom resources of some robots.
+
+    If robots is None, custom resources of all robots are selected.
+    """
+    if robots is None:
+        return base_label_selector
+    robots = sorted(robots)
+    if robots:
+        robot_selector = '{} in ({})'.format(robot_label, ','.join(robots))
+    else:
+        # No robots yet, select nothing
+        robot_selector = '{0},!{0}'.format(robot_label)
+    if base_label_selector:
+        return '{},{}'.format(base_label_selector, robot_selector)
+    return robot_selector
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Shared informer for K8s custom resources."""
+
+import os
+import re
+import copy
+import logging
+import time
+
+import threading
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from kubernetes import client, watch
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import ProtocolError
+
+from .snapshot import CacheSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+TOO_OLD_RESOURCE_VERSION = re.compile(r"too old resource version: .* \((.*)\)")
+
+InformerKey = Tuple[str, str, str, str, str]
+
+
+def parse_too_old_failure(message: str) -> Optional[int]:
+    """
+    Parse stream watcher 'too old resource version' error.
+
+    According to https://github.com/kubernetes-client/python/issues/609.
+    """
+    result = TOO_OLD_RESOURCE_VERSION.search(message)
+    if result is None:
+        return None
+
+    match = result.group(1)
+    if match is None:
+        return None
+
+    try:
+        return int(match)
+    except (ValueError, TypeError):
+        return None
+
+
+class SharedInformer:
+    """
+    Watch and cache custom resources of one kind.
+
+    One instance is shared by all K8sCRHandler instances of a process which are watching the
+    same group/version/plural/namespace/label selector. Events are fanned out to subscribers.
+
+    If environment variable K8S_CACHE_SNAPSHOT_DIR is set, the cache is written to a snapshot
+    file periodically. On start the informer resumes watching from the snapshot instead of
+    listing all custom resources, as long as its resourceVersion is still valid.
+    """
+
+    REQUEST_TIMEOUT = (5, 30)
+    SNAPSHOT_INTERVAL = 60.0
+
+    def __init__(self,
+                 co_api: client.CustomObjectsApi,
+                 group: str,
+                 version: str,
+                 plural: str,
+                 namespace: str,
+                 label_selector: str) -> None:
+        """Construct."""
+        self.co_api = co_api
+
+        # K8s stream watcher
+        self.watcher = watch.Watch()
+
+        # Configs set to specify which CRs to watch
+        self.group = group
+        self.version = version
+        self.plural = plural
+        self.namespace = namespace
+        self.label_selector = label_selector
+
+        # Latest resource version processed by watcher
+        self.resv_watcher = ''
+
+        # CR Cache
+        self.cr_cache: Dict[str, Dict] = {}
+        self.cr_cache_lock = threading.Lock()
+        self.cr_cache_initialized = False
+
+        # Optional CR cache snapshot for warm starts
+        self.snapshot: Optional[CacheSnapshot] = None
+        self.snapshot_interval = float(
+            os.environ.get('K8S_CACHE_SNAPSHOT_INTERVAL', self.SNAPSHOT_INTERVAL))
+        snapshot_dir = os.environ.get('K8S_CACHE_SNAPSHOT_DIR')
+        if snapshot_dir:
+            self.snapshot = CacheSnapshot(
+                snapshot_dir, group, version, plural, namespace, label_selector)
+        # Watcher resumed from a snapshot and did not get an event yet
+        self._resumed_from_snapshot = False
+
+        # Subscribed K8sCRHandler instances
+        self._subscribers: List = []
+        self._subscribers_lock = threading.RLock()
+
+        # Dict to save thread exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
+        # Init threads
+        self.watcher_thread = threading.Thread(target=self._watch_on_crs_loop, daemon=True)
+        self.synchronize_thread = threading.Thread(
+            target=self._synchronize_cache_loop, daemon=True)
+        self.snapshot_thread = threading.Thread(target=self._snapshot_loop, daemon=True)
+        # Control flags for threads
+        self.thread_run = True
+        self._start_lock = threading.Lock()
+        self._stop_lock = threading.Lock()
+        self._started = False
+
+    @property
+    def key(self) -> InformerKey:
+        """Get registry key of this informer."""
+        return (self.group, self.version, self.plural, self.namespace, self.label_selector)
+
+    def subscribe(
+            self, handler, replay_filter: Optional[Callable[[Dict], bool]] = None) -> None:
+        """
+        Subscribe a handler to events of this informer.
+
+        Starts the informer if it is not running yet. Handlers subscribing to an informer which
+        is already running receive ADDED events for all cached custom resources, or only for
+        those matching replay_filter if it is set.
+        """
+        self.start()
+        with self._subscribers_lock:
+            if handler in self._subscribers:
+                return
+            self._subscribers.append(handler)
+            with self.cr_cache_lock:
+                crs = list(self.cr_cache.values())
+            for obj in crs:
+                if replay_filter is None or replay_filter(obj):
+                    self._notify_handler(handler, 'ADDED', obj)
+        _LOGGER.info(
+            '%s/%s: Handler subscribed to shared informer, %s subscriber(s)', self.group,
+            self.plural, len(self._subscribers))
+
+    def unsubscribe(self, handler) -> None:
+        """Unsubscribe a handler and stop informer if it was the last one."""
+        with self._subscribers_lock:
+            try:
+                self._subscribers.remove(handler)
+            except ValueError:
+                return
+            last_subscriber = not self._subscribers
+        if last_subscriber:
+            self.stop()
+
+    def start(self) -> None:
+        """Start watcher threads and wait until cache is initialized."""
+        with self._start_lock:
+            if not self._started:
+                self._started = True
+                _LOGGER.info(
+                    'Watching for changes on %s.%s/%s', self.plural, self.group, self.version)
+                self.watcher_thread.start()
+                # Wait until cache is initialized
+                while self.cr_cache_initialized is False and self.thread_run:
+                    time.sleep(0.01)
+                self.synchronize_thread.start()
+                if self.snapshot is not None:
+                    self.snapshot_thread.start()
+
+    def stop(self) -> None:
+        """Stop watching CR stream."""
+        with self._stop_lock:
+            if not self.thread_run:
+                return
+            if self.snapshot is not None:
+                self.save_snapshot()
+            self.thread_run = False
+        _LOGGER.info('Stopping shared informer for %s/%s', self.group, self.plural)
+        self.watcher.stop()
+        _remove_shared_informer(self)
+
+    def _get_subscribers(self) -> List:
+        """Get a copy of the subscriber list."""
+        with self._subscribers_lock:
+            return list(self._subscribers)
+
+    def _notify_handler(self, handler, operation: str, obj: Dict) -> None:
+        """Notify one handler about a custom resource event."""
+        # Each handler gets its own copy, callbacks must not change the cache or other handlers
+        obj = copy.deepcopy(obj)
+        metadata = obj['metadata']
+        name = metadata['name']
+        labels = metadata.get('labels', {})
+        handler.submit_event(name, labels, operation, obj)
+
+    def _notify_subscribers(self, operation: str, obj: Dict) -> None:
+        """Notify all subscribed handlers about a custom resource event."""
+        with self._subscribers_lock:
+            for handler in self._subscribers:
+                self._notify_handler(handler, operation, obj)
+
+    def _handle_thread_exception(self, thread: str, err: Exception) -> None:
+        """Save thread exception and stop all subscribed handlers."""
+        self.thread_exceptions[thread] = err
+        for handler in self._get_subscribers():
+            handler.thread_exceptions[thread] = err
+            handler.stop_watcher()
+        # Informer is stopped already if there was a subscriber
+        self.stop()
+
+    def _handle_too_old_resource_version(self, new_version: int) -> None:
+        """Restart watcher at a newer resource version."""
+        # Events since the snapshot are lost, a full resync is required
+        if self._resumed_from_snapshot:
+            _LOGGER.info(
+                '%s/%s: resourceVersion of snapshot is too old, resync all CRs', self.group,
+                self.plural)
+            self.resv_watcher = ''
+            return
+        self.resv_watcher = str(new_version)
+        _LOGGER.error(
+            'Updating resource version to %s due to "too old resource version" error',
+            new_version)
+        # CRD could be the reason for a too old resource version error
+        # Refresh status update method
+        for handler in self._get_subscribers():
+            handler.get_status_update_method()
+
+    def cache_custom_resource(self, name: str, operation: str, custom_res: Dict) -> None:
+        """Cache this custom resource."""
+        with self.cr_cache_lock:
+            if operation in ('ADDED', 'MODIFIED'):
+                self.cr_cache[name] = custom_res
+            elif operation == 'DELETED':
+                self.cr_cache.pop(name, None)
+
+    def refresh_custom_resource_cache(self) -> Dict:
+        """Refresh custom resource cache from a list with custom resources."""
+        _LOGGER.debug("Refreshing custom resource cache")
+        with self.cr_cache_lock:
+            cr_resp = self.list_all_cr()
+            crs = cr_resp['items']
+            cr_cache = {}
+            for obj in crs:
+                metadata = obj.get('metadata')
+                if not metadata:
+                    continue
+                name = metadata['name']
+                cr_cache[name] = obj
+            self.cr_cache = cr_cache
+
+        return cr_resp
+
+    def list_all_cr(self) -> Dict:
+        """List all currently available custom resources of a kind."""
+        cls = self.__class__
+        try:
+            api_response = self.co_api.list_namespaced_custom_object(
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                label_selector=self.label_selector,
+                _request_timeout=cls.REQUEST_TIMEOUT
+            )
+        except ApiException as err:
+            _LOGGER.error(
+                '%s/%s: Exception when listing of CRs: %s', self.group, self.plural, err)
+            raise
+        else:
+            _LOGGER.debug(
+                '%s/%s: Successfully listed all CRs', self.group, self.plural)
+            return api_response
+
+    def save_snapshot(self) -> None:
+        """Save a snapshot of CR cache and its resourceVersion."""
+        if self.snapshot is None or not self.cr_cache_initialized:
+            return
+        with self.cr_cache_lock:
+            resource_version = self.resv_watcher
+            cr_cache = dict(self.cr_cache)
+        if not resource_version:
+            return
+        try:
+            self.snapshot.save(resource_version, cr_cache)
+        except OSError as err:
+            _LOGGER.error(
+                '%s/%s: Error saving CR cache snapshot: %s', self.group, self.plural, err)
+
+    def _load_snapshot(self) -> bool:
+        """Initialize CR cache from snapshot. Return True on success."""
+        if self.snapshot is None:
+            return False
+        snapshot = self.snapshot.load()
+        if snapshot is None:
+            return False
+        resource_version, cr_cache = snapshot
+        with self._subscribers_lock:
+            with self.cr_cache_lock:
+                self.cr_cache = cr_cache
+                self.resv_watcher = resource_version
+            self._resumed_from_snapshot = True
+            self.cr_cache_initialized = True
+            _LOGGER.info(
+                '%s/%s: Initialize CR watcher from snapshot at resourceVersion "%s"', self.group,
+                self.plural, resource_version)
+            for obj in cr_cache.values():
+                if not obj.get('metadata'):
+                    continue
+                self._notify_subscribers('ADDED', obj)
+        return True
+
+    def _snapshot_loop(self) -> None:
+        """Save CR cache snapshots periodically."""
+        while self.thread_run:
+            time.sleep(self.snapshot_interval)
+            if self.thread_run:
+                self.save_snapshot()
+
+    def _synchronize_cache_loop(self) -> None:
+        """Synchronize custom resource cache every 5 minutes."""
+        while self.thread_run:
+            time.sleep(300)
+            try:
+                self.refresh_custom_resource_cache()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error refreshing CR cache: %s', self.group, self.plural, err,
+                    exc_info=True)
+                # On uncovered exception in thread save the exception and stop the watcher
+                self._handle_thread_exception('cr-cache-synchronizer', err)
+
+    def _watch_on_crs(self) -> None:
+        """Stream events on custom resources and notify subscribers."""
+        _LOGGER.info(
+            '%s/%s: Starting watcher at resourceVersion "%s"',
+            self.group, self.plural, self.resv_watcher)
+        try:
+            self.watcher = watch.Watch()
+            stream = self.watcher.stream(
+                self.co_api.list_namespaced_custom_object,
+                self.group,
+                self.version,
+                self.namespace,
+                self.plural,
+                label_selector=self.label_selector,
+                resource_version=self.resv_watcher
+            )
+            for event in stream:
+                # Break loop when thread stops
+                if not self.thread_run:
+                    break
+                # Process event
+                obj = event['object']
+                operation = event['type']
+                # Too old resource version error handling
+                # https://github.com/kubernetes-client/python/issues/609
+                # Outdated from python  API version 12 which includes this PR
+                # https://github.com/kubernetes-client/python-base/pull/133/files
+                # No an ApiException is raised instead
+                if obj.get('code') == 410:
+                    new_version = parse_too_old_failure(obj.get('message'))
+                    if new_version is not None:
+                        self._handle_too_old_resource_version(new_version)
+                        break
+
+                # Skip CRs without a spec or without metadata
+                metadata = obj.get('metadata')
+                if not metadata:
+                    continue
+                name = metadata['name']
+                _LOGGER.debug(
+                    '%s/%s: Handling %s on %s', self.group, self.plural,
+                    operation, name)
+                # Cache and fan out event at once, handlers subscribing in the meantime would
+                # get it twice otherwise
+                with self._subscribers_lock:
+                    # Cache custom resource before updating resource version to keep snapshots
+                    # valid
+                    self.cache_custom_resource(name, operation, obj)
+                    if metadata.get('resourceVersion'):
+                        self.resv_watcher = metadata['resourceVersion']
+                    self._resumed_from_snapshot = False
+                    self._notify_subscribers(operation, obj)
+        except ApiException as err:
+            if err.status == 410:
+                new_version = parse_too_old_failure(err.reason)
+                if new_version is not None:
+                    self._handle_too_old_resource_version(new_version)
+                    return
+
+            # If resource version could not be updated, reset it to allow a clean restart
+            self.resv_watcher = ''
+            _LOGGER.error(
+                '%s/%s: Exception when watching CustomObjectsApi: %s',
+                self.group, self.plural, err)
+
+            # On unknown errors backoff for 5 seconds
+            _LOGGER.info('%s/%s: Backing off for 5 seconds', self.group, self.plural)
+            time.sleep(5)
+        except ProtocolError:
+            _LOGGER.error(
+                '%s/%s: ProtocolError when watching CustomObjectsApi. Restarting watcher',
+                self.group, self.plural)
+
+    def _init_watcher(self) -> None:
+        """Initialize CR watcher."""
+        # Custom resources restored from a snapshot might have been deleted in the meantime
+        deleted_crs: Dict[str, Dict] = {}
+        if self._resumed_from_snapshot:
+            with self.cr_cache_lock:
+                deleted_crs = dict(self.cr_cache)
+            self._resumed_from_snapshot = False
+        # Sync cache and notify at once, handlers subscribing in the meantime would get events
+        # twice otherwise
+        with self._subscribers_lock:
+            cr_resp = self.refresh_custom_resource_cache()
+            self.cr_cache_initialized = True
+            _LOGGER.debug(
+                '%s/%s: Initialize CR watcher: Got all CRs. Cache synced', self.group, self.plural)
+            if cr_resp:
+                # Set resource version for watcher to the version of the list. According to
+                # https://github.com/kubernetes-client/python/issues/693#issuecomment-442893494
+                # and https://github.com/kubernetes-client/python/issues/819#issuecomment-491630022
+                resource_version = cr_resp.get('metadata', {}).get('resourceVersion')
+                if resource_version is None:
+                    _LOGGER.error('Could not determine resourceVersion. Start from the beginning')
+                    self.resv_watcher = ''
+                else:
+                    self.resv_watcher = resource_version
+
+                # Process custom resources
+                for obj in cr_resp['items']:
+                    if not obj.get('metadata'):
+                        continue
+                    deleted_crs.pop(obj['metadata']['name'], None)
+                    self._notify_subscribers('ADDED', obj)
+                for obj in deleted_crs.values():
+                    if not obj.get('metadata'):
+                        continue
+                    self._notify_subscribers('DELETED', obj)
+
+    def _watch_on_crs_loop(self) -> None:
+        """Start watching on custom resources in a loop."""
+        _LOGGER.info(
+            '%s/%s: Start watching on custom resources', self.group, self.plural)
+        while self.thread_run:
+            try:
+                if self.resv_watcher == '':
+                    if self.cr_cache_initialized or not self._load_snapshot():
+                        self._init_watcher()
+                self._watch_on_crs()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    '%s/%s: Error reprocessing custom resources: %s', self.group, self.plural, err,
+                    exc_info=True)
+                # On uncovered exception in thread save the exception and stop the watcher
+                self._handle_thread_exception('watcher', err)
+            finally:
+                if self.thread_run:
+                    _LOGGER.debug('%s/%s: Restarting watcher', self.group, self.plural)
+
+        _LOGGER.info("Custom resource watcher stopped")
+
+
+# Process wide registry of shared informers
+_INFORMERS: Dict[InformerKey, SharedInformer] = {}
+_INFORMERS_LOCK = threading.Lock()
+
+
+def get_shared_informer(
+        co_api: client.CustomObjectsApi, group: str, version: str, plural: str, namespace: str,
+        label_selector: str) -> SharedInformer:
+    """Get the shared informer of a custom resource kind, create it if it does not exist."""
+    key = (group, version, plural, namespace, label_selector)
+    with _INFORMERS_LOCK:
+        informer = _INFORMERS.get(key)
+        if informer is None or informer.thread_run is False:
+            informer = SharedInformer(co_api, group, version, plural, namespace, label_selector)
+            _INFORMERS[key] = informer
+            _LOGGER.debug('%s/%s: Created shared informer', group, plural)
+        return informer
+
+
+def _remove_shared_informer(informer: SharedInformer) -> None:
+    """Remove a stopped informer from registry."""
+    with _INFORMERS_LOCK:
+        if _INFORMERS.get(informer.key) is informer:
+            _INFORMERS.pop(informer.key)
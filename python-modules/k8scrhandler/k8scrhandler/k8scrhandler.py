@@ -13,7 +13,6 @@
 """K8s custom resource handler for robcoewmordermanager."""
 
 import os
-import re
 import logging
 import copy
 import time
@@ -23,15 +22,16 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, Future
 from collections import defaultdict, OrderedDict
 
-from typing import DefaultDict, Dict, Callable, List, Optional, OrderedDict as TOrderedDict
+from typing import (
+    DefaultDict, Dict, Callable, Iterable, List, Optional, OrderedDict as TOrderedDict, Set)
 
-from kubernetes import client, config, watch
+from kubernetes import client, config
 from kubernetes.client.rest import ApiException
-from urllib3.exceptions import ProtocolError
 
-_LOGGER = logging.getLogger(__name__)
+from .helper import get_label_selector
+from .informer import SharedInformer, get_shared_informer
 
-TOO_OLD_RESOURCE_VERSION = re.compile(r"too old resource version: .* \((.*)\)")
+_LOGGER = logging.getLogger(__name__)
 
 
 def k8s_cr_callback(func: Callable) -> Callable:
@@ -58,36 +58,20 @@ def k8s_cr_callback(func: Callable) -> Callable:
     return decorated_func
 
 
-def parse_too_old_failure(message: str) -> Optional[int]:
-    """
-    Parse stream watcher 'too old resource version' error.
-
-    According to https://github.com/kubernetes-client/python/issues/609.
-    """
-    result = TOO_OLD_RESOURCE_VERSION.search(message)
-    if result is None:
-        return None
-
-    match = result.group(1)
-    if match is None:
-        return None
-
-    try:
-        return int(match)
-    except (ValueError, TypeError):
-        return None
-
-
 class K8sCRHandler:
     """
     Handle K8s custom resources.
 
     On instance represents one controller watching changes on a single custom
-    resource definition.
+    resource definition. Watch stream and cache are shared with other handlers of the same
+    process watching the same custom resources.
     """
 
     VALID_EVENT_TYPES = ['ADDED', 'MODIFIED', 'DELETED', 'REPROCESS']
     REQUEST_TIMEOUT = (5, 30)
+    ROBOT_LABEL = 'cloudrobotics.com/robot-name'
+    # Seconds to collect label selector changes before the watch is restarted
+    SELECTOR_DEBOUNCE = 5.0
 
     def __init__(self,
                  group: str,
@@ -95,8 +79,14 @@ class K8sCRHandler:
                  plural: str,
                  namespace: str,
                  template_cr: Dict,
-                 labels: Dict) -> None:
-        """Construct."""
+                 labels: Dict,
+                 robot_label_selector: bool = False) -> None:
+        """
+        Construct.
+
+        If robot_label_selector is True, only custom resources labeled with the name of a robot
+        which has registered callbacks on this handler are watched.
+        """
         if 'KUBERNETES_PORT' in os.environ:
             _LOGGER.info('%s/%s: Handler starting "incluster_config" mode', group, plural)
             config.load_incluster_config()
@@ -109,9 +99,6 @@ class K8sCRHandler:
         self.crd_api = client.ApiextensionsV1Api()
         self.co_api = client.CustomObjectsApi()
 
-        # K8s stream watcher
-        self.watcher = watch.Watch()
-
         # Configs set to specify which CRs to monitor/control
         self.group = group
         self.version = version
@@ -121,18 +108,19 @@ class K8sCRHandler:
         # Identify from CRD which method should be used to update CR status
         self.get_status_update_method()
 
-        self.label_selector = ''
-        for k, val in labels.items():
-            self.label_selector += k + '=' + val + ','
-        self.label_selector = self.label_selector[:-1]
-
-        # Latest resource version processed by watcher
-        self.resv_watcher = ''
+        self._base_label_selector = ','.join(
+            '{}={}'.format(k, val) for k, val in sorted(labels.items()))
+        # Set based selector on robot name label
+        self.robot_label_selector = robot_label_selector
+        self._selector_robots: Set[str] = set()
+        self._selector_lock = threading.Lock()
+        self.label_selector = self._get_label_selector()
+        # Debounced label selector changes, robot name -> selected
+        self._selector_changes: Dict[str, bool] = {}
+        self._selector_timer: Optional[threading.Timer] = None
 
-        # CR Cache
-        self._cr_cache: Dict[str, Dict] = {}
-        self._cr_cache_lock = threading.Lock()
-        self._cr_cache_initialized = False
+        # Shared watch stream and CR cache
+        self.informer = self._get_informer()
 
         # Callback stack for watch on cr
         self.callbacks: Dict[
@@ -152,12 +140,10 @@ class K8sCRHandler:
         # Dict to save thread exceptions
         self.thread_exceptions: Dict[str, Exception] = {}
         # Init threads
-        self.watcher_thread = threading.Thread(target=self._watch_on_crs_loop, daemon=True)
-        self.synchronize_thread = threading.Thread(
-            target=self._synchronize_cache_loop, daemon=True)
         self.reprocess_thread = threading.Thread(target=self._reprocess_crs_loop, daemon=True)
-        # Control flag for thread
+        # Control flags for thread
         self.thread_run = True
+        self._subscribed = False
         self.executor = ThreadPoolExecutor(max_workers=1)
 
     @staticmethod
@@ -172,6 +158,144 @@ class K8sCRHandler:
                 }
         return copy.deepcopy(callbacks)
 
+    def _get_informer(self) -> SharedInformer:
+        """Get shared informer for the custom resources of this handler."""
+        return get_shared_informer(
+            self.co_api, self.group, self.version, self.plural, self.namespace,
+            self.label_selector)
+
+    def _get_label_selector(self) -> str:
+        """Get label selector including robots of this handler."""
+        cls = self.__class__
+        return get_label_selector(
+            self._base_label_selector, cls.ROBOT_LABEL,
+            self._selector_robots if self.robot_label_selector else None)
+
+    def add_selector_robots(self, robot_names: Iterable[str], replay: bool = True) -> None:
+        """
+        Add robots to the label selector of this handler.
+
+        Robots registering callbacks are added automatically. Adding all robots of the process in
+        advance avoids restarting the watch for each of them. A running handler receives ADDED
+        events for the existing custom resources of the new robots only, unless replay is False.
+        Pending changes of update_selector_robots are applied together with the new robots.
+        """
+        if not self.robot_label_selector:
+            return
+        robot_names = {r for r in robot_names if r}
+        with self._selector_lock:
+            # Adding a robot cancels its pending removal
+            for robot in robot_names:
+                if self._selector_changes.get(robot) is False:
+                    del self._selector_changes[robot]
+            if robot_names <= self._selector_robots:
+                return
+            for robot in robot_names:
+                self._selector_changes[robot] = True
+        self._apply_selector_changes(replay)
+
+    def update_selector_robots(
+            self, add: Iterable[str] = (), remove: Iterable[str] = ()) -> None:
+        """
+        Add and remove robots of the label selector of this handler in background.
+
+        Changes within SELECTOR_DEBOUNCE seconds are applied together, thus custom resources are
+        listed and watched again only once. Existing custom resources of added robots are not
+        replayed.
+        """
+        cls = self.__class__
+        if not self.robot_label_selector:
+            return
+        with self._selector_lock:
+            for robot in remove:
+                if robot:
+                    self._selector_changes[robot] = False
+            for robot in add:
+                if robot:
+                    self._selector_changes[robot] = True
+            # Drop changes which would not change the label selector
+            for robot, selected in list(self._selector_changes.items()):
+                if selected == (robot in self._selector_robots):
+                    del self._selector_changes[robot]
+            if self._selector_changes and self._selector_timer is None and self.thread_run:
+                self._selector_timer = threading.Timer(
+                    cls.SELECTOR_DEBOUNCE, self._apply_debounced_selector_changes)
+                self._selector_timer.daemon = True
+                self._selector_timer.start()
+
+    def _apply_debounced_selector_changes(self) -> None:
+        """Apply pending label selector changes when debounce time is over."""
+        try:
+            self._apply_selector_changes(replay=False)
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error(
+                '%s/%s: Error changing label selector: %s', self.group, self.plural, err,
+                exc_info=True)
+            # On uncovered exception in thread save the exception
+            self.thread_exceptions['selector'] = err
+
+    def _apply_selector_changes(self, replay: bool) -> None:
+        """Apply pending label selector changes with one new informer."""
+        cls = self.__class__
+        with self._selector_lock:
+            if self._selector_timer is not None:
+                self._selector_timer.cancel()
+                self._selector_timer = None
+            robots = set(self._selector_robots)
+            for robot, selected in self._selector_changes.items():
+                if selected:
+                    robots.add(robot)
+                else:
+                    robots.discard(robot)
+            self._selector_changes.clear()
+            new_robots = robots - self._selector_robots
+            if robots == self._selector_robots:
+                return
+            self._selector_robots = robots
+            label_selector = self._get_label_selector()
+            _LOGGER.info(
+                '%s/%s: Changing label selector to "%s"', self.group, self.plural,
+                label_selector)
+            self.label_selector = label_selector
+            informer = self._get_informer()
+            if not self._subscribed:
+                self.informer = informer
+                return
+
+        # Subscribe to new informer before leaving the old one, to not miss any event.
+        # Subscribing waits for the initial list of the informer, thus run it outside the lock.
+        informer.subscribe(
+            self, replay_filter=lambda obj: replay and obj['metadata'].get('labels', {}).get(
+                cls.ROBOT_LABEL) in new_robots)
+        self._switch_informer(informer)
+
+    def _switch_informer(self, informer: SharedInformer) -> None:
+        """Switch to a subscribed informer if its label selector is still the current one."""
+        with self._selector_lock:
+            if informer is self.informer:
+                return
+            if informer.label_selector == self.label_selector and self._subscribed:
+                old_informer, self.informer = self.informer, informer
+            else:
+                # Label selector changed or handler stopped in the meantime
+                old_informer = informer
+        old_informer.unsubscribe(self)
+
+    @property
+    def _cr_cache(self) -> Dict[str, Dict]:
+        """Get CR cache of shared informer."""
+        return self.informer.cr_cache
+
+    @property
+    def _cr_cache_lock(self) -> threading.Lock:
+        """Get CR cache lock of shared informer."""
+        return self.informer.cr_cache_lock
+
+    @property
+    def resv_watcher(self) -> str:
+        """Get latest resource version processed by shared informer."""
+        return self.informer.resv_watcher
+
     def get_status_update_method(self) -> None:
         """
         Get status update method from CRD.
@@ -251,6 +375,10 @@ class K8sCRHandler:
                     '%s/%s: Callback %s registered to operation %s%s', self.group, self.plural,
                     name, operation, log_suffix)
 
+        # Watch custom resources of this robot too
+        if robot_name is not None:
+            self.add_selector_robots([robot_name])
+
     def unregister_callback(self, name: str, robot_name: Optional[str] = None) -> None:
         """Unregister a Pub/Sub order manager queue callback function."""
         with self.callbacks_lock:
@@ -282,63 +410,27 @@ class K8sCRHandler:
             if multiple_executor_threads:
                 self.executor.shutdown()
                 self.executor = ThreadPoolExecutor(max_workers=5)
-            _LOGGER.info(
-                'Watching for changes on %s.%s/%s', self.plural, self.group, self.version)
-            self.watcher_thread.start()
-            # Wait until cache is initialized
-            while self._cr_cache_initialized is False:
-                time.sleep(0.01)
-            self.synchronize_thread.start()
+            # Informer could have been stopped by other handlers in the meantime
+            if self.informer.thread_run is False:
+                self.informer = self._get_informer()
+            # Subscribe to shared informer, which waits until cache is initialized
+            with self._selector_lock:
+                self._subscribed = True
+                informer = self.informer
+            informer.subscribe(self)
+            # Label selector might have changed while subscribing
+            if informer is not self.informer:
+                informer.unsubscribe(self)
             if reprocess:
                 self.reprocess_thread.start()
         else:
             _LOGGER.error(
                 'Runner thread for %s/%s is currently deactivated', self.group, self.plural)
 
-    def _cache_custom_resource(self, name: str, operation: str, custom_res: Dict) -> None:
-        """Cache this custom resource."""
-        with self._cr_cache_lock:
-            if operation in ('ADDED', 'MODIFIED'):
-                self._cr_cache[name] = custom_res
-            elif operation == 'DELETED':
-                self._cr_cache.pop(name, None)
-
-    def _refresh_custom_resource_cache(self) -> Dict[str, Dict]:
-        """Refresh custom resource cache from a list with custom resources."""
-        _LOGGER.debug("Refreshing custom resource cache")
-        with self._cr_cache_lock:
-            cr_resp = self._list_all_cr()
-            crs = cr_resp['items']
-            cr_cache = {}
-            for obj in crs:
-                metadata = obj.get('metadata')
-                if not metadata:
-                    continue
-                name = metadata['name']
-                cr_cache[name] = obj
-            self._cr_cache = cr_cache
-
-        return cr_resp
-
-    def _synchronize_cache_loop(self) -> None:
-        """Synchronize custom resource cache every 5 minutes."""
-        while self.thread_run:
-            time.sleep(300)
-            try:
-                self._refresh_custom_resource_cache()
-            except Exception as err:  # pylint: disable=broad-except
-                _LOGGER.error(
-                    '%s/%s: Error refreshing CR cache: %s', self.group, self.plural, err,
-                    exc_info=True)
-                # On uncovered exception in thread save the exception
-                self.thread_exceptions['cr-cache-synchronizer'] = err
-                # Stop the watcher
-                self.stop_watcher()
-
     @k8s_cr_callback
     def _callback(self, name: str, labels: Dict, operation: str, custom_res: Dict) -> None:
         """Process custom resource operation."""
-        robot_name = labels.get('cloudrobotics.com/robot-name', '')
+        robot_name = labels.get(self.ROBOT_LABEL, '')
         # Run all registered callback functions
         with self.callbacks_lock:
             callbacks = list(self.callbacks[operation].values())
@@ -355,139 +447,16 @@ class K8sCRHandler:
             _LOGGER.debug(
                 '%s/%s: Successfully processed custom resource %s', self.group, self.plural, name)
 
-    def _watch_on_crs(self) -> None:
-        """Stream events on orders and execute callbacks."""
-        _LOGGER.info(
-            '%s/%s: Starting watcher at resourceVersion "%s"',
-            self.group, self.plural, self.resv_watcher)
+    def submit_event(self, name: str, labels: Dict, operation: str, custom_res: Dict) -> None:
+        """Submit a custom resource event from shared informer to callbacks."""
+        if not self.thread_run:
+            return
         try:
-            self.watcher = watch.Watch()
-            stream = self.watcher.stream(
-                self.co_api.list_namespaced_custom_object,
-                self.group,
-                self.version,
-                self.namespace,
-                self.plural,
-                label_selector=self.label_selector,
-                resource_version=self.resv_watcher
-            )
-            for event in stream:
-                # Break loop when thread stops
-                if not self.thread_run:
-                    break
-                # Process event
-                obj = event['object']
-                operation = event['type']
-                # Too old resource version error handling
-                # https://github.com/kubernetes-client/python/issues/609
-                # Outdated from python  API version 12 which includes this PR
-                # https://github.com/kubernetes-client/python-base/pull/133/files
-                # No an ApiException is raised instead
-                if obj.get('code') == 410:
-                    new_version = parse_too_old_failure(obj.get('message'))
-                    if new_version is not None:
-                        self.resv_watcher = str(new_version)
-                        _LOGGER.error(
-                            'Updating resource version to %s due to "too old resource version" '
-                            'error', new_version)
-                        # CRD could be the reason for a too old resource version error
-                        # Refresh status update method
-                        self.get_status_update_method()
-                        break
-
-                # Skip CRs without a spec or without metadata
-                metadata = obj.get('metadata')
-                if not metadata:
-                    continue
-                if metadata.get('resourceVersion'):
-                    self.resv_watcher = metadata['resourceVersion']
-                name = metadata['name']
-                labels = metadata.get('labels', {})
-                _LOGGER.debug(
-                    '%s/%s: Handling %s on %s', self.group, self.plural,
-                    operation, name)
-                # Cache custom resource
-                self._cache_custom_resource(name, operation, obj)
-                # Submit callbacks to ThreadPoolExecutor
-                self.executor.submit(self._callback, name, labels, operation, obj)
-        except ApiException as err:
-            if err.status == 410:
-                new_version = parse_too_old_failure(err.reason)
-                if new_version is not None:
-                    self.resv_watcher = str(new_version)
-                    _LOGGER.error(
-                        'Updating resource version to %s due to "too old resource version" '
-                        'error', new_version)
-                    # CRD could be the reason for a too old resource version error
-                    # Refresh status update method
-                    self.get_status_update_method()
-                    return
-
-            # If resource version could not be updated, reset it to allow a clean restart
-            self.resv_watcher = ''
-            _LOGGER.error(
-                '%s/%s: Exception when watching CustomObjectsApi: %s',
-                self.group, self.plural, err)
-
-            # On unknown errors backoff for 5 seconds
-            _LOGGER.info('%s/%s: Backing off for 5 seconds', self.group, self.plural)
-            time.sleep(5)
-        except ProtocolError:
-            _LOGGER.error(
-                '%s/%s: ProtocolError when watching CustomObjectsApi. Restarting watcher',
-                self.group, self.plural)
-
-    def _init_watcher(self) -> None:
-        """Initialize CR watcher."""
-        # Sync cache
-        cr_resp = self._refresh_custom_resource_cache()
-        self._cr_cache_initialized = True
-        _LOGGER.debug(
-            '%s/%s: Initialize CR watcher: Got all CRs. Cache synced', self.group, self.plural)
-        if cr_resp:
-            # Set resource version for watcher to the version of the list. According to
-            # https://github.com/kubernetes-client/python/issues/693#issuecomment-442893494
-            # and https://github.com/kubernetes-client/python/issues/819#issuecomment-491630022
-            resource_version = cr_resp.get('metadata', {}).get('resourceVersion')
-            if resource_version is None:
-                _LOGGER.error('Could not determine resourceVersion. Start from the beginning')
-                self.resv_watcher = ''
-            else:
-                self.resv_watcher = resource_version
-
-            # Process custom resources
-            for obj in cr_resp['items']:
-                metadata = obj.get('metadata')
-                if not metadata:
-                    continue
-                name = metadata['name']
-                labels = metadata.get('labels', {})
-                # Submit callbacks to ThreadPoolExecutor
-                self.executor.submit(
-                    self._callback, name, labels, 'ADDED', obj)
-
-    def _watch_on_crs_loop(self) -> None:
-        """Start watching on custom resources in a loop."""
-        _LOGGER.info(
-            '%s/%s: Start watching on custom resources', self.group, self.plural)
-        while self.thread_run:
-            try:
-                if self.resv_watcher == '':
-                    self._init_watcher()
-                self._watch_on_crs()
-            except Exception as err:  # pylint: disable=broad-except
-                _LOGGER.error(
-                    '%s/%s: Error reprocessing custom resources: %s', self.group, self.plural, err,
-                    exc_info=True)
-                # On uncovered exception in thread save the exception
-                self.thread_exceptions['watcher'] = err
-                # Stop the watcher
-                self.stop_watcher()
-            finally:
-                if self.thread_run:
-                    _LOGGER.debug('%s/%s: Restarting watcher', self.group, self.plural)
-
-        _LOGGER.info("Custom resource watcher stopped")
+            self.executor.submit(self._callback, name, labels, operation, custom_res)
+        except RuntimeError:
+            _LOGGER.debug(
+                '%s/%s: Executor already shut down, skipping %s on %s', self.group, self.plural,
+                operation, name)
 
     def update_cr_status(self, name: str, status: Dict) -> None:
         """Update the status field of named cr."""
@@ -645,35 +614,17 @@ class K8sCRHandler:
         if use_cache is True:
             return copy.deepcopy(list(self._cr_cache.values()))
 
-        return self._list_all_cr().get('items', [])
+        return self.informer.list_all_cr().get('items', [])
 
-    def _list_all_cr(self) -> Dict:
-        """List all currently available custom resources of a kind internally."""
-        cls = self.__class__
-        try:
-            api_response = self.co_api.list_namespaced_custom_object(
-                self.group,
-                self.version,
-                self.namespace,
-                self.plural,
-                label_selector=self.label_selector,
-                _request_timeout=cls.REQUEST_TIMEOUT
-            )
-        except ApiException as err:
-            _LOGGER.error(
-                '%s/%s: Exception when listing of CRs: %s', self.group, self.plural, err)
-            raise
-        else:
-            _LOGGER.debug(
-                '%s/%s: Successfully listed all CRs', self.group, self.plural)
-            return api_response
-
-    def process_all_crs(self) -> None:
+    def process_all_crs(
+            self, operation: str = 'REPROCESS', robot_name: Optional[str] = None) -> None:
         """
         Reprocess custom resources.
 
         This method processes all existing custom resources with the given operation.
+        If robot_name is set, only custom resources labeled with this robot are processed.
         """
+        cls = self.__class__
         _LOGGER.debug('%s/%s: CR reprocess started', self.group, self.plural)
         with self._cr_cache_lock:
             crs = copy.deepcopy(list(self._cr_cache.values()))
@@ -686,9 +637,11 @@ class K8sCRHandler:
                 continue
             name = metadata['name']
             labels = metadata.get('labels', {})
+            if robot_name is not None and labels.get(cls.ROBOT_LABEL) != robot_name:
+                continue
             # Submit callbacks to ThreadPoolExecutor
             futures.append(self.executor.submit(
-                self._callback, name, labels, 'REPROCESS', obj))
+                self._callback, name, labels, operation, obj))
 
         # Wait for all futures
         for future in futures:
@@ -721,7 +674,12 @@ class K8sCRHandler:
         """Stop watching CR stream."""
         self.thread_run = False
         _LOGGER.info('Stopping watcher for %s/%s', self.group, self.plural)
-        self.watcher.stop()
+        with self._selector_lock:
+            self._subscribed = False
+            if self._selector_timer is not None:
+                self._selector_timer.cancel()
+                self._selector_timer = None
+        self.informer.unsubscribe(self)
         _LOGGER.info('Stopping ThreadPoolExecutor')
         self.executor.shutdown(wait=False)
 
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""On-disk snapshots of K8s custom resource caches."""
+
+import os
+import logging
+import hashlib
+import json
+import zlib
+
+from typing import Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CacheSnapshot:
+    """
+    Save and load a custom resource cache together with its resourceVersion.
+
+    Snapshots are written as msgpack if available, as zlib compressed JSON otherwise.
+    """
+
+    FORMAT_MSGPACK = b'M'
+    FORMAT_ZJSON = b'Z'
+
+    def __init__(self, directory: str, group: str, version: str, plural: str, namespace: str,
+                 label_selector: str) -> None:
+        """Construct."""
+        self.key = [group, version, plural, namespace, label_selector]
+        selector_hash = hashlib.sha1(label_selector.encode()).hexdigest()[:10]
+        filename = '{}.{}.{}.{}.{}.snapshot'.format(
+            plural, group, version, namespace, selector_hash)
+        self.path = os.path.join(directory, filename)
+
+    @classmethod
+    def _dumps(cls, data: Dict) -> bytes:
+        """Serialize snapshot data."""
+        if msgpack is not None:
+            return cls.FORMAT_MSGPACK + msgpack.packb(data, use_bin_type=True)
+        return cls.FORMAT_ZJSON + zlib.compress(json.dumps(data).encode())
+
+    @classmethod
+    def _loads(cls, raw: bytes) -> Dict:
+        """Deserialize snapshot data."""
+        data_format, payload = raw[:1], raw[1:]
+        if data_format == cls.FORMAT_MSGPACK:
+            if msgpack is None:
+                raise ValueError('Snapshot is msgpack encoded, but msgpack is not installed')
+            return msgpack.unpackb(payload, raw=False)
+        if data_format == cls.FORMAT_ZJSON:
+            return json.loads(zlib.decompress(payload).decode())
+        raise ValueError('Unknown snapshot format {!r}'.format(data_format))
+
+    def save(self, resource_version: str, cr_cache: Dict[str, Dict]) -> None:
+        """Write snapshot atomically."""
+        data = {'key': self.key, 'resourceVersion': resource_version, 'items': cr_cache}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(self._dumps(data))
+        os.replace(tmp_path, self.path)
+        _LOGGER.debug(
+            'Saved snapshot of %s CRs at resourceVersion "%s" to %s', len(cr_cache),
+            resource_version, self.path)
+
+    def load(self) -> Optional[Tuple[str, Dict[str, Dict]]]:
+        """Load snapshot. Return resourceVersion and CR cache or None if not available."""
+        try:
+            with open(self.path, 'rb') as file:
+                data = self._loads(file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error) as err:
+            _LOGGER.error('Unable to load snapshot %s: %s', self.path, err)
+            return None
+
+        if data.get('key') != self.key or not data.get('resourceVersion'):
+            _LOGGER.error('Snapshot %s does not match custom resource, skipping it', self.path)
+            return None
+
+        _LOGGER.info(
+            'Loaded snapshot of %s CRs at resourceVersion "%s" from %s', len(data['items']),
+            data['resourceVersion'], self.path)
+        return data['resourceVersion'], data['items']
@@ -17,6 +17,11 @@ REQUIRES = [
     'kubernetes==21.7.0'
     ]
 
+EXTRAS_REQUIRE = {
+    'snapshot': ['msgpack'],
+    'asyncio': ['kubernetes_asyncio==21.7.1']
+    }
+
 setup(
     name='k8scrhandler',
     version='0.2.0',
@@ -26,5 +31,6 @@ setup(
     license='Apache License 2.0',
     packages=find_packages(),
     include_package_data=True,
-    install_requires=REQUIRES
+    install_requires=REQUIRES,
+    extras_require=EXTRAS_REQUIRE
 )
@@ -123,8 +123,11 @@ _LOGGER.info('Log level is %s', LOG_LEVEL)
 def main() -> None:
     """Run main program."""
     try:
-        # Run mir mission controller
-        mc.run_missioncontroller()
+        # Run mir mission controller for a fleet or a single robot
+        if os.environ.get('MIR_FLEET_CONFIG'):
+            mc.run_fleetcontroller()
+        else:
+            mc.run_missioncontroller()
     except Exception as err:  # pylint: disable=broad-except
         _LOGGER.critical('Unexpected error in main program: %s', err, exc_info=True)
         sys.exit('Application terminated with error')
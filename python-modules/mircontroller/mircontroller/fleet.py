@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Control a fleet of MiR robots from one process."""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import attr
+
+from .mirapi import MiRConfig, MiRInterface
+from .mirrobot import MiRRobot
+from .mission import MissionController, MissionHandler
+from .robot import RobotController, RobotHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@attr.s(frozen=True)
+class MiRFleetRobot:
+    """Configuration of a MiR robot in a fleet."""
+
+    name = attr.ib(validator=attr.validators.instance_of(str), converter=str)
+    host = attr.ib(validator=attr.validators.instance_of(str), converter=str)
+    user = attr.ib(validator=attr.validators.instance_of(str), converter=str)
+    password = attr.ib(validator=attr.validators.instance_of(str), converter=str)
+    trolley_attached_plc = attr.ib(validator=attr.validators.instance_of(int), converter=int)
+    localization_failed_max_reset = attr.ib(
+        default=0, validator=attr.validators.instance_of(int), converter=int)
+
+
+def load_fleet_config(path: str) -> List[MiRFleetRobot]:
+    """
+    Load MiR robots of a fleet from a JSON file.
+
+    The file contains a list of robots with keys name, host, user, password, trolleyAttachedPlc
+    and localizationFailedMaxReset. User and password default to environment variables MIR_USER
+    and MIR_PASSWORD.
+    """
+    with open(path, encoding='utf-8') as file:
+        robots_json = json.load(file)
+
+    robots = []
+    for robot in robots_json:
+        user = robot.get('user', os.environ.get('MIR_USER'))
+        password = robot.get('password', os.environ.get('MIR_PASSWORD'))
+        if user is None or password is None:
+            raise ValueError('No user or password for MiR robot "{}"'.format(robot.get('name')))
+        robots.append(MiRFleetRobot(
+            name=robot['name'], host=robot['host'], user=user, password=password,
+            trolley_attached_plc=robot['trolleyAttachedPlc'],
+            localization_failed_max_reset=robot.get('localizationFailedMaxReset', 0)))
+
+    return robots
+
+
+class MiRFleetController:
+    """
+    Control multiple MiR robots from one process.
+
+    All robots share one mission and one robot CR handler, thus there is only one watch per
+    custom resource for the whole fleet. Missions of each robot run isolated in their own
+    thread. Status updates and error resets of all robots are scheduled on one asyncio event
+    loop and their MiR REST requests run in a shared thread pool.
+
+    MiR REST requests are retried for up to a minute when a robot is not reachable. Thus each
+    robot runs only one periodic job at a time, and by default there is one thread for each
+    robot. An unreachable robot then never blocks the jobs of the other robots.
+    """
+
+    # Seconds between two status updates and error resets of a robot
+    STATUS_INTERVAL = 2.0
+    ERROR_RESET_INTERVAL = 2.0
+
+    def __init__(
+            self, robots: List[MiRFleetRobot], namespace: str,
+            max_workers: Optional[int] = None) -> None:
+        """Construct."""
+        # Shared CR handlers watching CRs of all robots of the fleet
+        self.mission_handler = MissionHandler(namespace)
+        self.robot_handler = RobotHandler(namespace)
+        robot_names = [robot.name for robot in robots]
+        self.mission_handler.add_selector_robots(robot_names)
+        self.robot_handler.add_selector_robots(robot_names)
+
+        self.mir_robots: Dict[str, MiRRobot] = {}
+        self.mission_controllers: Dict[str, MissionController] = {}
+        self.robot_controllers: Dict[str, RobotController] = {}
+        for robot in robots:
+            mir_api = MiRInterface(MiRConfig(
+                host=robot.host, user=robot.user, password=robot.password))
+            mir_robot = MiRRobot(
+                mir_api, robot.name, robot.trolley_attached_plc,
+                robot.localization_failed_max_reset)
+            self.mir_robots[robot.name] = mir_robot
+            self.mission_controllers[robot.name] = MissionController(
+                mir_robot, self.mission_handler)
+            self.robot_controllers[robot.name] = RobotController(mir_robot, self.robot_handler)
+
+        # Periodic jobs of a robot run one after another, one thread per robot is sufficient
+        if max_workers is None:
+            max_workers = max(1, len(robots))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='mir-fleet')
+        self._loop_thread = threading.Thread(
+            target=self._run_event_loop, name='mir-fleet-loop', daemon=True)
+        # Control flag for event loop
+        self.thread_run = True
+        # Dict to save thread exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
+        # Locks of robots, created on the event loop
+        self._robot_locks: Dict[str, asyncio.Lock] = {}
+
+    def run(self) -> None:
+        """Start handlers, mission threads of all robots and the event loop."""
+        self.mission_handler.run(multiple_executor_threads=True)
+        self.robot_handler.run()
+        for mission_controller in self.mission_controllers.values():
+            mission_controller.mission_watcher_thread.start()
+        self._loop_thread.start()
+        _LOGGER.info('MiR fleet controller started for %s robots', len(self.mir_robots))
+
+    def stop(self) -> None:
+        """Stop all robots and handlers."""
+        self.thread_run = False
+        for mission_controller in self.mission_controllers.values():
+            mission_controller.stop()
+        for robot_controller in self.robot_controllers.values():
+            robot_controller.stop()
+        self.mission_handler.stop_watcher()
+        self.robot_handler.stop_watcher()
+        self._executor.shutdown(wait=False)
+        for mir_robot in self.mir_robots.values():
+            mir_robot.stop()
+
+    def _run_event_loop(self) -> None:
+        """Run periodic jobs of all robots on an event loop."""
+        try:
+            asyncio.run(self._run_robot_jobs())
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error('Error in MiR fleet event loop: %s', err, exc_info=True)
+            # On uncovered exception in thread save the exception
+            self.thread_exceptions['fleet_loop'] = err
+
+    async def _run_robot_jobs(self) -> None:
+        """Run periodic jobs of all robots."""
+        cls = self.__class__
+        tasks = []
+        for name, mir_robot in self.mir_robots.items():
+            self._robot_locks[name] = asyncio.Lock()
+            tasks.append(self._run_periodic(
+                name, 'status', self.robot_controllers[name].update_robot_status,
+                cls.STATUS_INTERVAL))
+            tasks.append(self._run_periodic(
+                name, 'error reset', mir_robot.unpause_robot_reset_error,
+                cls.ERROR_RESET_INTERVAL))
+        await asyncio.gather(*tasks)
+
+    async def _run_periodic(
+            self, robot_name: str, job_name: str, job: Callable[[], None],
+            interval: float) -> None:
+        """Run a job of a robot periodically in the shared thread pool."""
+        loop = asyncio.get_running_loop()
+        robot_lock = self._robot_locks[robot_name]
+        _LOGGER.info('%s loop of robot %s started', job_name.capitalize(), robot_name)
+        while self.thread_run:
+            started = loop.time()
+            try:
+                # Only one job of a robot occupies a thread of the pool
+                async with robot_lock:
+                    await loop.run_in_executor(self._executor, job)
+            except RuntimeError:
+                # Executor shut down
+                break
+            except Exception as err:  # pylint: disable=broad-except
+                # Errors of one robot must not affect the other robots of the fleet
+                _LOGGER.error(
+                    'Error in %s loop of robot %s: %s', job_name, robot_name, err, exc_info=True)
+            await asyncio.sleep(max(0.0, started + interval - loop.time()))
+        _LOGGER.info('%s loop of robot %s stopped', job_name.capitalize(), robot_name)
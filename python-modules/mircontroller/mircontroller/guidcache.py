@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Cache for GUIDs of MiR missions and positions."""
+
+import logging
+import threading
+
+from typing import Dict, Iterable, Tuple
+
+from requests import RequestException
+
+from .mirapi import MiRInterface
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MiRGuidCache:
+    """
+    GUIDs of MiR missions and positions indexed by name.
+
+    Missions are indexed by name, positions by (map_guid, name, type_id). Both indexes are loaded
+    from MiR REST API on a miss and refreshed in background when the active map of the robot
+    changes. Entries rejected by the robot could be invalidated to reload them on next access.
+    """
+
+    def __init__(self, mir_api: MiRInterface) -> None:
+        """Construct."""
+        self._mir_api = mir_api
+        # Mission name -> mission GUID
+        self._missions: Dict[str, str] = {}
+        # (map GUID, position name, position type id) -> position GUID
+        self._positions: Dict[Tuple[str, str, int], str] = {}
+        self._active_map = ''
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+
+    def refresh_missions(self) -> None:
+        """Load missions index from MiR REST API."""
+        http_resp = self._mir_api.http_get('missions')
+        missions: Dict[str, str] = {}
+        for item in http_resp.json():
+            # First mission wins if names are not unique
+            missions.setdefault(item['name'], item['guid'])
+        with self._lock:
+            self._missions = missions
+        _LOGGER.debug('Mission GUID cache loaded with %s missions', len(missions))
+
+    def refresh_positions(self) -> None:
+        """Load positions index from MiR REST API."""
+        http_resp = self._mir_api.http_get('positions')
+        positions: Dict[Tuple[str, str, int], str] = {}
+        for item in http_resp.json():
+            positions.setdefault((item['map'], item['name'], item['type_id']), item['guid'])
+        with self._lock:
+            self._positions = positions
+        _LOGGER.debug('Position GUID cache loaded with %s positions', len(positions))
+
+    def refresh(self) -> None:
+        """Load missions and positions index from MiR REST API."""
+        # Skip if another refresh is running, it loads the same data
+        if not self._refresh_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return
+        try:
+            self.refresh_missions()
+            self.refresh_positions()
+        except RequestException as err:
+            _LOGGER.error('Error refreshing MiR GUID cache: %s', err)
+        finally:
+            self._refresh_lock.release()
+
+    def set_active_map(self, map_guid: str) -> None:
+        """Set active map of the robot and refresh cache in background when it changed."""
+        with self._lock:
+            if map_guid == self._active_map:
+                return
+            self._active_map = map_guid
+        _LOGGER.info('Active map changed to %s, refreshing MiR GUID cache', map_guid)
+        self._refresh_thread = threading.Thread(target=self.refresh, daemon=True)
+        self._refresh_thread.start()
+
+    def mission_guid(self, mission: str) -> str:
+        """Get the GUID of a mission by its name."""
+        guid = self._missions.get(mission)
+        if guid is None:
+            # Reload missions on a miss
+            self.refresh_missions()
+            guid = self._missions.get(mission, '')
+
+        return guid
+
+    def position_guid(self, position: str, map_guid: str, type_ids: Iterable[int]) -> str:
+        """Get the GUID of a position by its name, map and one of the type ids."""
+        guid = self._lookup_position(position, map_guid, type_ids)
+        if not guid:
+            # Reload positions on a miss
+            self.refresh_positions()
+            guid = self._lookup_position(position, map_guid, type_ids)
+
+        return guid
+
+    def invalidate_mission(self, mission: str) -> None:
+        """Drop the GUID of a mission, it is reloaded on next access."""
+        with self._lock:
+            self._missions.pop(mission, None)
+
+    def invalidate_position(self, position: str, map_guid: str) -> None:
+        """Drop the GUIDs of a position of all types, they are reloaded on next access."""
+        with self._lock:
+            self._positions = {
+                key: guid for key, guid in self._positions.items()
+                if key[:2] != (map_guid, position)}
+
+    def _lookup_position(self, position: str, map_guid: str, type_ids: Iterable[int]) -> str:
+        """Lookup a position GUID in the index."""
+        positions = self._positions
+        for type_id in type_ids:
+            guid = positions.get((map_guid, position, type_id))
+            if guid is not None:
+                return guid
+
+        return ''
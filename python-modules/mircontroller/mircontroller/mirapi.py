@@ -12,15 +12,16 @@
 
 """Connect RobCo to MiR robot."""
 
-from typing import Optional, Dict
-import json
+from typing import Callable, Optional, Dict
 import os
 import logging
 
 import attr
 import requests
+from requests.adapters import HTTPAdapter
 from retrying import retry
-from websocket import create_connection, WebSocketTimeoutException
+
+from .rosbridge import RosbridgeClient, RosbridgeTimeout
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -56,9 +57,16 @@ class MiRConfig:
 class MiRInterface:
     """Send commands to MiR robots via REST."""
 
-    def __init__(self) -> None:
+    # Maximum number of keep-alive connections to the robot
+    HTTP_POOL_SIZE = 8
+
+    def __init__(self, mirconfig: Optional[MiRConfig] = None) -> None:
         """Construct."""
-        self.init_mir_fromenv()
+        if mirconfig is None:
+            self.init_mir_fromenv()
+        else:
+            self.mirconfig = mirconfig
+        self.init_connections()
 
     def init_mir_fromenv(self) -> None:
         """Initialize MiR interface from environment variables."""
@@ -78,18 +86,26 @@ class MiRInterface:
             user=envvar['MIR_USER'],
             password=envvar['MIR_PASSWORD'])
 
+    def init_connections(self) -> None:
+        """Initialize HTTP and websocket connections to the robot."""
+        # Keep-alive HTTP connections to the robot, shared by all threads of the controller
+        self._session = requests.Session()
+        self._session.auth = (self.mirconfig.user, self.mirconfig.password)
+        self._session.headers['Accept'] = 'application/json'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.HTTP_POOL_SIZE)
+        self._session.mount('http://', adapter)
+
+        # Persistent rosbridge connection, opened on first use
+        self.rosbridge = RosbridgeClient('ws://{host}:9090'.format(host=self.mirconfig.host))
+
     @retry(retry_on_exception=identify_conn_exception, wait_fixed=1000, stop_max_attempt_number=10)
     def http_delete(self, endpoint: str) -> None:
         """Delete data via MiR REST interface."""
         # Prepare uri
         uri = 'http://{host}/api/v2.0.0/{endpoint}'.format(
             host=self.mirconfig.host, endpoint=endpoint)
-        # Prepare additional headers
-        headers = {'Accept': 'application/json'}
-
         # Call REST service
-        resp = requests.delete(uri, headers=headers, timeout=5.0, auth=(
-            self.mirconfig.user, self.mirconfig.password))
+        resp = self._session.delete(uri, timeout=5.0)
 
         if 400 <= resp.status_code < 500:
             msg = '{} error on DELETE call to {} - Bad HTTP request'.format(
@@ -108,11 +124,8 @@ class MiRInterface:
         # Prepare uri
         uri = 'http://{host}/api/v2.0.0/{endpoint}'.format(
             host=self.mirconfig.host, endpoint=endpoint)
-        # Prepare additional headers
-        headers = {'Accept': 'application/json'}
         # Call REST service
-        resp = requests.get(
-            uri, headers=headers, timeout=5.0, auth=(self.mirconfig.user, self.mirconfig.password))
+        resp = self._session.get(uri, timeout=5.0)
 
         if resp.status_code not in HTTP_SUCCESS:
             msg = '{} error on GET call to {} - HTTP status failed'.format(
@@ -129,15 +142,11 @@ class MiRInterface:
         # Prepare uri
         uri = 'http://{host}/api/v2.0.0/{endpoint}'.format(
             host=self.mirconfig.host, endpoint=endpoint)
-        # Prepare additional headers
-        headers = {'Accept': 'application/json'}
         # Prepare JSON body
         if jsonbody is None:
             jsonbody = {}
         # Call REST service
-        resp = requests.post(
-            uri, json=jsonbody, headers=headers, timeout=5.0,
-            auth=(self.mirconfig.user, self.mirconfig.password))
+        resp = self._session.post(uri, json=jsonbody, timeout=5.0)
 
         if 400 <= resp.status_code < 500:
             msg = '{} error on POST call to {} - Bad HTTP request'.format(
@@ -159,15 +168,11 @@ class MiRInterface:
         # Prepare uri
         uri = 'http://{host}/api/v2.0.0/{endpoint}'.format(
             host=self.mirconfig.host, endpoint=endpoint)
-        # Prepare additional headers
-        headers = {'Accept': 'application/json'}
         # Prepare JSON body
         if jsonbody is None:
             jsonbody = {}
         # Call REST service
-        resp = requests.put(
-            uri, json=jsonbody, headers=headers, timeout=5.0,
-            auth=(self.mirconfig.user, self.mirconfig.password))
+        resp = self._session.put(uri, json=jsonbody, timeout=5.0)
 
         if 400 <= resp.status_code < 500:
             msg = '{} error on PUT call to {} - Bad HTTP request'.format(
@@ -185,13 +190,23 @@ class MiRInterface:
     def send_ws_message(self, message: Dict) -> None:
         """Send a message via websocket."""
         try:
-            # Open websocket connection
-            wsclient = create_connection('ws://{host}:9090'.format(
-                host=self.mirconfig.host), timeout=5)
-            wsclient.send(json.dumps(message))
-        except (WebSocketTimeoutException, TimeoutError):
+            self.rosbridge.send(message)
+        except RosbridgeTimeout:
             msg = 'Connection to rosbridge websocket timed out'
             _LOGGER.debug(msg)
             raise requests.Timeout(msg)
-        else:
-            wsclient.close()
+
+    def subscribe_ws_topic(
+            self, topic: str, msg_type: str, callback: Callable[[Dict], None],
+            throttle_rate: int = 0) -> None:
+        """Subscribe to a ROS topic via websocket."""
+        self.rosbridge.subscribe(topic, msg_type, callback, throttle_rate)
+
+    def unsubscribe_ws_topic(self, topic: str) -> None:
+        """Unsubscribe from a ROS topic via websocket."""
+        self.rosbridge.unsubscribe(topic)
+
+    def close(self) -> None:
+        """Close HTTP and websocket connections to the robot."""
+        self.rosbridge.stop()
+        self._session.close()
@@ -17,14 +17,18 @@ import datetime
 import time
 import os
 import math
+import threading
 
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from requests import RequestException
 from prometheus_client import Gauge, Histogram
 
 from robcoewmtypes.robot import RobotMission
 
-from .mirapi import MiRInterface, HTTPstatusCodeFailed
+from .mirapi import MiRInterface, HTTPbadPostRequest, HTTPstatusCodeFailed
+from .guidcache import MiRGuidCache
+from .metrics import GaugeSnapshot, LabeledChildren
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -107,9 +111,27 @@ class MiRRobot:
         'sap_robot_position_orientation', 'Robot\'s orientation in degree', ['robot'])
     p_theta = Gauge('sap_robot_position_theta', 'Robot\'s orientation in rad', ['robot'])
 
-    def __init__(self, mir_api: MiRInterface) -> None:
-        """Construct."""
+    # Maximum age in seconds of a status snapshot to be reused instead of fetching status again
+    STATUS_MAX_AGE = 2.0
+
+    def __init__(
+            self, mir_api: MiRInterface, robco_robot_name: Optional[str] = None,
+            trolley_attached_plc: Optional[int] = None, loc_failed_max_reset: int = 0) -> None:
+        """
+        Construct.
+
+        Robot attributes are read from environment variables if robco_robot_name is not set.
+        """
         self._mir_api = mir_api
+        # Last status response of the robot and its timestamp
+        self._status_snapshot: Optional[Dict] = None
+        self._status_snapshot_ts = 0.0
+        self._status_lock = threading.Lock()
+        # Executor for independent status reads
+        self._update_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='mir-update')
+        # Cache for mission and position GUIDs
+        self._guid_cache = MiRGuidCache(mir_api)
         self.battery_percentage = 1.0
         self.state = RobcoRobotStates.STATE_UNDEFINED
         self.last_state_change = '1970-01-01T00:00:00.000Z'
@@ -122,11 +144,40 @@ class MiRRobot:
         self.pos_y = 0.0
         self.pos_orientation = 0.0
         self.pos_theta = 0.0
+        # MiR state id and listeners called when it changes
+        self.mir_state_id = 0
+        self._state_listeners: List[Callable[[int], None]] = []
+        # Action type by mission queue action URL, types of existing actions do not change
+        self._action_types: Dict[str, str] = {}
         # Error handling
         self.error_resetted = False
         self._loc_failed_reset_count = 0
-        # Init attributes from environment variables
-        self.init_robot_fromenv()
+        if robco_robot_name is None:
+            # Init attributes from environment variables
+            self.init_robot_fromenv()
+        else:
+            if trolley_attached_plc is None:
+                raise ValueError('PLC register for trolley attached is not set')
+            self.robco_robot_name = robco_robot_name
+            self.trolley_attached_plc = trolley_attached_plc
+            self._loc_failed_max_reset = loc_failed_max_reset
+
+        # Prometheus metrics of this robot
+        cls = self.__class__
+        self._p_gauges = GaugeSnapshot({
+            'battery_percentage': cls.p_battery_percentage,
+            'angular_speed': cls.p_angular_speed,
+            'linear_speed': cls.p_linear_speed,
+            'position_x': cls.p_position_x,
+            'position_y': cls.p_position_y,
+            'orientation': cls.p_orientation,
+            'theta': cls.p_theta}, robot=self.robco_robot_name)
+        self._p_state = LabeledChildren(cls.p_state, robot=self.robco_robot_name)
+
+    def stop(self) -> None:
+        """Stop update threads and close connections to the robot."""
+        self._update_executor.shutdown(wait=False)
+        self._mir_api.close()
 
     def init_robot_fromenv(self) -> None:
         """Initialize EWM Robot from environment variables."""
@@ -172,20 +223,39 @@ class MiRRobot:
             latest_action = max(latest_action, action['id'])
 
         if latest_action != 0:
-            # Get action details from REST interface
-            http_resp_action = self._mir_api.http_get(
-                'mission_queue/{qm}/actions/{act}'.format(qm=mission, act=latest_action))
-            # Only if HTTP request has a valid response
-            if http_resp_action:
-                json_resp_action = http_resp_action.json()
-                if json_resp_action['action_type'] in [
-                        'docking', 'pickup_shelf', 'place_shelf']:
-                    return RobotMission.ACTION_DOCKING
-                elif json_resp_action['action_type'] == 'move':
-                    return RobotMission.ACTION_MOVING
+            endpoint = 'mission_queue/{qm}/actions/{act}'.format(qm=mission, act=latest_action)
+            action_type = self._action_types.get(endpoint)
+            if action_type is None:
+                # Get action details from REST interface
+                http_resp_action = self._mir_api.http_get(endpoint)
+                # Only if HTTP request has a valid response
+                if http_resp_action:
+                    action_type = http_resp_action.json()['action_type']
+                    self._action_types[endpoint] = action_type
+            if action_type in ['docking', 'pickup_shelf', 'place_shelf']:
+                return RobotMission.ACTION_DOCKING
+            elif action_type == 'move':
+                return RobotMission.ACTION_MOVING
 
         return ''
 
+    def clear_mission_action_types(self, mission: str) -> None:
+        """Clear cached action types of a mission."""
+        prefix = 'mission_queue/{qm}/'.format(qm=mission)
+        for endpoint in [e for e in self._action_types if e.startswith(prefix)]:
+            del self._action_types[endpoint]
+
+    def add_state_listener(self, callback: Callable[[int], None]) -> None:
+        """Add a callback which is called with the new MiR state id when it changes."""
+        self._state_listeners.append(callback)
+
+    def remove_state_listener(self, callback: Callable[[int], None]) -> None:
+        """Remove a MiR state listener."""
+        try:
+            self._state_listeners.remove(callback)
+        except ValueError:
+            pass
+
     def get_mission_state(self, mission: str) -> Tuple[str, str]:
         """Get the state of a mission of mission queue."""
         # Get data from REST interface
@@ -198,15 +268,7 @@ class MiRRobot:
 
     def mission_guid_by_name(self, mission: str) -> str:
         """Get the GUID of a mission by its name."""
-        # Get data from REST interface
-        http_resp = self._mir_api.http_get('missions')
-
-        # Get position GUID from response
-        for item in http_resp.json():
-            if item['name'] == mission:
-                return item['guid']
-
-        return ''
+        return self._guid_cache.mission_guid(mission)
 
     def position_guid_by_name(self, position: str, map_guid: str, pos_type: str) -> str:
         """Get the GUID of a position by its name."""
@@ -221,32 +283,49 @@ class MiRRobot:
         else:
             raise ValueError('Position type "{}" is not known'.format(pos_type))
 
-        # Get data from REST interface
-        http_resp = self._mir_api.http_get('positions')
-
-        # Get position GUID from response
-        for item in http_resp.json():
-            if (item['map'] == map_guid
-                    and item['name'] == position
-                    and item['type_id'] in type_ids):
-                return item['guid']
+        # Get position GUID from cache
+        guid = self._guid_cache.position_guid(position, map_guid, type_ids)
+        if guid:
+            return guid
 
         # Otherwise ERROR
         _LOGGER.error('Error getting "position guid" for "%s"', position)
         return ''
 
-    def get_trolley(self, dock_name: str) -> str:
-        """Go to the docking position and get a trolley there."""
+    def _queue_mission(
+            self, mission: str, position: str, pos_type: str, position_param: str, message: str,
+            parameters: Optional[List[Dict]] = None) -> str:
+        """Add a mission with a position parameter to the mission queue of the robot."""
         cls = self.__class__
+        mission_name = cls.mission_mapping[mission]
+        map_guid = self.active_map
+        try:
+            return self._post_mission(
+                mission_name, position, map_guid, pos_type, position_param, message, parameters)
+        except HTTPbadPostRequest as err:
+            # Cached GUIDs might be outdated, reload them and try once more
+            _LOGGER.warning(
+                'Mission "%s" at position "%s" rejected, reloading GUIDs and retrying: %s',
+                mission_name, position, err)
+            self._guid_cache.invalidate_mission(mission_name)
+            self._guid_cache.invalidate_position(position, map_guid)
+
+        return self._post_mission(
+            mission_name, position, map_guid, pos_type, position_param, message, parameters)
+
+    def _post_mission(
+            self, mission_name: str, position: str, map_guid: str, pos_type: str,
+            position_param: str, message: str, parameters: Optional[List[Dict]]) -> str:
+        """Post a mission to the mission queue of the robot and return its id."""
         # Get relevant parameters
-        pos_guid = self.position_guid_by_name(dock_name, self.active_map, cls.POSTYPE_DOCK)
-        mis_guid = self.mission_guid_by_name(cls.mission_mapping['getTrolley'])
+        pos_guid = self.position_guid_by_name(position, map_guid, pos_type)
+        mis_guid = self.mission_guid_by_name(mission_name)
 
         # Prepare POST body for request
         jsonbody = {
             'mission_id': mis_guid,
-            'parameters': [{'input_name': 'dock_name', 'value': pos_guid}],
-            'message': 'Get trolley at {}'.format(dock_name),
+            'parameters': [{'input_name': position_param, 'value': pos_guid}] + (parameters or []),
+            'message': message,
             'priority': 0
             }
 
@@ -255,87 +334,83 @@ class MiRRobot:
         resp_json = http_resp.json()
         return str(resp_json['id'])
 
+    def get_trolley(self, dock_name: str) -> str:
+        """Go to the docking position and get a trolley there."""
+        cls = self.__class__
+        return self._queue_mission(
+            'getTrolley', dock_name, cls.POSTYPE_DOCK, 'dock_name',
+            'Get trolley at {}'.format(dock_name))
+
     def return_trolley(self, dock_name: str) -> str:
         """Go to the docking position and return robot's trolley there."""
         cls = self.__class__
-        # Get relevant parameters
-        pos_guid = self.position_guid_by_name(dock_name, self.active_map, cls.POSTYPE_DOCK)
-        mis_guid = self.mission_guid_by_name(cls.mission_mapping['returnTrolley'])
-
-        # Prepare POST body for request
-        jsonbody = {
-            'mission_id': mis_guid,
-            'parameters': [{'input_name': 'dock_name', 'value': pos_guid}],
-            'message': 'Return trolley to {}'.format(dock_name),
-            'priority': 0
-            }
-
-        http_resp = self._mir_api.http_post('mission_queue', jsonbody=jsonbody)
-
-        resp_json = http_resp.json()
-        return str(resp_json['id'])
+        return self._queue_mission(
+            'returnTrolley', dock_name, cls.POSTYPE_DOCK, 'dock_name',
+            'Return trolley to {}'.format(dock_name))
 
     def moveto_named_position(self, target_name: str) -> str:
         """Move robot to a named position of the map."""
         cls = self.__class__
-        # Get relevant parameters
-        pos_guid = self.position_guid_by_name(target_name, self.active_map, cls.POSTYPE_POSITION)
-        mis_guid = self.mission_guid_by_name(cls.mission_mapping['moveToNamedPosition'])
-
-        # Prepare POST body for request
-        jsonbody = {
-            'mission_id': mis_guid,
-            'parameters': [{'input_name': 'target_name', 'value': pos_guid}],
-            'message': 'Move to position {}'.format(target_name),
-            'priority': 0
-            }
-
-        http_resp = self._mir_api.http_post('mission_queue', jsonbody=jsonbody)
-
-        resp_json = http_resp.json()
-        return str(resp_json['id'])
+        return self._queue_mission(
+            'moveToNamedPosition', target_name, cls.POSTYPE_POSITION, 'target_name',
+            'Move to position {}'.format(target_name))
 
     def charge_robot(
             self, charger_name: str, threshold_battery: float, target_battery: float) -> str:
         """Charge robot at the charging position."""
         cls = self.__class__
-        # Get relevant parameters
-        pos_guid = self.position_guid_by_name(charger_name, self.active_map, cls.POSTYPE_CHARGER)
-        mis_guid = self.mission_guid_by_name(cls.mission_mapping['charge'])
-
-        # Prepare POST body for request
-        jsonbody = {
-            'mission_id': mis_guid,
-            'parameters': [
-                {'input_name': 'charger_name', 'value': pos_guid},
+        return self._queue_mission(
+            'charge', charger_name, cls.POSTYPE_CHARGER, 'charger_name',
+            'Charging robot until battery reaches {}%'.format(target_battery),
+            parameters=[
                 {'input_name': 'threshold_battery', 'value': threshold_battery},
                 {'input_name': 'target_battery', 'value': target_battery}
-                ],
-            'message': 'Charging robot until battery reaches {}%'.format(target_battery),
-            'priority': 0
-            }
-
-        http_resp = self._mir_api.http_post('mission_queue', jsonbody=jsonbody)
-
-        resp_json = http_resp.json()
-        return str(resp_json['id'])
+                ])
 
     def update(self) -> None:
         """Update entire MiR robot."""
-        self.update_robot_status()
-        self.update_trolley_attached()
+        # Status and trolley register are independent, read them concurrently
+        futures = [
+            self._update_executor.submit(self.update_robot_status),
+            self._update_executor.submit(self.update_trolley_attached)]
+        for future in futures:
+            future.result()
+
+    def get_status(self, max_age: float = 0.0) -> Dict:
+        """
+        Get status of the robot.
+
+        A snapshot of the last status request is returned if it is not older than max_age
+        seconds. Raises RequestException if status could not be fetched.
+        """
+        with self._status_lock:
+            if (self._status_snapshot is not None
+                    and time.time() - self._status_snapshot_ts <= max_age):
+                return self._status_snapshot
+        # Get data from REST interface
+        http_resp = self._mir_api.http_get('status')
+        json_resp = http_resp.json()
+        with self._status_lock:
+            self._status_snapshot = json_resp
+            self._status_snapshot_ts = time.time()
+
+        return json_resp
+
+    def invalidate_status(self) -> None:
+        """Invalidate status snapshot when the robot state was changed."""
+        with self._status_lock:
+            self._status_snapshot = None
 
     def update_robot_status(self) -> None:
         """Update robot status."""
-        # Get data from REST interface
         try:
-            http_resp = self._mir_api.http_get('status')
+            json_resp = self.get_status()
         except RequestException:
             self.state = RobcoRobotStates.STATE_UNDEFINED
             _LOGGER.error('Error when updating robot status.')
         else:
-            json_resp = http_resp.json()
             self.active_map = '/v2.0.0/maps/{id}'.format(id=json_resp['map_id'])
+            self._guid_cache.set_active_map(self.active_map)
             # Don't update battery percentage when it is -1.
             # This happens when EMERGENCY_STOP button is pressed
             self.battery_percentage = json_resp[
@@ -348,9 +423,8 @@ class MiRRobot:
             self.pos_orientation = json_resp['position']['orientation']
             self.pos_theta = math.radians(self.pos_orientation)
             if self.state != json_resp['state_id']:
-                self.p_state.labels(  # pylint: disable=no-member
-                    robot=self.robco_robot_name, state=self.state).observe(
-                        time.time() - self.last_state_change_ts)
+                self._p_state.labels(state=self.state).observe(
+                    time.time() - self.last_state_change_ts)
                 self.last_state_change_ts = time.time()
                 self.last_state_change = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
@@ -358,25 +432,24 @@ class MiRRobot:
             self.state = RobcoRobotStates.MIR_TO_ROBCO.get(
                 json_resp['state_id'], RobcoRobotStates.STATE_UNDEFINED)
 
+            if self.mir_state_id != json_resp['state_id']:
+                self.mir_state_id = json_resp['state_id']
+                for callback in list(self._state_listeners):
+                    callback(self.mir_state_id)
+
             # Update prometheus metrics
             self.update_prometheus_metrics()
 
     def update_prometheus_metrics(self) -> None:
         """Update prometheus metrics for the robot."""
-        self.p_battery_percentage.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.battery_percentage)
-        self.p_angular_speed.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.angular_speed)
-        self.p_linear_speed.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.linear_speed)
-        self.p_position_x.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.pos_x)
-        self.p_position_y.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.pos_y)
-        self.p_orientation.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.pos_orientation)
-        self.p_theta.labels(  # pylint: disable=no-member
-            robot=self.robco_robot_name).set(self.pos_theta)
+        self._p_gauges.update(
+            battery_percentage=self.battery_percentage,
+            angular_speed=self.angular_speed,
+            linear_speed=self.linear_speed,
+            position_x=self.pos_x,
+            position_y=self.pos_y,
+            orientation=self.pos_orientation,
+            theta=self.pos_theta)
 
     def update_trolley_attached(self) -> None:
         """Update trolley attached attribute."""
@@ -393,19 +466,20 @@ class MiRRobot:
         """Unpause robot and reset error on MiR."""
         state_id = None
 
-        # Get data from REST interface
+        # Share status snapshot with status update loop
+        cls = self.__class__
         try:
-            http_resp = self._mir_api.http_get('status')
+            json_status = self.get_status(max_age=cls.STATUS_MAX_AGE)
         except RequestException:
             _LOGGER.error('Error when resetting error, not able to get status')
             state_id = None
         else:
-            state_id = http_resp.json()['state_id']
+            state_id = json_status['state_id']
 
         # Check if error raised by MiR MissionController module
         if state_id == 12:
             reset = False
-            errors = http_resp.json()['errors']
+            errors = json_status['errors']
             # Reset if there are only errors raised by MissionController module
             for error in errors:
                 if error.get('module') == 'MissionController':
@@ -437,6 +511,7 @@ class MiRRobot:
                 else:
                     _LOGGER.info('Error successfully reset')
                     self.error_resetted = True
+                    self.invalidate_status()
                     # Assume state is "pause" after reset
                     state_id = 4
 
@@ -450,6 +525,7 @@ class MiRRobot:
                 _LOGGER.error('Mission could not be continued')
             else:
                 self.error_resetted = False
+                self.invalidate_status()
                 _LOGGER.info('Mission continued')
 
     def reset_localization_failed_reset_counter(self) -> None:
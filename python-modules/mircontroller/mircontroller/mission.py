@@ -26,12 +26,33 @@ from prometheus_client import Counter
 from k8scrhandler.k8scrhandler import K8sCRHandler
 
 from .mirrobot import MiRRobot, RobcoMissionStates
+from .missiontracker import MissionStateTracker
+from .metrics import LabeledChildren
 from .helper import get_sample_cr, MainLoopController
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class MissionController(K8sCRHandler):
+class MissionHandler(K8sCRHandler):
+    """Handle mission custom resources of MiR robots."""
+
+    def __init__(self, namespace: str) -> None:
+        """Construct."""
+        template_cr = get_sample_cr('robco_mission')
+
+        labels: Dict[str, str] = {}
+        super().__init__(
+            'mission.cloudrobotics.com',
+            'v1alpha1',
+            'missions',
+            namespace,
+            template_cr,
+            labels,
+            robot_label_selector=True
+        )
+
+
+class MissionController:
     """MiR mission controller."""
 
     m_status_templ = {
@@ -55,31 +76,32 @@ class MissionController(K8sCRHandler):
         'returnTrolley': 'dockName'
         }
 
-    def __init__(self, mir_robot: MiRRobot, namespace: str) -> None:
+    def __init__(self, mir_robot: MiRRobot, handler: MissionHandler) -> None:
         """Construct."""
         # Instance of MiR robot
         self._mir_robot = mir_robot
+        # Mission CR handler, which could be shared with controllers of other robots
+        self.handler = handler
 
         self._active_mission: Dict[str, Dict] = {}
         self._missions: TOrderedDict[str, Dict] = OrderedDict()
         self._missions_lock = threading.RLock()
 
-        # Init CR superclass
-        labels = {}
-        labels['cloudrobotics.com/robot-name'] = self._mir_robot.robco_robot_name
-        template_cr = get_sample_cr('robco_mission')
-        super().__init__(
-            'mission.cloudrobotics.com',
-            'v1alpha1',
-            'missions',
-            namespace,
-            template_cr,
-            labels
-        )
+        # Control flag for threads
+        self.thread_run = True
+        # Dict to save thread exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
 
-        # Register CR callbacks
-        self.register_callback('ADDED_MODIFIED', ['ADDED', 'MODIFIED'], self.robco_mission_cb)
-        self.register_callback('DELETED', ['DELETED'], self.robco_mission_deleted_cb)
+        # Prometheus mission counter of this robot
+        self._p_missions = LabeledChildren(
+            self.mission_counter, robot=self._mir_robot.robco_robot_name)
+
+        # Register CR callbacks for missions of this robot
+        robot_name = self._mir_robot.robco_robot_name
+        self.handler.register_callback(
+            'ADDED_MODIFIED', ['ADDED', 'MODIFIED'], self.robco_mission_cb, robot_name)
+        self.handler.register_callback(
+            'DELETED', ['DELETED'], self.robco_mission_deleted_cb, robot_name)
 
         # Mission watcher thread
         self.mission_watcher_thread = threading.Thread(
@@ -89,13 +111,15 @@ class MissionController(K8sCRHandler):
         # Robot error reset thread
         self.robot_error_reset_thread = threading.Thread(target=self._reset_robot_error_loop)
 
-    def run(self, reprocess: bool = False, multiple_executor_threads: bool = False) -> None:
-        """Start running everything."""
+    def run(self) -> None:
+        """Start mission watcher and error reset threads."""
         self.mission_watcher_thread.start()
         _LOGGER.info('Automatically resetting errors from MissionController module on MiR robot')
         self.robot_error_reset_thread.start()
 
-        super().run(reprocess=reprocess, multiple_executor_threads=multiple_executor_threads)
+    def stop(self) -> None:
+        """Stop mission watcher and error reset threads."""
+        self.thread_run = False
 
     def robco_mission_cb(self, name: str, custom_res: Dict) -> None:
         """Process Cloud Robotics mission CR."""
@@ -113,7 +137,7 @@ class MissionController(K8sCRHandler):
                     status['status'] = RobcoMissionStates.STATE_ACCEPTED
                     status['timeOfActuation'] = datetime.datetime.utcnow().replace(
                         tzinfo=datetime.timezone.utc).isoformat()
-                    self.update_cr_status(name, status)
+                    self.handler.update_cr_status(name, status)
                     _LOGGER.info('Accepted new mission %s for robot %s', name, robot)
             else:
                 with self._missions_lock:
@@ -158,18 +182,18 @@ class MissionController(K8sCRHandler):
         _LOGGER.info('Watch missions loop started')
         while self.thread_run:
             try:
-                self._watch_missions()
+                self.watch_missions()
                 loop_control.sleep(0.5)
             except Exception as err:  # pylint: disable=broad-except
                 _LOGGER.error('Error watching missions of robot: %s', err, exc_info=True)
                 # On uncovered exception in thread save the exception
                 self.thread_exceptions['mission_loop'] = err
-                # Stop the watcher
-                self.stop_watcher()
+                # Stop the controller
+                self.stop()
 
         _LOGGER.info('Watch missions loop stopped')
 
-    def _watch_missions(self) -> None:
+    def watch_missions(self) -> None:
         """Watch missions of the robot."""
         cls = self.__class__
         # Copy mission dict, it might be changed while loop is running
@@ -197,9 +221,8 @@ class MissionController(K8sCRHandler):
                         if action_key in self._mir_robot.mission_mapping:
                             target = action_value.get(
                                 cls.action_to_target_mapping.get(action_key), 'UNKNOWN')
-                            self.mission_counter.labels(  # pylint: disable=no-member
-                                robot=self._mir_robot.robco_robot_name, action=action_key,
-                                target=target, status=result).inc()
+                            self._p_missions.labels(
+                                action=action_key, target=target, status=result).inc()
                 self._active_mission.clear()
 
         # After missions are processed for the first time, controller is not in upstart
@@ -220,8 +243,8 @@ class MissionController(K8sCRHandler):
                 _LOGGER.error('Error resetting robot errors of robot: %s', err, exc_info=True)
                 # On uncovered exception in thread save the exception
                 self.thread_exceptions['robot_error_loop'] = err
-                # Stop the watcher
-                self.stop_watcher()
+                # Stop the controller
+                self.stop()
 
         _LOGGER.info('Watch robot status loop stopped')
 
@@ -242,8 +265,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(name):
-                self.update_cr_status(name, self._active_mission['status'])
+            if self.handler.check_cr_exists(name):
+                self.handler.update_cr_status(name, self._active_mission['status'])
             else:
                 _LOGGER.info('CR of mission %s deleted, canceling mission', name)
                 return RobcoMissionStates.STATES_CANCELED
@@ -254,8 +277,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(name):
-                self.update_cr_status(name, self._active_mission['status'])
+            if self.handler.check_cr_exists(name):
+                self.handler.update_cr_status(name, self._active_mission['status'])
             else:
                 _LOGGER.info('CR of mission %s deleted, canceling mission', name)
                 return RobcoMissionStates.STATES_CANCELED
@@ -274,8 +297,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['message'] = 'Mission {} aborted - no actions attribute in CR'.format(
                     name)
-            if self.check_cr_exists(name):
-                self.update_cr_status(name, self._active_mission['status'])
+            if self.handler.check_cr_exists(name):
+                self.handler.update_cr_status(name, self._active_mission['status'])
             else:
                 _LOGGER.error('CR of mission %s deleted, cannot update status', name)
             return RobcoMissionStates.STATE_FAILED
@@ -310,8 +333,8 @@ class MissionController(K8sCRHandler):
                 self._active_mission[
                     'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                         tzinfo=datetime.timezone.utc).isoformat()
-                if self.check_cr_exists(name):
-                    self.update_cr_status(name, self._active_mission['status'])
+                if self.handler.check_cr_exists(name):
+                    self.handler.update_cr_status(name, self._active_mission['status'])
                 else:
                     _LOGGER.warning('CR of mission %s deleted, cannot update status', name)
                 _LOGGER.error(
@@ -327,8 +350,8 @@ class MissionController(K8sCRHandler):
             'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                 tzinfo=datetime.timezone.utc).isoformat()
         self._active_mission['status']['activeAction'] = {}
-        if self.check_cr_exists(name):
-            self.update_cr_status(name, self._active_mission['status'])
+        if self.handler.check_cr_exists(name):
+            self.handler.update_cr_status(name, self._active_mission['status'])
         else:
             _LOGGER.warning('CR of mission %s deleted, cannot update status', name)
         _LOGGER.info(
@@ -361,8 +384,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(self._active_mission['metadata']['name']):
-                self.update_cr_status(
+            if self.handler.check_cr_exists(self._active_mission['metadata']['name']):
+                self.handler.update_cr_status(
                     self._active_mission['metadata']['name'],
                     self._active_mission['status'])
             else:
@@ -393,8 +416,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(self._active_mission['metadata']['name']):
-                self.update_cr_status(
+            if self.handler.check_cr_exists(self._active_mission['metadata']['name']):
+                self.handler.update_cr_status(
                     self._active_mission['metadata']['name'],
                     self._active_mission['status'])
             else:
@@ -425,8 +448,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(self._active_mission['metadata']['name']):
-                self.update_cr_status(
+            if self.handler.check_cr_exists(self._active_mission['metadata']['name']):
+                self.handler.update_cr_status(
                     self._active_mission['metadata']['name'],
                     self._active_mission['status'])
             else:
@@ -457,8 +480,8 @@ class MissionController(K8sCRHandler):
             self._active_mission[
                 'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
                     tzinfo=datetime.timezone.utc).isoformat()
-            if self.check_cr_exists(self._active_mission['metadata']['name']):
-                self.update_cr_status(
+            if self.handler.check_cr_exists(self._active_mission['metadata']['name']):
+                self.handler.update_cr_status(
                     self._active_mission['metadata']['name'],
                     self._active_mission['status'])
             else:
@@ -471,57 +494,45 @@ class MissionController(K8sCRHandler):
 
     def watch_running_mission(self, mission_queue_id: str, with_active_action: bool) -> str:
         """Watch a running mission and return its result when finished."""
+        tracker = MissionStateTracker(self._mir_robot, mission_queue_id, with_active_action)
         try:
-            state_resp = self._mir_robot.get_mission_state(mission_queue_id)
+            status, message = tracker.track(
+                lambda s, a: self._update_running_mission(s, a, with_active_action))
         except RequestException:
             self._active_mission['status']['message'] = 'Mission state could not be determined'
             return RobcoMissionStates.STATE_FAILED
+        finally:
+            self._mir_robot.clear_mission_action_types(mission_queue_id)
 
-        status = state_resp[0]
-        message = state_resp[1]
-
-        # Wait until movement was successfull or failed
-        loop_control = MainLoopController()
-        while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
-            loop_control.sleep(1.0)
-            try:
-                state_resp = self._mir_robot.get_mission_state(mission_queue_id)
-            except RequestException:
-                self._active_mission['status']['message'] = 'Mission state could not be determined'
-                return RobcoMissionStates.STATE_FAILED
-
-            status = state_resp[0]
-            message = state_resp[1]
-
-            # Get active action of robot
-            try:
-                active_action = {
-                    'status': self._mir_robot.get_mission_active_action(mission_queue_id)}
-            except RequestException:
-                _LOGGER.error('Error getting activeAction')
-                active_action = {}
-
-            # Update status CR when status changes to RUNNING
-            if ((status != self._active_mission['status']['status']
-                 or (active_action != self._active_mission['status'].get('activeAction')
-                     and with_active_action is True))
-                    and status == RobcoMissionStates.STATE_RUNNING):
-                self._active_mission['status']['status'] = status
-                if with_active_action is True:
-                    self._active_mission['status']['activeAction'] = deepcopy(active_action)
-                self._active_mission[
-                    'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
-                        tzinfo=datetime.timezone.utc).isoformat()
-                if self.check_cr_exists(self._active_mission['metadata']['name']):
-                    self.update_cr_status(
-                        self._active_mission['metadata']['name'],
-                        self._active_mission['status'])
-                else:
-                    _LOGGER.info(
-                        'CR of mission %s deleted, mission was canceled',
-                        self._active_mission['metadata']['name'])
-                    return RobcoMissionStates.STATE_CANCELED
+        if tracker.aborted:
+            return RobcoMissionStates.STATE_CANCELED
 
         # Save last status message before quitting
         self._active_mission['status']['message'] = message
         return status
+
+    def _update_running_mission(
+            self, status: str, active_action: Dict, with_active_action: bool) -> bool:
+        """Update status CR of a running mission, return False if CR was deleted."""
+        if (status == self._active_mission['status']['status']
+                and (with_active_action is False
+                     or active_action == self._active_mission['status'].get('activeAction'))):
+            return True
+
+        self._active_mission['status']['status'] = status
+        if with_active_action is True:
+            self._active_mission['status']['activeAction'] = deepcopy(active_action)
+        self._active_mission[
+            'status']['timeOfActuation'] = datetime.datetime.utcnow().replace(
+                tzinfo=datetime.timezone.utc).isoformat()
+        if self.handler.check_cr_exists(self._active_mission['metadata']['name']):
+            self.handler.update_cr_status(
+                self._active_mission['metadata']['name'],
+                self._active_mission['status'])
+        else:
+            _LOGGER.info(
+                'CR of mission %s deleted, mission was canceled',
+                self._active_mission['metadata']['name'])
+            return False
+
+        return True
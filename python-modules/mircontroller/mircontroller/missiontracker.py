@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Track state of a mission in MiR mission queue."""
+
+import logging
+import threading
+
+from typing import Callable, Dict, Tuple
+
+from requests import RequestException
+
+from robcoewmtypes.robot import RobotMission
+
+from .mirrobot import MiRRobot, RobcoMissionStates
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MissionStateTracker:
+    """
+    Track state and active action of a mission in MiR mission queue.
+
+    Polling interval depends on the phase of the mission. Pending missions wait for the robot,
+    running missions are polled fast after a change and slower while nothing changes. Docking
+    is polled fast, because it is usually the end of a mission. Robot state changes wake up the
+    tracker immediately.
+    """
+
+    # Seconds between two polls
+    PENDING_INTERVAL = 1.0
+    RUNNING_INTERVAL_MIN = 0.5
+    RUNNING_INTERVAL_MAX = 2.0
+    DOCKING_INTERVAL = 0.5
+    # Factor for interval increase while mission state does not change
+    BACKOFF = 1.5
+
+    def __init__(
+            self, mir_robot: MiRRobot, mission_queue_id: str, with_active_action: bool) -> None:
+        """Construct."""
+        self._mir_robot = mir_robot
+        self.mission_queue_id = mission_queue_id
+        self.with_active_action = with_active_action
+        self._wakeup = threading.Event()
+        # Tracking was aborted by callback
+        self.aborted = False
+        # Statistics
+        self.polls = 0
+
+    def notify(self, *args) -> None:  # pylint: disable=unused-argument
+        """Wake up tracker to poll the mission state immediately."""
+        self._wakeup.set()
+
+    def _next_interval(self, interval: float, status: str, changed: bool, action: Dict) -> float:
+        """Get interval until next poll of mission state."""
+        cls = self.__class__
+        if status == RobcoMissionStates.STATE_ACCEPTED:
+            return cls.PENDING_INTERVAL
+        if action.get('status') == RobotMission.ACTION_DOCKING:
+            return cls.DOCKING_INTERVAL
+        if changed:
+            return cls.RUNNING_INTERVAL_MIN
+        return min(interval * cls.BACKOFF, cls.RUNNING_INTERVAL_MAX)
+
+    def _poll(self) -> Tuple[str, str]:
+        """Get state of mission from robot."""
+        self.polls += 1
+        return self._mir_robot.get_mission_state(self.mission_queue_id)
+
+    def _poll_active_action(self) -> Dict:
+        """Get active action of mission from robot."""
+        try:
+            return {'status': self._mir_robot.get_mission_active_action(self.mission_queue_id)}
+        except RequestException:
+            _LOGGER.error('Error getting activeAction')
+            return {}
+
+    def track(self, on_running: Callable[[str, Dict], bool]) -> Tuple[str, str]:
+        """
+        Track mission until it is finished and return its final state and message.
+
+        on_running is called with state and active action whenever a running mission changes.
+        Tracking is aborted with state CANCELED if it returns False. RequestException is raised if
+        mission state could not be determined.
+        """
+        cls = self.__class__
+        status, message = self._poll()
+        last_status = None
+        last_action: Dict = {}
+        interval = cls.RUNNING_INTERVAL_MIN
+
+        self._mir_robot.add_state_listener(self.notify)
+        try:
+            while status in (RobcoMissionStates.STATE_ACCEPTED, RobcoMissionStates.STATE_RUNNING):
+                active_action: Dict = {}
+                if status == RobcoMissionStates.STATE_RUNNING and self.with_active_action:
+                    active_action = self._poll_active_action()
+
+                changed = status != last_status or active_action != last_action
+                if changed and status == RobcoMissionStates.STATE_RUNNING:
+                    if on_running(status, active_action) is False:
+                        self.aborted = True
+                        return RobcoMissionStates.STATE_CANCELED, message
+                last_status = status
+                last_action = active_action
+
+                interval = self._next_interval(interval, status, changed, active_action)
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                status, message = self._poll()
+        finally:
+            self._mir_robot.remove_state_listener(self.notify)
+
+        return status, message
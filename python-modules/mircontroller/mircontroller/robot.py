@@ -17,6 +17,7 @@ import datetime
 import threading
 
 from copy import deepcopy
+from typing import Dict
 
 from kubernetes.client.rest import ApiException
 
@@ -28,41 +29,53 @@ from .helper import get_sample_cr, MainLoopController
 _LOGGER = logging.getLogger(__name__)
 
 
-class RobotController(K8sCRHandler):
-    """MiR robot controller."""
+class RobotHandler(K8sCRHandler):
+    """Handle robot custom resources of MiR robots."""
 
-    def __init__(self, mir_robot: MiRRobot, namespace: str) -> None:
+    def __init__(self, namespace: str) -> None:
         """Construct."""
-        # Instance with MiR robot
-        self._mir_robot = mir_robot
+        template_cr = get_sample_cr('robco_robot')
 
-        # Super constructor for robot CR
-        labels = {}
-        labels['cloudrobotics.com/robot-name'] = self._mir_robot.robco_robot_name
-        self.robot_template_cr = get_sample_cr('robco_robot')
+        labels: Dict[str, str] = {}
         super().__init__(
             'registry.cloudrobotics.com',
             'v1alpha1',
             'robots',
             namespace,
-            self.robot_template_cr,
-            labels
+            template_cr,
+            labels,
+            robot_label_selector=True
         )
 
-        # Init threads
-        self.robot_status_update_thread = threading.Thread(target=self._update_robot_status_loop)
 
-    def run(self, reprocess: bool = False, multiple_executor_threads: bool = False) -> None:
-        """
-        Start running all callbacks.
+class RobotController:
+    """MiR robot controller."""
+
+    def __init__(self, mir_robot: MiRRobot, handler: RobotHandler) -> None:
+        """Construct."""
+        # Instance with MiR robot
+        self._mir_robot = mir_robot
+        # Robot CR handler, which could be shared with controllers of other robots
+        self.handler = handler
+        self.handler.add_selector_robots([self._mir_robot.robco_robot_name])
+        self.robot_template_cr = get_sample_cr('robco_robot')
 
-        Supporting multiple executor threads for blocking callbacks.
-        """
-        super().run(reprocess, multiple_executor_threads)
+        # Control flag for threads
+        self.thread_run = True
+        # Dict to save thread exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
 
-        # Start update thread
+        # Init threads
+        self.robot_status_update_thread = threading.Thread(target=self._update_robot_status_loop)
+
+    def run(self) -> None:
+        """Start robot status update thread."""
         self.robot_status_update_thread.start()
 
+    def stop(self) -> None:
+        """Stop robot status update thread."""
+        self.thread_run = False
+
     def _update_robot_status_loop(self) -> None:
         """Run update robot status continiously."""
         loop_control = MainLoopController()
@@ -75,8 +88,8 @@ class RobotController(K8sCRHandler):
                 _LOGGER.error('Error updating status of robot: %s', err, exc_info=True)
                 # On uncovered exception in thread save the exception
                 self.thread_exceptions['status_loop'] = err
-                # Stop the watcher
-                self.stop_watcher()
+                # Stop the controller
+                self.stop()
 
         _LOGGER.info('Watch robot status loop stopped')
 
@@ -94,7 +107,7 @@ class RobotController(K8sCRHandler):
             tzinfo=datetime.timezone.utc).isoformat()
 
         try:
-            self.update_cr_status(self._mir_robot.robco_robot_name, status)
+            self.handler.update_cr_status(self._mir_robot.robco_robot_name, status)
         except ApiException:
             _LOGGER.error(
                 'Status CR of robot %s could not be updated', self._mir_robot.robco_robot_name)
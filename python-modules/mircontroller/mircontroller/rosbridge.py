@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Persistent connection to rosbridge websocket of a robot."""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+import attr
+
+from websocket import (
+    create_connection, ABNF, WebSocket, WebSocketException, WebSocketTimeoutException)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RosbridgeTimeout(Exception):
+    """Message could not be sent to rosbridge in time."""
+
+
+@attr.s
+class RosbridgeSubscription:
+    """Subscription to a ROS topic."""
+
+    topic = attr.ib(validator=attr.validators.instance_of(str))
+    msg_type = attr.ib(validator=attr.validators.instance_of(str))
+    callback = attr.ib()
+    throttle_rate = attr.ib(default=0, validator=attr.validators.instance_of(int))
+
+    def subscribe_message(self) -> Dict:
+        """Get rosbridge subscribe operation."""
+        return {
+            'op': 'subscribe', 'topic': self.topic, 'type': self.msg_type,
+            'throttle_rate': self.throttle_rate}
+
+
+class RosbridgeClient:
+    """
+    Persistent and auto reconnecting rosbridge websocket connection.
+
+    Messages are sent from a queue by a sender thread, a receiver thread dispatches published
+    messages of subscribed topics and sends a ping as heartbeat when the connection is idle.
+    Subscriptions are renewed after reconnect.
+    """
+
+    # Seconds between two connection attempts, doubled on each failure until the maximum
+    RECONNECT_DELAY = 1.0
+    RECONNECT_DELAY_MAX = 30.0
+
+    def __init__(self, url: str, timeout: float = 5.0, heartbeat_interval: float = 10.0) -> None:
+        """Construct."""
+        self.url = url
+        self.timeout = timeout
+        self.heartbeat_interval = heartbeat_interval
+        self._ws: Optional[WebSocket] = None
+        self._connected = threading.Condition()
+        self._send_queue: queue.Queue = queue.Queue()
+        self._subscriptions: Dict[str, RosbridgeSubscription] = {}
+        self._subscriptions_lock = threading.Lock()
+        self._run = False
+        self._start_lock = threading.Lock()
+        self._receiver_thread: Optional[threading.Thread] = None
+        self._sender_thread: Optional[threading.Thread] = None
+
+    @property
+    def connected(self) -> bool:
+        """Check if websocket is connected."""
+        return self._ws is not None
+
+    def start(self) -> None:
+        """Start connection threads if not running yet."""
+        with self._start_lock:
+            if self._run:
+                return
+            self._run = True
+            self._receiver_thread = threading.Thread(
+                target=self._receiver_loop, name='rosbridge-receiver', daemon=True)
+            self._sender_thread = threading.Thread(
+                target=self._sender_loop, name='rosbridge-sender', daemon=True)
+            self._receiver_thread.start()
+            self._sender_thread.start()
+
+    def stop(self) -> None:
+        """Stop connection threads and close websocket."""
+        with self._start_lock:
+            if not self._run:
+                return
+            self._run = False
+            # Wake up sender thread
+            self._send_queue.put(None)
+            self._disconnect(self._ws)
+            with self._connected:
+                self._connected.notify_all()
+
+    def send(self, message: Dict, timeout: Optional[float] = None) -> None:
+        """Send a message and wait until it is written to the websocket."""
+        self.start()
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
+        done = threading.Event()
+        result: Dict[str, Any] = {}
+        self._send_queue.put((json.dumps(message), deadline, done, result))
+        done.wait(timeout)
+        if not result.get('sent'):
+            raise RosbridgeTimeout('Message was not sent to rosbridge at {} in time'.format(
+                self.url))
+
+    def subscribe(
+            self, topic: str, msg_type: str, callback: Callable[[Dict], None],
+            throttle_rate: int = 0) -> None:
+        """
+        Subscribe to a ROS topic.
+
+        The callback is called with the message of each publish operation in receiver thread.
+        """
+        subscription = RosbridgeSubscription(topic, msg_type, callback, throttle_rate)
+        with self._subscriptions_lock:
+            self._subscriptions[topic] = subscription
+        self.start()
+        if self.connected:
+            self._send_queue.put(
+                (json.dumps(subscription.subscribe_message()), None, None, None))
+
+    def unsubscribe(self, topic: str) -> None:
+        """Unsubscribe from a ROS topic."""
+        with self._subscriptions_lock:
+            subscription = self._subscriptions.pop(topic, None)
+        if subscription is not None and self.connected:
+            self._send_queue.put(
+                (json.dumps({'op': 'unsubscribe', 'topic': topic}), None, None, None))
+
+    def _connect(self) -> Optional[WebSocket]:
+        """Open websocket and renew subscriptions."""
+        try:
+            wsclient = create_connection(self.url, timeout=self.timeout)
+            # Receiver wakes up at least once per heartbeat interval
+            wsclient.settimeout(self.heartbeat_interval)
+            with self._subscriptions_lock:
+                subscriptions = list(self._subscriptions.values())
+            for subscription in subscriptions:
+                wsclient.send(json.dumps(subscription.subscribe_message()))
+        except (WebSocketException, OSError) as err:
+            _LOGGER.debug('Connection to rosbridge websocket %s failed: %s', self.url, err)
+            return None
+
+        _LOGGER.info('Connected to rosbridge websocket %s', self.url)
+        with self._connected:
+            self._ws = wsclient
+            self._connected.notify_all()
+
+        return wsclient
+
+    def _disconnect(self, wsclient: Optional[WebSocket]) -> None:
+        """Close websocket if it is still the active one."""
+        if wsclient is None:
+            return
+        with self._connected:
+            if self._ws is wsclient:
+                self._ws = None
+        try:
+            wsclient.close(timeout=1.0)
+        except (WebSocketException, OSError):
+            pass
+
+    def _receiver_loop(self) -> None:
+        """Connect to rosbridge and dispatch received messages."""
+        cls = self.__class__
+        delay = cls.RECONNECT_DELAY
+        while self._run:
+            wsclient = self._connect()
+            if wsclient is None:
+                time.sleep(delay)
+                delay = min(delay * 2, cls.RECONNECT_DELAY_MAX)
+                continue
+            delay = cls.RECONNECT_DELAY
+            self._receive(wsclient)
+            self._disconnect(wsclient)
+            if self._run:
+                _LOGGER.warning(
+                    'Connection to rosbridge websocket %s lost, reconnecting', self.url)
+
+    def _receive(self, wsclient: WebSocket) -> None:
+        """Receive messages until the connection is lost."""
+        ping_sent = False
+        while self._run:
+            try:
+                opcode, data = wsclient.recv_data(control_frame=True)
+            except WebSocketTimeoutException:
+                # Connection idle. Send heartbeat or give up when the last one was not answered
+                if ping_sent:
+                    _LOGGER.warning('No heartbeat answer from rosbridge websocket %s', self.url)
+                    return
+                try:
+                    wsclient.ping()
+                except (WebSocketException, OSError):
+                    return
+                ping_sent = True
+                continue
+            except (WebSocketException, OSError):
+                return
+
+            ping_sent = False
+            if opcode == ABNF.OPCODE_CLOSE:
+                return
+            if opcode == ABNF.OPCODE_TEXT:
+                self._dispatch(data)
+
+    def _dispatch(self, data: Any) -> None:
+        """Dispatch a message received from rosbridge."""
+        try:
+            message = json.loads(data)
+        except ValueError:
+            _LOGGER.error('Invalid message from rosbridge websocket %s', self.url)
+            return
+        if message.get('op') != 'publish':
+            return
+        subscription = self._subscriptions.get(message.get('topic'))
+        if subscription is None:
+            return
+        try:
+            subscription.callback(message.get('msg', {}))
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error(
+                'Error in callback of topic %s: %s', subscription.topic, err, exc_info=True)
+
+    def _sender_loop(self) -> None:
+        """Send queued messages to rosbridge."""
+        while self._run:
+            item = self._send_queue.get()
+            if item is None:
+                continue
+            payload, deadline, done, result = item
+            while self._run:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                with self._connected:
+                    if self._ws is None:
+                        # Wait for receiver thread to reconnect
+                        self._connected.wait(
+                            self.timeout if deadline is None else deadline - time.monotonic())
+                    wsclient = self._ws
+                if wsclient is None:
+                    # Subscription messages are sent on reconnect anyway
+                    if deadline is None:
+                        break
+                    continue
+                try:
+                    wsclient.send(payload)
+                except (WebSocketException, OSError) as err:
+                    _LOGGER.debug('Sending to rosbridge websocket %s failed: %s', self.url, err)
+                    self._disconnect(wsclient)
+                else:
+                    if result is not None:
+                        result['sent'] = True
+                    break
+            if done is not None:
+                done.set()
@@ -20,8 +20,9 @@ from prometheus_client import start_http_server
 from mircontroller.mirapi import MiRInterface
 from mircontroller.mirrobot import MiRRobot
 from mircontroller.helper import MainLoopController
-from mircontroller.mission import MissionController
-from mircontroller.robot import RobotController
+from mircontroller.mission import MissionController, MissionHandler
+from mircontroller.robot import RobotController, RobotHandler
+from mircontroller.fleet import MiRFleetController, load_fleet_config
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -43,12 +44,16 @@ def run_missioncontroller():
     mir_robot = MiRRobot(mir_api)
 
     # Create K8S handler instances
-    k8s_rc = RobotController(mir_robot, namespace)
-    k8s_mc = MissionController(mir_robot, namespace)
+    r_handler = RobotHandler(namespace)
+    m_handler = MissionHandler(namespace)
+    k8s_rc = RobotController(mir_robot, r_handler)
+    k8s_mc = MissionController(mir_robot, m_handler)
 
     # Start
-    k8s_rc.run(reprocess=False)
-    k8s_mc.run(reprocess=False)
+    r_handler.run(reprocess=False)
+    m_handler.run(reprocess=False)
+    k8s_rc.run()
+    k8s_mc.run()
 
     _LOGGER.info('MiR controller started for robot %s', mir_robot.robco_robot_name)
     _LOGGER.info('Watching custom resources of namespace %s', namespace)
@@ -67,6 +72,12 @@ def run_missioncontroller():
                     'Uncovered exception in "%s" thread of robot controller. Raising it in main '
                     'thread', k)
                 raise exc
+            for handler in (m_handler, r_handler):
+                for k, exc in handler.thread_exceptions.items():
+                    _LOGGER.error(
+                        'Uncovered exception in "%s" thread of %s handler. Raising it in main '
+                        'thread', k, handler.plural)
+                    raise exc
             # Sleep maximum 1.0 second
             loop_control.sleep(1.0)
     except KeyboardInterrupt:
@@ -76,5 +87,58 @@ def run_missioncontroller():
     finally:
         # Stop K8S CRD watchers
         _LOGGER.info('Stopping K8S CR watchers')
-        k8s_mc.stop_watcher()
-        k8s_rc.stop_watcher()
+        k8s_mc.stop()
+        k8s_rc.stop()
+        m_handler.stop_watcher()
+        r_handler.stop_watcher()
+        mir_robot.stop()
+
+
+def run_fleetcontroller():
+    """Run the MiR controller for all robots of a fleet."""
+    # Start prometheus client
+    start_http_server(8000)
+    # Register handler to control main loop
+    loop_control = MainLoopController()
+
+    # Identify namespace for custom resources
+    namespace = os.environ.get('K8S_NAMESPACE', 'default')
+
+    # Robots of the fleet
+    robots = load_fleet_config(os.environ['MIR_FLEET_CONFIG'])
+    fleet = MiRFleetController(robots, namespace)
+    fleet.run()
+
+    _LOGGER.info('Watching custom resources of namespace %s', namespace)
+
+    try:
+        # Looping while K8S watchers are running
+        while loop_control.shutdown is False:
+            # Check if K8S CR handler or fleet exception occured
+            for handler in (fleet.mission_handler, fleet.robot_handler):
+                for k, exc in handler.thread_exceptions.items():
+                    _LOGGER.error(
+                        'Uncovered exception in "%s" thread of %s handler. Raising it in main '
+                        'thread', k, handler.plural)
+                    raise exc
+            for k, exc in fleet.thread_exceptions.items():
+                _LOGGER.error(
+                    'Uncovered exception in "%s" thread of fleet controller. Raising it in main '
+                    'thread', k)
+                raise exc
+            for name, mission_controller in fleet.mission_controllers.items():
+                for k, exc in mission_controller.thread_exceptions.items():
+                    _LOGGER.error(
+                        'Uncovered exception in "%s" thread of mission controller of robot %s. '
+                        'Raising it in main thread', k, name)
+                    raise exc
+            # Sleep maximum 1.0 second
+            loop_control.sleep(1.0)
+    except KeyboardInterrupt:
+        _LOGGER.info('Keyboard interrupt - terminating')
+    except SystemExit:
+        _LOGGER.info('System exit - terminating')
+    finally:
+        # Stop K8S CRD watchers
+        _LOGGER.info('Stopping MiR fleet controller')
+        fleet.stop()
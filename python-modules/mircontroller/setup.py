@@ -17,6 +17,7 @@ REQUIRES = [
     'attrs==21.2.0',
     'requests',
     'retrying',
+    'websocket-client',
     'prometheus-client',
     'python-json-logger',
     'k8scrhandler',
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Run the fleet simulation benchmark for growing robot counts."""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+from typing import Dict, List
+
+import attr
+
+from robcoewmbenchmark.fleet import run_fleet_benchmark_isolated
+
+
+def init_logging() -> None:
+    """Log to stderr with level from environment variable LOG_LEVEL, default is WARNING."""
+    level = os.environ.get('LOG_LEVEL', 'WARNING').upper()
+    logging.basicConfig(
+        level=level, format='%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s')
+
+
+def print_table(results: List[Dict]) -> None:
+    """Print a summary of the results."""
+    columns = [
+        ('robots', '{:>6}'), ('orders/h', '{:>9.0f}'), ('orders/robot/h', '{:>14.1f}'),
+        ('wait p50', '{:>8.2f}'), ('wait p90', '{:>8.2f}'), ('order p50', '{:>9.2f}'),
+        ('order p90', '{:>9.2f}'), ('cpu %/robot', '{:>11.2f}'), ('KiB/robot', '{:>9.0f}'),
+        ('threads', '{:>7}')]
+    print('  '.join('{:>{}}'.format(name, len(fmt.format(0))) for name, fmt in columns))
+    for result in results:
+        wait = result['latencies'].get('waiting_for_order', {})
+        order = result['latencies'].get('warehouse_order', {})
+        values = [
+            result['robots'], result['orders_per_hour'], result['orders_per_robot_hour'],
+            wait.get('p50', float('nan')), wait.get('p90', float('nan')),
+            order.get('p50', float('nan')), order.get('p90', float('nan')),
+            result['cpu_percent_per_robot'], result['rss_kib_per_robot'], result['threads']]
+        print('  '.join(fmt.format(value) for (_, fmt), value in zip(columns, values)))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        prog='robcoewmbenchmark', description='Simulate a robot fleet processing warehouse '
+        'orders with in-memory Kubernetes and SAP EWM backends')
+    parser.add_argument(
+        '--robots', default='1,5,10,25,50',
+        help='Comma separated robot counts, each one is simulated in its own process')
+    parser.add_argument('--duration', type=float, default=60.0, help='Measured seconds')
+    parser.add_argument(
+        '--warmup', type=float, default=10.0, help='Seconds before measurement starts')
+    parser.add_argument(
+        '--mission-duration', type=float, default=2.0, help='Seconds a robot mission takes')
+    parser.add_argument(
+        '--mission-state-interval', type=float, default=0.2,
+        help='Seconds between mission state requests of the dummy controller')
+    parser.add_argument(
+        '--ewm-latency', type=float, default=0.0, help='Seconds each EWM OData request takes')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    init_logging()
+    results = []
+    for robots in [int(r) for r in args.robots.split(',') if r]:
+        print('Simulating fleet of {} robots'.format(robots), file=sys.stderr, flush=True)
+        result = attr.asdict(run_fleet_benchmark_isolated(
+            robots, duration=args.duration, warmup=args.warmup,
+            mission_duration=args.mission_duration,
+            mission_state_interval=args.mission_state_interval, ewm_latency=args.ewm_latency))
+        results.append(result)
+        if args.json:
+            print(json.dumps(result), flush=True)
+
+    if not args.json:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""In-memory SAP EWM OData backend serving moveTrolley warehouse orders."""
+
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from collections import Counter, defaultdict, deque
+from typing import Any, DefaultDict, Deque, Dict, List, Optional, Tuple
+
+import attr
+
+from robcoewminterface.odata import ODataHandler
+from robcoewminterface.types import ODataConfig
+
+_LOGGER = logging.getLogger(__name__)
+
+ODATA_NAMESPACE = 'ZEWM_ROBCO_SRV'
+
+FILTER_TOPWHOID = re.compile(r"Topwhoid eq '([^']*)'")
+
+
+class ODataError(Exception):
+    """Business exception of the EWM backend."""
+
+    def __init__(self, error_code: str, status_code: int = 404) -> None:
+        """Construct."""
+        super().__init__(error_code)
+        self.error_code = error_code
+        self.status_code = status_code
+
+
+@attr.s
+class FakeWarehouseTask:
+    """Warehouse task moving a trolley from a source to a target bin."""
+
+    tanum: str = attr.ib()
+    vlpla: str = attr.ib()
+    nlpla: str = attr.ib()
+    first_confirmed: bool = attr.ib(default=False)
+    confirmed: bool = attr.ib(default=False)
+
+
+@attr.s
+class FakeWarehouseOrder:
+    """Warehouse order in the EWM backend and the times of its processing stages."""
+
+    who: str = attr.ib()
+    warehousetasks: List[FakeWarehouseTask] = attr.ib()
+    status: str = attr.ib(default='')
+    rsrc: str = attr.ib(default='')
+    in_process: bool = attr.ib(default=False)
+    assigned: Optional[float] = attr.ib(default=None)
+    first_confirmation: Optional[float] = attr.ib(default=None)
+    second_confirmation: Optional[float] = attr.ib(default=None)
+    finished: Optional[float] = attr.ib(default=None)
+    failed: bool = attr.ib(default=False)
+
+
+class FakeResponse:
+    """Minimal requests.Response returned by FakeODataHandler."""
+
+    def __init__(self, url: str, status_code: int, body: Optional[Dict]) -> None:
+        """Construct."""
+        self.url = url
+        self.status_code = status_code
+        self.text = json.dumps(body) if body is not None else ''
+        self.headers = {'content-type': 'application/json'}
+
+    def json(self) -> Any:
+        """Get JSON body."""
+        return json.loads(self.text)
+
+
+class FakeEWM:
+    """
+    In-memory EWM backend of one warehouse with moveTrolley warehouse orders.
+
+    Every warehouse order has one warehouse task moving a trolley between two random storage bins.
+    If orders is 0, new warehouse orders are created whenever a robot requests one, so robots
+    never run out of work. Requests are delayed by latency seconds to simulate the backend.
+    """
+
+    def __init__(self, lgnum: str = '1710', orders: int = 0, bins: int = 400,
+                 latency: float = 0.0, seed: int = 0) -> None:
+        """Construct."""
+        self.lgnum = lgnum
+        self.unlimited = orders <= 0
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._orders: Dict[str, FakeWarehouseOrder] = {}
+        self._queue: Deque[str] = deque()
+        self._next_who = 1
+        self._next_tanum = 1
+        # Time of the last completed warehouse order of a robot
+        self._robot_done: Dict[str, float] = {}
+        # Seconds robots waited for their next warehouse order
+        self.robot_waiting: List[Tuple[float, float]] = []
+        self.requests: Counter = Counter()
+
+        # Storage bins on a square grid, 2 meters apart
+        width = max(1, int(bins ** 0.5))
+        self.storagebins = [
+            {'Lgnum': lgnum, 'Lgpla': 'BIN-{:03d}-{:03d}'.format(i // width, i % width),
+             'Lgtyp': 'Y920', 'Lgber': '', 'Lptyp': '', 'Aisle': '', 'Stack': '', 'Lvlv': '',
+             'Xcord': 2.0 * (i // width), 'Ycord': 2.0 * (i % width), 'Zcord': 0.0}
+            for i in range(max(2, bins))]
+
+        for _ in range(orders):
+            self._queue.append(self._create_order().who)
+
+    def _create_order(self) -> FakeWarehouseOrder:
+        """Create an open warehouse order."""
+        source, target = self._random.sample(self.storagebins, 2)
+        who = '{:010d}'.format(self._next_who)
+        tanum = '{:012d}'.format(self._next_tanum)
+        self._next_who += 1
+        self._next_tanum += 1
+        order = FakeWarehouseOrder(
+            who, [FakeWarehouseTask(tanum, source['Lgpla'], target['Lgpla'])])
+        self._orders[who] = order
+        return order
+
+    def _pop_open_order(self) -> FakeWarehouseOrder:
+        """Get the next open warehouse order from the queue."""
+        while self._queue:
+            order = self._orders[self._queue.popleft()]
+            if not order.in_process and not order.rsrc and order.status == '':
+                return order
+        if self.unlimited:
+            return self._create_order()
+        raise ODataError('NO_ORDER_FOUND')
+
+    def _get_order(self, lgnum: str, who: str) -> FakeWarehouseOrder:
+        """Get a warehouse order."""
+        order = self._orders.get(who)
+        if lgnum != self.lgnum or order is None:
+            raise ODataError('NO_ORDER_FOUND')
+        return order
+
+    def _assign(self, order: FakeWarehouseOrder, rsrc: str) -> None:
+        """Assign a warehouse order to a robot."""
+        now = time.monotonic()
+        order.rsrc = rsrc
+        order.in_process = True
+        order.status = 'D'
+        order.assigned = now
+        done = self._robot_done.pop(rsrc, None)
+        if done is not None:
+            self.robot_waiting.append((now, now - done))
+
+    def _finish(self, order: FakeWarehouseOrder, failed: bool = False) -> None:
+        """Finish processing of a warehouse order."""
+        order.status = 'C'
+        order.failed = failed
+        order.finished = time.monotonic()
+        if order.rsrc:
+            self._robot_done[order.rsrc] = order.finished
+
+    def _robot_has_order(self, rsrc: str) -> bool:
+        """Check if a robot has a running warehouse order."""
+        return any(o.rsrc == rsrc and o.status == 'D' for o in self._orders.values())
+
+    def _order_odata(self, order: FakeWarehouseOrder, expand: bool = False) -> Dict:
+        """Get OData representation of a warehouse order."""
+        data = {
+            '__metadata': {'type': '{}.WarehouseOrder'.format(ODATA_NAMESPACE)},
+            'Lgnum': self.lgnum, 'Who': order.who, 'Status': order.status, 'Areawho': 'AREA1',
+            'Lgtyp': 'Y920', 'Lgpla': '', 'Queue': 'ROBOTS', 'Rsrc': order.rsrc, 'Lsd': 0,
+            'Topwhoid': '', 'Refwhoid': '', 'Flgwho': False, 'Flgto': True}
+        if expand:
+            data['OpenWarehouseTasks'] = {'results': [
+                self._task_odata(order, wht) for wht in order.warehousetasks
+                if not wht.confirmed]}
+        else:
+            data['OpenWarehouseTasks'] = {'__deferred': {}}
+        return data
+
+    def _task_odata(self, order: FakeWarehouseOrder, wht: FakeWarehouseTask) -> Dict:
+        """Get OData representation of a warehouse task."""
+        # After the first confirmation the trolley is on the robot, there is no source bin anymore
+        vltyp, vlpla = ('', '') if wht.first_confirmed else ('Y920', wht.vlpla)
+        return {
+            '__metadata': {'type': '{}.OpenWarehouseTask'.format(ODATA_NAMESPACE)},
+            'Lgnum': self.lgnum, 'Tanum': wht.tanum, 'Procty': 'S997', 'Flghuto': True,
+            'Tostat': '', 'Priority': 0, 'Weight': 0.0, 'Unitw': 'KG', 'Volum': 0.0,
+            'Unitv': 'M3', 'Vltyp': vltyp, 'Vlber': '', 'Vlpla': vlpla,
+            'Vlenr': 'HU{}'.format(wht.tanum), 'Nltyp': 'Y920', 'Nlber': '', 'Nlpla': wht.nlpla,
+            'Nlenr': 'HU{}'.format(wht.tanum), 'Who': order.who}
+
+    def _confirmation_odata(self, wht: FakeWarehouseTask, tostat: str) -> Dict:
+        """Get OData representation of a warehouse task confirmation."""
+        return {
+            '__metadata': {'type': '{}.WarehouseTaskConfirmation'.format(ODATA_NAMESPACE)},
+            'Lgnum': self.lgnum, 'Tanum': wht.tanum, 'Tostat': tostat}
+
+    def _get_task(self, lgnum: str, tanum: str) -> Tuple[FakeWarehouseOrder, FakeWarehouseTask]:
+        """Get a warehouse task and its warehouse order."""
+        if lgnum == self.lgnum:
+            for order in self._orders.values():
+                if order.status != 'D':
+                    continue
+                for wht in order.warehousetasks:
+                    if wht.tanum == tanum:
+                        return order, wht
+        raise ODataError('NO_ORDER_FOUND')
+
+    def request(self, method: str, endpoint: str, params: Dict[str, str],
+                ids: Optional[Dict[str, str]], navigation: str) -> Tuple[int, Optional[Dict]]:
+        """Process an OData request and return status code and JSON body."""
+        self.requests[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        try:
+            with self._lock:
+                if method == 'GET':
+                    result = self._get(endpoint, params, ids or {}, navigation)
+                else:
+                    result = self._post(endpoint, params)
+        except ODataError as err:
+            return err.status_code, {'error': {'code': err.error_code}}
+        if isinstance(result, list):
+            return 200, {'d': {'results': result}}
+        return 200, {'d': result}
+
+    def _get(self, endpoint: str, params: Dict[str, str], ids: Dict[str, str],
+             navigation: str) -> Any:
+        """Process a GET request."""
+        expand = 'OpenWarehouseTasks' in params.get('$expand', '')
+        if endpoint == '/GetRobotWarehouseOrders':
+            orders = [
+                self._order_odata(order) for order in self._orders.values()
+                if order.rsrc == params['Rsrc'] and order.status == 'D']
+            if params['Lgnum'] != self.lgnum or not orders:
+                raise ODataError('NO_ORDER_FOUND')
+            return orders
+        if endpoint == '/GetInProcessWarehouseOrders':
+            return [self._order_odata(order) for order in self._orders.values()
+                    if order.in_process and not order.rsrc and order.status == '']
+        if endpoint == '/WarehouseOrderSet' and ids:
+            order = self._get_order(ids['Lgnum'], ids['Who'])
+            if navigation == '/OpenWarehouseTasks':
+                return [self._task_odata(order, wht) for wht in order.warehousetasks
+                        if not wht.confirmed]
+            return self._order_odata(order, expand)
+        if endpoint == '/WarehouseOrderSet':
+            match = FILTER_TOPWHOID.search(params.get('$filter', ''))
+            return [self._order_odata(order, expand) for order in self._orders.values()
+                    if match is None or match.group(1) == '']
+        if endpoint == '/WarehouseNumberSet' and ids.get('Lgnum') == self.lgnum:
+            if navigation == '/StorageBins':
+                return [dict(sbin, __metadata={'type': '{}.StorageBin'.format(ODATA_NAMESPACE)})
+                        for sbin in self.storagebins]
+            if navigation == '/WarehouseOrders':
+                return [self._order_odata(order, expand) for order in self._orders.values()]
+        raise ODataError('404')
+
+    def _post(self, endpoint: str, params: Dict[str, str]) -> Any:
+        """Process a POST request."""
+        if endpoint == '/GetNewRobotWarehouseOrder':
+            if self._robot_has_order(params['Rsrc']):
+                raise ODataError('ROBOT_HAS_ORDER')
+            order = self._pop_open_order()
+            self._assign(order, params['Rsrc'])
+            return self._order_odata(order)
+        if endpoint == '/GetNewRobotTypeWarehouseOrders':
+            orders = []
+            for _ in range(int(params.get('NoWho', 1))):
+                try:
+                    order = self._pop_open_order()
+                except ODataError:
+                    break
+                order.in_process = True
+                orders.append(self._order_odata(order))
+            if not orders:
+                raise ODataError('NO_ORDER_FOUND')
+            return orders
+        if endpoint == '/AssignRobotToWarehouseOrder':
+            order = self._get_order(params['Lgnum'], params['Who'])
+            if order.rsrc:
+                raise ODataError('WAREHOUSE_ORDER_ASSIGNED')
+            if self._robot_has_order(params['Rsrc']):
+                raise ODataError('ROBOT_HAS_ORDER')
+            self._assign(order, params['Rsrc'])
+            return self._order_odata(order)
+        if endpoint in ('/UnassignRobotFromWarehouseOrder', '/UnsetWarehouseorderInProcessStatus'):
+            order = self._get_order(params['Lgnum'], params['Who'])
+            order.rsrc = ''
+            order.in_process = False
+            order.status = ''
+            order.assigned = None
+            self._queue.appendleft(order.who)
+            return self._order_odata(order)
+        if endpoint in ('/ConfirmWarehouseTaskFirstStep', '/ConfirmWarehouseTask'):
+            order, wht = self._get_task(params['Lgnum'], params['Tanum'])
+            if endpoint == '/ConfirmWarehouseTaskFirstStep':
+                if wht.first_confirmed:
+                    raise ODataError('WAREHOUSE_TASK_ALREADY_CONFIRMED')
+                wht.first_confirmed = True
+                order.first_confirmation = time.monotonic()
+                return self._confirmation_odata(wht, 'B')
+            if wht.confirmed:
+                raise ODataError('WAREHOUSE_TASK_ALREADY_CONFIRMED')
+            wht.confirmed = True
+            if all(task.confirmed for task in order.warehousetasks):
+                order.second_confirmation = time.monotonic()
+                self._finish(order)
+            return self._confirmation_odata(wht, 'C')
+        if endpoint in ('/SendFirstConfirmationError', '/SendSecondConfirmationError'):
+            order = self._get_order(params['Lgnum'], params['Who'])
+            self._finish(order, failed=True)
+            return self._order_odata(order)
+        raise ODataError('404')
+
+    def stage_latencies(self, since: float = 0.0) -> Dict[str, List[float]]:
+        """
+        Get latencies of the processing stages of warehouse orders finished after since.
+
+        Stages are waiting of a robot for its next warehouse order, assignment to first
+        confirmation, first to second confirmation and assignment to second confirmation.
+        """
+        stages: DefaultDict[str, List[float]] = defaultdict(list)
+        with self._lock:
+            stages['waiting_for_order'] = [
+                waited for finished, waited in self.robot_waiting if finished >= since]
+            for order in self._orders.values():
+                if order.failed or order.finished is None or order.finished < since:
+                    continue
+                if order.assigned is not None and order.first_confirmation is not None:
+                    stages['first_confirmation'].append(
+                        order.first_confirmation - order.assigned)
+                    stages['second_confirmation'].append(
+                        order.second_confirmation - order.first_confirmation)
+                    stages['warehouse_order'].append(order.finished - order.assigned)
+        return dict(stages)
+
+    def completed_orders(self, since: float = 0.0) -> Tuple[int, int]:
+        """Get number of successful and failed warehouse orders finished after since."""
+        succeeded = failed = 0
+        with self._lock:
+            for order in self._orders.values():
+                if order.finished is None or order.finished < since:
+                    continue
+                if order.failed:
+                    failed += 1
+                else:
+                    succeeded += 1
+        return succeeded, failed
+
+
+class FakeODataHandler(ODataHandler):
+    """OData handler sending requests to a FakeEWM backend instead of SAP EWM."""
+
+    def __init__(self, config: ODataConfig, backend: FakeEWM) -> None:
+        """Construct."""
+        super().__init__(config)
+        self.backend = backend
+
+    @staticmethod
+    def _unquote_params(urlparams: Optional[Dict]) -> Dict[str, str]:
+        """Remove quotes of OData string parameters."""
+        params = {}
+        for key, value in (urlparams or {}).items():
+            value = str(value)
+            if len(value) > 1 and value[0] == value[-1] == "'":
+                value = value[1:-1]
+            params[key] = value
+        return params
+
+    def http_get(
+            self, endpoint: str, urlparams: Optional[Dict] = None, ids: Optional[Dict] = None,
+            navigation: Optional[str] = None, fetch_csrf: bool = False) -> Any:
+        """Perform a HTTP GET request."""
+        status_code, body = self.backend.request(
+            'GET', endpoint, self._unquote_params(urlparams), ids, navigation or '')
+        return FakeResponse(endpoint, status_code, body)
+
+    def http_patch_post(
+            self, mode: str, endpoint: str, jsonbody: Optional[Dict] = None,
+            urlparams: Optional[Dict] = None, ids: Optional[Dict] = None) -> Any:
+        """Perform a HTTP Patch request."""
+        status_code, body = self.backend.request(
+            mode.upper(), endpoint, self._unquote_params(urlparams), ids, '')
+        return FakeResponse(endpoint, status_code, body)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""In-memory Kubernetes custom objects API with watch semantics."""
+
+import contextlib
+import copy
+import datetime
+import logging
+import queue
+import re
+import threading
+import uuid
+
+from collections import Counter, deque
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from unittest import mock
+
+from kubernetes.client.rest import ApiException
+
+_LOGGER = logging.getLogger(__name__)
+
+# Custom resources are stored per group, plural and namespace
+ResourceKey = Tuple[str, str, str]
+
+SELECTOR_TERM = re.compile(
+    r'^\s*(?P<key>[^\s!=]+)\s*(?:(?P<op>==|!=|=|\s+in\s+|\s+notin\s+)\s*(?P<value>.*?))?\s*$')
+
+
+def _split_selector(selector: str) -> List[str]:
+    """Split a label selector into its terms, commas inside of parentheses are kept."""
+    terms = []
+    depth = 0
+    term = ''
+    for char in selector:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            terms.append(term)
+            term = ''
+        else:
+            term += char
+    terms.append(term)
+    return [t for t in terms if t.strip()]
+
+
+def compile_label_selector(selector: Optional[str]) -> Callable[[Dict[str, str]], bool]:
+    """Compile a label selector to a function which checks the labels of a custom resource."""
+    checks: List[Callable[[Dict[str, str]], bool]] = []
+    for term in _split_selector(selector or ''):
+        term = term.strip()
+        if term.startswith('!'):
+            key = term[1:].strip()
+            checks.append(lambda labels, k=key: k not in labels)
+            continue
+        match = SELECTOR_TERM.match(term)
+        if match is None:
+            raise ApiException(status=400, reason='Invalid label selector "{}"'.format(term))
+        key, operator, value = match.group('key', 'op', 'value')
+        operator = operator.strip() if operator else None
+        if operator is None:
+            checks.append(lambda labels, k=key: k in labels)
+        elif operator in ('=', '=='):
+            checks.append(lambda labels, k=key, v=value: labels.get(k) == v)
+        elif operator == '!=':
+            checks.append(lambda labels, k=key, v=value: labels.get(k) != v)
+        else:
+            values = {v.strip() for v in value.strip('()').split(',')}
+            if operator == 'in':
+                checks.append(lambda labels, k=key, vs=values: labels.get(k) in vs)
+            else:
+                checks.append(lambda labels, k=key, vs=values: labels.get(k) not in vs)
+
+    def matches(labels: Dict[str, str]) -> bool:
+        return all(check(labels) for check in checks)
+
+    return matches
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """Apply a JSON merge patch (RFC 7386) to a copy of target."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _now_iso() -> str:
+    """Get current time as ISO timestamp."""
+    return datetime.datetime.utcnow().replace(
+        tzinfo=datetime.timezone.utc).isoformat()
+
+
+class FakeWatch:
+    """Stand-in for kubernetes.watch.Watch streaming from FakeCustomObjectsApi."""
+
+    def __init__(self) -> None:
+        """Construct."""
+        self.stopped = threading.Event()
+
+    def stop(self) -> None:
+        """Stop streaming."""
+        self.stopped.set()
+
+    def stream(self, func: Callable, *args, **kwargs) -> Iterator[Dict]:
+        """Stream events of the API whose list method is func."""
+        api = func.__self__
+        return api.watch_namespaced_custom_object(self, *args, **kwargs)
+
+
+class FakeApiextensionsApi:
+    """Stand-in for ApiextensionsV1Api, every CRD has a status subresource."""
+
+    def read_custom_resource_definition(self, name: str, **kwargs) -> Any:
+        """Read a custom resource definition."""
+        version = SimpleNamespace(subresources=SimpleNamespace(status={}))
+        return SimpleNamespace(metadata=SimpleNamespace(name=name),
+                               spec=SimpleNamespace(versions=[version]))
+
+
+class FakeCustomObjectsApi:
+    """
+    In-memory stand-in for kubernetes.client.CustomObjectsApi.
+
+    Supports resourceVersions, merge patches, status subresources, label selectors, finalizers and
+    watches with replay of recent events. Calls per method are counted in attribute calls.
+    """
+
+    # Events kept per resource to resume watches
+    HISTORY = 10000
+
+    def __init__(self) -> None:
+        """Construct."""
+        self._objects: Dict[ResourceKey, Dict[str, Dict]] = {}
+        self._history: Dict[ResourceKey, Deque[Tuple[int, str, Dict]]] = {}
+        self._watches: Dict[ResourceKey, List[queue.Queue]] = {}
+        self._resource_version = 0
+        self._lock = threading.RLock()
+        self.calls: Counter = Counter()
+
+    def _store(self, group: str, plural: str, namespace: str) -> Dict[str, Dict]:
+        """Get custom resources of a kind."""
+        return self._objects.setdefault((group, plural, namespace), {})
+
+    def _get(self, group: str, plural: str, namespace: str, name: str) -> Dict:
+        """Get a custom resource or raise a not found error."""
+        try:
+            return self._store(group, plural, namespace)[name]
+        except KeyError:
+            raise ApiException(status=404, reason='Not Found') from None
+
+    def _emit(self, key: ResourceKey, operation: str, obj: Dict) -> None:
+        """Bump resourceVersion of a custom resource and notify watches."""
+        self._resource_version += 1
+        obj['metadata']['resourceVersion'] = str(self._resource_version)
+        history = self._history.setdefault(key, deque(maxlen=self.HISTORY))
+        history.append((self._resource_version, operation, obj))
+        for watch_queue in self._watches.get(key, []):
+            watch_queue.put((operation, obj))
+
+    def _save(self, key: ResourceKey, name: str, old: Dict, new: Dict) -> Dict:
+        """Save a changed custom resource, delete it if finalizers of a deletion are done."""
+        if new == old:
+            return copy.deepcopy(old)
+        store = self._objects[key]
+        metadata = new['metadata']
+        if metadata.get('deletionTimestamp') and not metadata.get('finalizers'):
+            del store[name]
+            self._emit(key, 'DELETED', new)
+        else:
+            if new.get('spec') != old.get('spec'):
+                metadata['generation'] = metadata.get('generation', 1) + 1
+            store[name] = new
+            self._emit(key, 'MODIFIED', new)
+        return copy.deepcopy(new)
+
+    def create_namespaced_custom_object(
+            self, group: str, version: str, namespace: str, plural: str, body: Dict,
+            **kwargs) -> Dict:
+        """Create a custom resource."""
+        self.calls['create'] += 1
+        obj = copy.deepcopy(body)
+        metadata = obj.setdefault('metadata', {})
+        name = metadata.get('name')
+        if not name:
+            raise ApiException(status=422, reason='Name is required')
+        with self._lock:
+            store = self._store(group, plural, namespace)
+            if name in store:
+                raise ApiException(status=409, reason='AlreadyExists')
+            metadata['namespace'] = namespace
+            metadata['uid'] = str(uuid.uuid4())
+            metadata['generation'] = 1
+            metadata['creationTimestamp'] = _now_iso()
+            store[name] = obj
+            self._emit((group, plural, namespace), 'ADDED', obj)
+            return copy.deepcopy(obj)
+
+    def get_namespaced_custom_object(
+            self, group: str, version: str, namespace: str, plural: str, name: str,
+            **kwargs) -> Dict:
+        """Get a custom resource."""
+        self.calls['get'] += 1
+        with self._lock:
+            return copy.deepcopy(self._get(group, plural, namespace, name))
+
+    def list_namespaced_custom_object(
+            self, group: str, version: str, namespace: str, plural: str,
+            label_selector: str = '', **kwargs) -> Dict:
+        """List custom resources."""
+        self.calls['list'] += 1
+        matches = compile_label_selector(label_selector)
+        with self._lock:
+            items = [
+                copy.deepcopy(obj) for obj in self._store(group, plural, namespace).values()
+                if matches(obj['metadata'].get('labels') or {})]
+            resource_version = str(self._resource_version)
+        return {'apiVersion': '{}/{}'.format(group, version), 'items': items,
+                'metadata': {'resourceVersion': resource_version}}
+
+    def patch_namespaced_custom_object(
+            self, group: str, version: str, namespace: str, plural: str, name: str, body: Dict,
+            **kwargs) -> Dict:
+        """Patch a custom resource, changes of its status are ignored."""
+        self.calls['patch'] += 1
+        patch = {k: v for k, v in body.items() if k != 'status'}
+        with self._lock:
+            old = self._get(group, plural, namespace, name)
+            new = merge_patch(old, patch)
+            return self._save((group, plural, namespace), name, old, new)
+
+    def patch_namespaced_custom_object_status(
+            self, group: str, version: str, namespace: str, plural: str, name: str, body: Dict,
+            **kwargs) -> Dict:
+        """Patch the status subresource of a custom resource."""
+        self.calls['patch_status'] += 1
+        with self._lock:
+            old = self._get(group, plural, namespace, name)
+            new = merge_patch(old, {'status': body.get('status')})
+            return self._save((group, plural, namespace), name, old, new)
+
+    def delete_namespaced_custom_object(
+            self, group: str, version: str, namespace: str, plural: str, name: str,
+            **kwargs) -> Dict:
+        """Delete a custom resource, wait for its finalizers if there are any."""
+        self.calls['delete'] += 1
+        with self._lock:
+            old = self._get(group, plural, namespace, name)
+            if old['metadata'].get('deletionTimestamp'):
+                return copy.deepcopy(old)
+            new = copy.deepcopy(old)
+            new['metadata']['deletionTimestamp'] = _now_iso()
+            return self._save((group, plural, namespace), name, old, new)
+
+    def watch_namespaced_custom_object(
+            self, watcher: FakeWatch, group: str, version: str, namespace: str, plural: str,
+            label_selector: str = '', resource_version: str = '', **kwargs) -> Iterator[Dict]:
+        """Stream events of custom resources until the watcher stops."""
+        self.calls['watch'] += 1
+        key = (group, plural, namespace)
+        matches = compile_label_selector(label_selector)
+        watch_queue: queue.Queue = queue.Queue()
+        with self._lock:
+            history = self._history.get(key, deque())
+            if resource_version:
+                since = int(resource_version)
+                if history and since < history[0][0] - 1:
+                    message = 'too old resource version: {} ({})'.format(
+                        since, history[0][0] - 1)
+                    watch_queue.put(('ERROR', {'code': 410, 'message': message}))
+                else:
+                    for version_no, operation, obj in history:
+                        if version_no > since:
+                            watch_queue.put((operation, obj))
+            self._watches.setdefault(key, []).append(watch_queue)
+
+        try:
+            while not watcher.stopped.is_set():
+                try:
+                    operation, obj = watch_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if operation != 'ERROR' and not matches(obj['metadata'].get('labels') or {}):
+                    continue
+                yield {'type': operation, 'object': copy.deepcopy(obj)}
+        finally:
+            with self._lock:
+                self._watches[key].remove(watch_queue)
+
+    def count(self, group: str, plural: str, namespace: str = 'default') -> int:
+        """Get number of custom resources of a kind."""
+        with self._lock:
+            return len(self._store(group, plural, namespace))
+
+
+@contextlib.contextmanager
+def fake_kubernetes(api: FakeCustomObjectsApi) -> Iterator[FakeCustomObjectsApi]:
+    """Let all K8sCRHandler instances created in this context use the in-memory API."""
+    patches = [
+        mock.patch('kubernetes.config.load_kube_config', lambda *args, **kwargs: None),
+        mock.patch('kubernetes.config.load_incluster_config', lambda *args, **kwargs: None),
+        mock.patch('kubernetes.client.CoreV1Api', lambda *args, **kwargs: SimpleNamespace()),
+        mock.patch('kubernetes.client.ApiextensionsV1Api', FakeApiextensionsApi),
+        mock.patch('kubernetes.client.CustomObjectsApi', lambda *args, **kwargs: api),
+        mock.patch('kubernetes.watch.Watch', FakeWatch)]
+    with contextlib.ExitStack() as stack:
+        for patch in patches:
+            stack.enter_context(patch)
+        yield api
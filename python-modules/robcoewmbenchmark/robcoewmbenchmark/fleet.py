@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Simulation of a robot fleet processing warehouse orders in one process."""
+
+import contextlib
+import copy
+import logging
+import multiprocessing
+import os
+import resource
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from unittest import mock
+
+import attr
+
+from dummycontroller.dummyrobot import DummyRobot, RobcoMissionStates
+from dummycontroller.mission import MissionController as DummyMissionController
+from dummycontroller.robot import RobotController as DummyRobotController
+from robcoewmordermanager.auctioneercontroller import AuctioneerController
+from robcoewmordermanager.manager import EWMOrderManager
+from robcoewmordermanager.orderauctioncontroller import OrderAuctionController
+from robcoewmordermanager.ordercontroller import OrderController
+from robcoewmordermanager.orderreservationcontroller import OrderReservationController
+from robcoewmordermanager.robotcontroller import RobotController as OMRobotController
+from robcoewmordermanager.robotconfigcontroller import (
+    RobotConfigurationController as OMRobotConfigurationController)
+from robcoewmrobotcontroller.missioncontroller import MissionHandler
+from robcoewmrobotcontroller.ordercontroller import OrderHandler
+from robcoewmrobotcontroller.robot import EWMRobot
+from robcoewmrobotcontroller.robotcontroller import RobotHandler
+from robcoewmrobotcontroller.robotconfigcontroller import RobotConfigurationHandler
+from robcoewmrobotcontroller.run import create_robot_controller, run_robot
+from robcoewmtypes.helper import get_sample_cr
+
+from .fakeewm import FakeEWM, FakeODataHandler
+from .fakek8s import FakeCustomObjectsApi, fake_kubernetes
+
+_LOGGER = logging.getLogger(__name__)
+
+ROBOT_LABEL = 'cloudrobotics.com/robot-name'
+
+
+def percentiles(values: Iterable[float]) -> Dict[str, float]:
+    """Get mean, median, 90th and 99th percentile and maximum of values."""
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def rank(quantile: float) -> float:
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'p50': rank(0.5),
+            'p90': rank(0.9), 'p99': rank(0.99), 'max': ordered[-1]}
+
+
+def current_rss_kib() -> float:
+    """Get resident set size of this process in KiB, maximum resident set size as fallback."""
+    try:
+        with open('/proc/self/statm', encoding='utf-8') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024
+    except (OSError, ValueError, IndexError):
+        return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+class SimulatedDummyRobot(DummyRobot):
+    """Dummy robot with a given name whose missions take a fixed time."""
+
+    def __init__(self, robot_name: str, mission_duration: float) -> None:
+        """Construct."""
+        self._robot_name = robot_name
+        self.mission_duration = mission_duration
+        self._mission_started: Dict[str, float] = {}
+        super().__init__()
+
+    def init_robot_fromenv(self) -> Dict:
+        """Initialize robot name from constructor instead of environment variables."""
+        return {'ROBCO_ROBOT_NAME': self._robot_name}
+
+    def get_mission_state(self, mission: str) -> Tuple[str, str]:
+        """Get the state of a mission by its run time."""
+        started = self._mission_started.setdefault(mission, time.monotonic())
+        elapsed = time.monotonic() - started
+        if elapsed >= self.mission_duration:
+            self._mission_started.pop(mission, None)
+            return (RobcoMissionStates.get_robco_state('Done', 'Done'), '')
+        if elapsed >= self.mission_duration / 3:
+            return (RobcoMissionStates.get_robco_state('Executing', 'Executing'), '')
+        return (RobcoMissionStates.get_robco_state('Pending', 'Pending'), '')
+
+
+@attr.s
+class FleetBenchmarkResult:
+    """Result of a fleet simulation run."""
+
+    robots: int = attr.ib()
+    duration: float = attr.ib()
+    orders_succeeded: int = attr.ib()
+    orders_failed: int = attr.ib()
+    orders_per_hour: float = attr.ib()
+    orders_per_robot_hour: float = attr.ib()
+    # Percentiles of processing stages in seconds
+    latencies: Dict[str, Dict[str, float]] = attr.ib()
+    # Share of one CPU core used per robot in percent
+    cpu_percent_per_robot: float = attr.ib()
+    rss_kib_per_robot: float = attr.ib()
+    threads: int = attr.ib()
+    k8s_calls: Dict[str, int] = attr.ib()
+    odata_calls: Dict[str, int] = attr.ib()
+
+
+class FleetSimulation:
+    """
+    Run order manager, robot controller and dummy robots of a fleet in one process.
+
+    Kubernetes and SAP EWM are replaced by in-memory fakes. Environment variables of the order
+    manager like ORDER_PREFETCH or ORDER_ASSIGNMENT_MODE are respected.
+    """
+
+    def __init__(self, robots: int, mission_duration: float = 2.0,
+                 mission_state_interval: float = 0.2, ewm_latency: float = 0.0,
+                 lgnum: str = '1710', namespace: str = 'default') -> None:
+        """Construct."""
+        self.robot_names = ['robot-{:04d}'.format(i) for i in range(robots)]
+        self.mission_duration = mission_duration
+        self.mission_state_interval = mission_state_interval
+        self.lgnum = lgnum
+        self.namespace = namespace
+        self.k8s = FakeCustomObjectsApi()
+        self.ewm = FakeEWM(lgnum=lgnum, latency=ewm_latency)
+
+        self.manager: Optional[EWMOrderManager] = None
+        self.robots: Dict[str, EWMRobot] = {}
+        self._handlers: List = []
+        self._dummy_controllers: List = []
+        self._patches = contextlib.ExitStack()
+        self._thread_run = False
+        self._main_loop_thread = threading.Thread(target=self._main_loop, daemon=True)
+
+    def _create_robot_crs(self, robot_name: str) -> None:
+        """Create robot and robotconfiguration CRs of a robot."""
+        robot_cr = get_sample_cr('robco_robot')
+        robot_cr['metadata'].update(
+            {'name': robot_name, 'namespace': self.namespace, 'labels': {ROBOT_LABEL: robot_name}})
+        robot_cr['spec'] = {'type': 'dummy'}
+        self.k8s.create_namespaced_custom_object(
+            'registry.cloudrobotics.com', 'v1alpha1', self.namespace, 'robots', robot_cr)
+
+        config_cr = get_sample_cr('robotconfiguration')
+        config_cr['metadata'].update(
+            {'name': robot_name, 'namespace': self.namespace, 'labels': {ROBOT_LABEL: robot_name}})
+        config_cr['spec'].update({
+            'lgnum': self.lgnum, 'rsrctype': 'RB01', 'rsrcgrp': 'RB02', 'batteryMin': 10,
+            'batteryOk': 80, 'batteryIdle': 40, 'maxIdleTime': 0, 'chargers': ['CHARGER-1'],
+            'mode': 'RUN'})
+        self.k8s.create_namespaced_custom_object(
+            'ewm.sap.com', 'v1alpha1', self.namespace, 'robotconfigurations', config_cr)
+
+    def _start_dummy_robots(self) -> None:
+        """Start mission and status controllers of the dummy robots."""
+        for robot_name in self.robot_names:
+            dummy = SimulatedDummyRobot(robot_name, self.mission_duration)
+            robot_controller = DummyRobotController(dummy, self.namespace)
+            mission_controller = DummyMissionController(dummy, self.namespace)
+            mission_controller.mission_state_interval = self.mission_state_interval
+            # Do not block shutdown while status loops are sleeping
+            robot_controller.robot_status_update_thread.daemon = True
+            mission_controller.robot_status_watcher_thread.daemon = True
+            robot_controller.run(reprocess=False)
+            mission_controller.run(reprocess=True)
+            self._dummy_controllers.extend((robot_controller, mission_controller))
+
+    def _start_robot_controller(self) -> None:
+        """Start EWM state machines of the robots."""
+        rc_handler = RobotConfigurationHandler(self.namespace, robot_label_selector=True)
+        r_handler = RobotHandler(self.namespace)
+        m_handler = MissionHandler(self.namespace)
+        o_handler = OrderHandler(self.namespace)
+        handlers = (rc_handler, r_handler, m_handler, o_handler)
+
+        robot_controllers = [
+            create_robot_controller(robot_name, rc_handler, r_handler, m_handler)
+            for robot_name in self.robot_names]
+        for handler in handlers:
+            handler.add_selector_robots(self.robot_names)
+            handler.run(multiple_executor_threads=True)
+        for robot_controller in robot_controllers:
+            robot = run_robot(robot_controller, o_handler)
+            self.robots[robot.robot_config.robot_name] = robot
+        for handler in handlers:
+            handler.process_all_crs()
+        self._handlers.extend(handlers)
+
+    def _start_order_manager(self) -> None:
+        """Start order manager."""
+        manager = EWMOrderManager(
+            OrderController(self.namespace), OMRobotConfigurationController(self.namespace),
+            OrderReservationController(self.namespace), OrderAuctionController(self.namespace),
+            AuctioneerController(self.namespace), OMRobotController(self.namespace))
+        manager.ordercontroller.deleted_warehouse_orders_thread.daemon = True
+        manager.robotcontroller.run(reprocess=False, multiple_executor_threads=False)
+        manager.auctioneercontroller.run(reprocess=False, multiple_executor_threads=False)
+        manager.orderauctioncontroller.run(reprocess=False, multiple_executor_threads=False)
+        manager.ordercontroller.run(reprocess=True, multiple_executor_threads=True)
+        manager.orderreservationcontroller.run(reprocess=True, multiple_executor_threads=True)
+        manager.robotconfigcontroller.run(reprocess=True, multiple_executor_threads=True)
+        self._handlers.extend((
+            manager.robotcontroller, manager.auctioneercontroller, manager.orderauctioncontroller,
+            manager.ordercontroller, manager.orderreservationcontroller,
+            manager.robotconfigcontroller))
+        self.manager = manager
+
+    def _main_loop(self) -> None:
+        """Run periodic tasks of the order manager main loop."""
+        while self._thread_run:
+            if self.manager is not None and self.manager.batch_assignment.enabled:
+                self.manager.run_batch_assignment()
+            time.sleep(1.0)
+
+    def start(self) -> None:
+        """Start all components of the fleet."""
+        env = {'EWM_HOST': 'https://fake-ewm', 'EWM_BASEPATH': '/odata/SAP/ZEWM_ROBCO_SRV',
+               'EWM_AUTH': 'Basic', 'EWM_USER': 'benchmark', 'EWM_PASSWORD': 'benchmark',
+               'K8S_NAMESPACE': self.namespace}
+        self._patches.enter_context(mock.patch.dict(os.environ, env))
+        self._patches.enter_context(fake_kubernetes(self.k8s))
+        self._patches.enter_context(mock.patch(
+            'robcoewmordermanager.manager.ODataHandler',
+            lambda config: FakeODataHandler(config, self.ewm)))
+
+        for robot_name in self.robot_names:
+            self._create_robot_crs(robot_name)
+        self._start_dummy_robots()
+        self._start_robot_controller()
+        self._start_order_manager()
+        self._thread_run = True
+        self._main_loop_thread.start()
+        _LOGGER.info('Fleet of %s robots started', len(self.robot_names))
+
+    def stop(self) -> None:
+        """Stop all components of the fleet."""
+        self._thread_run = False
+        for robot in self.robots.values():
+            robot.state_machine.disconnect_external_events()
+        for handler in self._handlers + self._dummy_controllers:
+            handler.stop_watcher()
+        if self.manager is not None:
+            self.manager.partitions.shutdown()
+        self._patches.close()
+        _LOGGER.info('Fleet of %s robots stopped', len(self.robot_names))
+
+
+def run_fleet_benchmark(robots: int, duration: float = 60.0, warmup: float = 10.0,
+                        mission_duration: float = 2.0, mission_state_interval: float = 0.2,
+                        ewm_latency: float = 0.0) -> FleetBenchmarkResult:
+    """
+    Run a fleet simulation and measure it after a warmup period.
+
+    Memory per robot is the growth of the resident set size from before the fleet was started.
+    """
+    rss_before = current_rss_kib()
+    fleet = FleetSimulation(
+        robots, mission_duration=mission_duration,
+        mission_state_interval=mission_state_interval, ewm_latency=ewm_latency)
+    fleet.start()
+    try:
+        time.sleep(warmup)
+        start = time.monotonic()
+        cpu_start = time.process_time()
+        k8s_calls_start = dict(fleet.k8s.calls)
+        odata_calls_start = dict(fleet.ewm.requests)
+        time.sleep(duration)
+        cpu_seconds = time.process_time() - cpu_start
+        elapsed = time.monotonic() - start
+        rss = current_rss_kib()
+        threads = threading.active_count()
+        succeeded, failed = fleet.ewm.completed_orders(since=start)
+        latencies = {
+            stage: percentiles(values)
+            for stage, values in fleet.ewm.stage_latencies(since=start).items()}
+        k8s_calls = {
+            k: v - k8s_calls_start.get(k, 0) for k, v in copy.copy(fleet.k8s.calls).items()}
+        odata_calls = {
+            k: v - odata_calls_start.get(k, 0) for k, v in copy.copy(fleet.ewm.requests).items()}
+    finally:
+        fleet.stop()
+
+    orders_per_hour = succeeded / elapsed * 3600
+    return FleetBenchmarkResult(
+        robots=robots, duration=elapsed, orders_succeeded=succeeded, orders_failed=failed,
+        orders_per_hour=orders_per_hour, orders_per_robot_hour=orders_per_hour / robots,
+        latencies=latencies, cpu_percent_per_robot=cpu_seconds / elapsed / robots * 100,
+        rss_kib_per_robot=(rss - rss_before) / robots, threads=threads, k8s_calls=k8s_calls,
+        odata_calls=odata_calls)
+
+
+def _init_worker_logging(level: int) -> None:
+    """Initialize logging of a benchmark worker process."""
+    logging.basicConfig(
+        level=level, format='%(asctime)s %(processName)s %(name)s %(levelname)s %(message)s')
+
+
+def run_fleet_benchmark_isolated(robots: int, **kwargs) -> FleetBenchmarkResult:
+    """Run a fleet benchmark in a fresh process, so results of runs do not interfere."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+            max_workers=1, mp_context=context, initializer=_init_worker_logging,
+            initargs=(logging.getLogger().getEffectiveLevel(),)) as pool:
+        return pool.submit(run_fleet_benchmark, robots, **kwargs).result()
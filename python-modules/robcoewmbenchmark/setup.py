@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Fleet simulation benchmark for SAP EWM Cloud Robotics."""
+from setuptools import find_packages, setup
+
+REQUIRES = [
+    'attrs==21.2.0',
+    'k8scrhandler',
+    'robcoewmtypes',
+    'robcoewminterface',
+    'robcoewmordermanager',
+    'robcoewmrobotcontroller',
+    'dummycontroller'
+    ]
+
+setup(
+    name='robcoewmbenchmark',
+    version='0.1.0',
+    description='Fleet simulation benchmark for SAP EWM Cloud Robotics',
+    url='https://github.com/SAP/ewm-cloud-robotics',
+    author='SAP SE',
+    license='Apache License 2.0',
+    packages=find_packages(),
+    install_requires=REQUIRES
+)
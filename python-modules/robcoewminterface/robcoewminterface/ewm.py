@@ -194,7 +194,7 @@ class WarehouseOData(EWMOdata):
 
         return self.handle_http_response(endpoint, http_resp)
 
-    def get_storagebins(self, lgnum: Optional[str] = None) -> List[WarehouseDescription]:
+    def get_storagebins(self, lgnum: Optional[str] = None) -> List[StorageBin]:
         """
         Get all storage bins from the system.
 
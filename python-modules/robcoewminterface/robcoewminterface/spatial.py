@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Cached spatial indices of EWM storage bins."""
+
+import logging
+import threading
+import time
+
+from typing import Dict, Optional, Tuple
+
+from robcoewmtypes.spatial import StorageBinIndex
+
+from .ewm import WarehouseOData
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StorageBinIndexCache:
+    """
+    Storage bin spatial index per warehouse, built once from EWM and cached.
+
+    Indices older than max_age seconds are refreshed incrementally on next access.
+    max_age 0 means an index is never refreshed automatically.
+    """
+
+    def __init__(self, warehouse_odata: WarehouseOData, max_age: float = 3600.0,
+                 cell_size: Optional[float] = None, use_z: bool = False) -> None:
+        """Construct."""
+        self.warehouse_odata = warehouse_odata
+        self.max_age = max_age
+        self.cell_size = cell_size
+        self.use_z = use_z
+        # Index and its update time per warehouse
+        self._indices: Dict[str, Tuple[StorageBinIndex, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, lgnum: str) -> StorageBinIndex:
+        """Get spatial index of a warehouse, build or refresh it if necessary."""
+        with self._lock:
+            entry = self._indices.get(lgnum)
+            if entry is None:
+                return self._build(lgnum)
+            index, updated = entry
+            if self.max_age > 0 and time.monotonic() - updated > self.max_age:
+                self._refresh(lgnum, index)
+            return index
+
+    def refresh(self, lgnum: str) -> StorageBinIndex:
+        """Refresh spatial index of a warehouse now."""
+        with self._lock:
+            entry = self._indices.get(lgnum)
+            if entry is None:
+                return self._build(lgnum)
+            self._refresh(lgnum, entry[0])
+            return entry[0]
+
+    def _build(self, lgnum: str) -> StorageBinIndex:
+        """Build spatial index of a warehouse."""
+        storagebins = self.warehouse_odata.get_storagebins(lgnum)
+        index = StorageBinIndex(storagebins, cell_size=self.cell_size, use_z=self.use_z)
+        self._indices[lgnum] = (index, time.monotonic())
+        _LOGGER.info('Built spatial index of %s storage bins in warehouse %s', len(index), lgnum)
+        return index
+
+    def _refresh(self, lgnum: str, index: StorageBinIndex) -> None:
+        """Refresh spatial index of a warehouse incrementally."""
+        storagebins = self.warehouse_odata.get_storagebins(lgnum)
+        changed, removed = index.refresh(storagebins)
+        self._indices[lgnum] = (index, time.monotonic())
+        _LOGGER.debug(
+            'Refreshed spatial index of warehouse %s: %s bins changed, %s removed', lgnum,
+            changed, removed)
+
+    def invalidate(self, lgnum: Optional[str] = None) -> None:
+        """Drop cached index of a warehouse or of all warehouses."""
+        with self._lock:
+            if lgnum is None:
+                self._indices.clear()
+            else:
+                self._indices.pop(lgnum, None)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Distance aware batch assignment of warehouse orders to robots."""
+
+import os
+import logging
+import math
+import threading
+import time
+
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Tuple
+
+from robcoewmtypes.spatial import StorageBinIndex, pairwise_distances
+from robcoewmtypes.warehouseorder import WarehouseOrder
+
+from .helper import RobotIdentifier
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Resource group and resource type of a robot
+RobotGroup = Tuple[str, str]
+
+
+def _solve_numpy(cost: Any) -> List[Tuple[int, int]]:
+    """Solve assignment problem with rows <= columns, vectorized over columns."""
+    n, m = cost.shape
+    # Potentials of rows and columns, row assigned to column, index 0 is a dummy
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.intp)
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            j1 = int(np.argmin(np.where(free, minv[1:], np.inf))) + 1
+            delta = minv[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return [(int(p[j]) - 1, j - 1) for j in range(1, m + 1) if p[j]]
+
+
+def _solve_lists(cost: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """Solve assignment problem with rows <= columns."""
+    n, m = len(cost), len(cost[0])
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = math.inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    return [(p[j] - 1, j - 1) for j in range(1, m + 1) if p[j]]
+
+
+def solve_assignment(cost: Any) -> List[Tuple[int, int]]:
+    """
+    Assign rows to columns of a cost matrix with minimal total cost.
+
+    Uses the hungarian method with row and column potentials. Rectangular matrices are supported,
+    then only min(rows, columns) pairs are assigned. Returns (row, column) pairs sorted by row.
+    """
+    rows = len(cost)
+    if not rows or not len(cost[0]):  # pylint: disable=len-as-condition
+        return []
+    if np is not None:
+        matrix = np.asarray(cost, dtype='f8')
+        if rows > matrix.shape[1]:
+            pairs = [(i, j) for j, i in _solve_numpy(matrix.T)]
+        else:
+            pairs = _solve_numpy(matrix)
+    elif rows > len(cost[0]):
+        pairs = [(i, j) for j, i in _solve_lists([list(col) for col in zip(*cost)])]
+    else:
+        pairs = _solve_lists(cost)
+    return sorted(pairs)
+
+
+def build_cost_matrix(index: Optional[StorageBinIndex], lgnum: str,
+                      robot_bins: Sequence[Optional[str]],
+                      whos: Sequence[WarehouseOrder]) -> Any:
+    """
+    Get travel distances of robots to the source bin of the first task of warehouse orders.
+
+    Robots with an unknown location get the same costs for all orders. Orders whose source bin is
+    unknown get higher costs than all known ones, so they are assigned last.
+    """
+    def point(lgpla: Optional[str]) -> Optional[Tuple[float, ...]]:
+        return index.point(lgnum, lgpla) if index is not None and lgpla else None
+
+    robot_points = [point(lgpla) for lgpla in robot_bins]
+    who_points = [
+        point(who.warehousetasks[0].vlpla) if who.warehousetasks else None for who in whos]
+
+    known_robots = [i for i, pt in enumerate(robot_points) if pt is not None]
+    known_whos = [j for j, pt in enumerate(who_points) if pt is not None]
+    # Without known locations all orders have the same costs
+    distances: Any = []
+    if known_robots and known_whos:
+        distances = pairwise_distances(
+            [robot_points[i] for i in known_robots], [who_points[j] for j in known_whos])
+
+    if np is not None:
+        cost = np.zeros((len(robot_points), len(who_points)))
+        if known_robots and known_whos:
+            cost[np.ix_(known_robots, known_whos)] = distances
+        unknown_whos = [j for j, pt in enumerate(who_points) if pt is None]
+        cost[:, unknown_whos] = cost.max() + 1.0
+        return cost
+
+    cost_lists = [[0.0] * len(who_points) for _ in robot_points]
+    for row, i in zip(distances, known_robots):
+        for dist, j in zip(row, known_whos):
+            cost_lists[i][j] = dist
+    penalty = max((max(row) for row in cost_lists if row), default=0.0) + 1.0
+    for j, pt in enumerate(who_points):
+        if pt is None:
+            for row in cost_lists:
+                row[j] = penalty
+    return cost_lists
+
+
+class BatchAssignment:
+    """
+    Collect idle robots per warehouse to assign warehouse orders to them in batches.
+
+    Robots request work by processing of their robotconfiguration CRs. Requests are collected for
+    a short time window, then all idle robots of a warehouse get orders in one go.
+    """
+
+    MODE_ROBOT = 'robot'
+    MODE_BATCH = 'batch'
+
+    def __init__(self) -> None:
+        """Construct."""
+        self.mode = os.environ.get('ORDER_ASSIGNMENT_MODE', self.MODE_ROBOT).lower()
+        if self.mode not in (self.MODE_ROBOT, self.MODE_BATCH):
+            raise ValueError('Invalid order assignment mode "{}"'.format(self.mode))
+        # Seconds to collect work requests of robots before assigning orders
+        self.window = float(os.environ.get('BATCH_ASSIGNMENT_WINDOW', 2.0))
+        # Warehouse orders reserved per robot to choose from
+        self.candidates_per_robot = int(os.environ.get('BATCH_ASSIGNMENT_CANDIDATES', 2))
+        # Requests are dropped when they are not renewed
+        self.max_request_age = 30.0
+        # Robots which got an order recently do not request work until their CR arrives
+        self.assigned_timeout = 30.0
+
+        # Work requests per warehouse and robot with robot group, first and last request time
+        self._requests: DefaultDict[
+            str, Dict[str, Tuple[RobotGroup, float, float]]] = defaultdict(dict)
+        self._assigned: Dict[RobotIdentifier, float] = {}
+        # Last storage bin of robots by their warehouse task confirmations
+        self._robot_bins: Dict[RobotIdentifier, str] = {}
+        self._lock = threading.Lock()
+
+        if self.enabled:
+            _LOGGER.info(
+                'Batch assignment of warehouse orders enabled, collecting work requests for %s '
+                'seconds', self.window)
+
+    @property
+    def enabled(self) -> bool:
+        """Check if batch assignment is enabled."""
+        return self.mode == self.MODE_BATCH
+
+    def request(self, robotident: RobotIdentifier, rsrcgrp: str, rsrctype: str) -> None:
+        """Add a work request of an idle robot."""
+        now = time.monotonic()
+        with self._lock:
+            assigned = self._assigned.get(robotident)
+            if assigned is not None:
+                if now - assigned < self.assigned_timeout:
+                    return
+                del self._assigned[robotident]
+            requests = self._requests[robotident.lgnum]
+            first = requests[robotident.rsrc][1] if robotident.rsrc in requests else now
+            requests[robotident.rsrc] = ((rsrcgrp, rsrctype), first, now)
+
+    def discard(self, robotident: RobotIdentifier) -> None:
+        """Remove work request of a robot which is not idle anymore."""
+        with self._lock:
+            self._requests[robotident.lgnum].pop(robotident.rsrc, None)
+
+    def mark_assigned(self, robotident: RobotIdentifier) -> None:
+        """Memorize that a robot got a warehouse order."""
+        with self._lock:
+            self._assigned[robotident] = time.monotonic()
+
+    def due_warehouses(self) -> List[str]:
+        """Get warehouses whose oldest work request is older than the time window."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for lgnum, requests in self._requests.items():
+                if requests and now - min(req[1] for req in requests.values()) >= self.window:
+                    due.append(lgnum)
+        return due
+
+    def pop_requests(self, lgnum: str) -> Dict[RobotGroup, List[str]]:
+        """Get and remove current work requests of a warehouse by robot group."""
+        now = time.monotonic()
+        groups: DefaultDict[RobotGroup, List[str]] = defaultdict(list)
+        with self._lock:
+            requests = self._requests.pop(lgnum, {})
+        for rsrc, (group, _, last) in sorted(requests.items()):
+            if now - last <= self.max_request_age:
+                groups[group].append(rsrc)
+        return groups
+
+    def update_robot_bin(self, robotident: RobotIdentifier, lgpla: str) -> None:
+        """Memorize the storage bin where a robot is located."""
+        if lgpla:
+            self._robot_bins[RobotIdentifier(robotident.lgnum, robotident.rsrc.upper())] = lgpla
+
+    def robot_bin(self, robotident: RobotIdentifier) -> Optional[str]:
+        """Get the last known storage bin of a robot."""
+        return self._robot_bins.get(RobotIdentifier(robotident.lgnum, robotident.rsrc.upper()))
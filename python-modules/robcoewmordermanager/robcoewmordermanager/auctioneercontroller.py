@@ -17,8 +17,7 @@ import logging
 from threading import RLock
 from typing import Dict
 
-from cattr import structure
-
+from robcoewmtypes.converter import structure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.auction import AuctioneerStatus
 
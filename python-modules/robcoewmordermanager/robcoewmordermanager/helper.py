@@ -14,12 +14,12 @@
 
 import time
 
-from typing import List, DefaultDict, OrderedDict as TOrderedDict
+from typing import DefaultDict, OrderedDict as TOrderedDict, Set
 
 from collections import defaultdict, namedtuple, OrderedDict
 
 from robcoewmtypes.robot import RobotConfigurationStatus
-from robcoewmtypes.warehouseorder import ConfirmWarehouseTask
+from robcoewmtypes.warehouseorder import ConfirmWarehouseTask, FrozenConfirmWarehouseTask
 from robcoewminterface.exceptions import NoOrderFoundError
 
 RobotIdentifier = namedtuple('RobotIdentifier', ['lgnum', 'rsrc'])
@@ -42,7 +42,8 @@ class ProcessedMessageMemory:
     def __init__(self) -> None:
         """Construct."""
         # Warehouse order confirmations
-        self.who_confirmations: DefaultDict[WhoIdentifier, List] = defaultdict(list)
+        self.who_confirmations: DefaultDict[
+            WhoIdentifier, Set[FrozenConfirmWarehouseTask]] = defaultdict(set)
         self.deleted_whos: TOrderedDict[WhoIdentifier, float] = OrderedDict()
         # RobotConfiguration Status
         self.robot_conf_status: DefaultDict[
@@ -51,12 +52,13 @@ class ProcessedMessageMemory:
     def memorize_who_conf(self, conf: ConfirmWarehouseTask) -> None:
         """Memorize warehouse order confirmation."""
         whoident = WhoIdentifier(conf.lgnum, conf.who)
-        self.who_confirmations[whoident].append(conf)
+        self.who_confirmations[whoident].add(FrozenConfirmWarehouseTask.from_mutable(conf))
 
     def check_who_conf_processed(self, conf: ConfirmWarehouseTask) -> bool:
         """Check if warehouse order confirmation was processed before."""
         whoident = WhoIdentifier(conf.lgnum, conf.who)
-        return bool(conf in self.who_confirmations[whoident])
+        return bool(
+            FrozenConfirmWarehouseTask.from_mutable(conf) in self.who_confirmations[whoident])
 
     def delete_who_from_memory(self, whoident: WhoIdentifier) -> None:
         """Delete warehouse order from memory."""
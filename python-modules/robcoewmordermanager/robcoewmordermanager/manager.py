@@ -17,19 +17,21 @@ import logging
 
 from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import attr
-from cattr import structure, unstructure
 from dateutil.parser import isoparse
 
+from kubernetes.client.rest import ApiException
 from prometheus_client import Counter
 
+from robcoewmtypes.converter import structure, structure_trusted, unstructure
 from robcoewmtypes.robot import RobotConfigurationSpec, RobotConfigurationStatus, RobcoRobotStates
 from robcoewmtypes.statemachine_config import RobotEWMConfig
 from robcoewmtypes.warehouseorder import (
     ConfirmWarehouseTask, WarehouseOrder, WarehouseOrderCRDSpec, WarehouseOrderIdent)
 from robcoewmtypes.auction import OrderReservationSpec, OrderReservationStatus, AuctioneerStatus
+from robcoewmtypes.spatial import StorageBinIndex
 
 from robcoewminterface.types import ODataConfig
 from robcoewminterface.odata import ODataHandler
@@ -39,7 +41,9 @@ from robcoewminterface.exceptions import (
     NotFoundError, ResourceTypeIsNoRobotError, RobotNotFoundError, WarehouseOrderAssignedError,
     WarehouseTaskAssignedError, ODATA_ERROR_CODES)
 
+from .assignment import BatchAssignment, build_cost_matrix, solve_assignment
 from .helper import ProcessedMessageMemory, RobotIdentifier, WhoIdentifier
+from .partition import WarehousePartitions
 from .ordercontroller import OrderController
 from .robotconfigcontroller import RobotConfigurationController
 from .orderreservationcontroller import OrderReservationController
@@ -72,8 +76,14 @@ class EWMOrderManager:
 
         # SAP EWM OData handler
         self.odatahandler = ODataHandler(self.odataconfig)
-        # SAP EWM OData APIs
-        self.ewmwho = WarehouseOrderOData(self.odatahandler)
+        # SAP EWM OData APIs, work queues and worker pools per warehouse
+        self.partitions = WarehousePartitions(self.odatahandler)
+        # Reserve the next warehouse order of a robot while it works on its last warehouse task
+        self.order_prefetch = os.environ.get('ORDER_PREFETCH', '').lower() == 'true'
+        if self.order_prefetch:
+            _LOGGER.info('Prefetching of warehouse orders enabled')
+        # Batch assignment of warehouse orders to idle robots
+        self.batch_assignment = BatchAssignment()
 
         # K8s Custom Resource Controller
         self.ordercontroller = oc
@@ -86,13 +96,15 @@ class EWMOrderManager:
         # Register callback functions
         # Warehouse order status callback
         self.ordercontroller.register_callback(
-            'KubernetesWhoCR', ['MODIFIED', 'REPROCESS'], self.process_who_cr_cb)
+            'KubernetesWhoCR', ['MODIFIED', 'REPROCESS'], self.dispatch_who_cr_cb)
         # Robot request controller
         self.robotconfigcontroller.register_callback(
-            'RobotConfiguration', ['ADDED', 'MODIFIED', 'REPROCESS'], self.robotconfig_cb)
+            'RobotConfiguration', ['ADDED', 'MODIFIED', 'REPROCESS'],
+            self.dispatch_robotconfig_cb)
         # Order reservation controller
         self.orderreservationcontroller.register_callback(
-            'OrderReservation', ['ADDED', 'MODIFIED', 'REPROCESS'], self.orderreservation_cb)
+            'OrderReservation', ['ADDED', 'MODIFIED', 'REPROCESS'],
+            self.dispatch_orderreservation_cb)
 
     def init_odata_fromenv(self) -> None:
         """Initialize OData interface from environment variables."""
@@ -142,6 +154,24 @@ class EWMOrderManager:
         self.reservation_timeout = float(envvar['RESERVATION_TIMEOUT'])  # type: ignore
         _LOGGER.info('Order auction reservation timeout is %s minutes', self.reservation_timeout)
 
+    def dispatch_robotconfig_cb(self, name: str, custom_res: Dict) -> None:
+        """Queue robotconfiguration CR in the partition of its warehouse."""
+        lgnum = custom_res.get('spec', {}).get('lgnum')
+        self.partitions.submit(
+            lgnum, ('RobotConfiguration', name), self.robotconfig_cb, name, custom_res)
+
+    def dispatch_who_cr_cb(self, name: str, custom_res: Dict) -> None:
+        """Queue warehouse order CR in the partition of its warehouse."""
+        lgnum = custom_res.get('spec', {}).get('data', {}).get('lgnum')
+        self.partitions.submit(
+            lgnum, ('KubernetesWhoCR', name), self.process_who_cr_cb, name, custom_res)
+
+    def dispatch_orderreservation_cb(self, name: str, custom_res: Dict) -> None:
+        """Queue order reservation CR in the partition of its warehouse."""
+        lgnum = custom_res.get('spec', {}).get('orderrequest', {}).get('lgnum')
+        self.partitions.submit(
+            lgnum, ('OrderReservation', name), self.orderreservation_cb, name, custom_res)
+
     def robotconfig_cb(self, name: str, custom_res: Dict) -> None:
         """
         Handle exceptions of robotconfiguration CR processing.
@@ -166,10 +196,11 @@ class EWMOrderManager:
         """
         # Structure the robotconfig data
         config_spec = structure(custom_res['spec'], RobotConfigurationSpec)
-        config_status = structure(custom_res['status'], RobotConfigurationStatus)
+        config_status = structure_trusted(custom_res['status'], RobotConfigurationStatus)
 
         robot = name
         robotident = RobotIdentifier(config_spec.lgnum, robot.upper())
+        ewmwho = self.partitions.ewmwho(config_spec.lgnum)
 
         firstrequest = bool(config_status != self.msg_mem.robot_conf_status[robot])
 
@@ -212,7 +243,7 @@ class EWMOrderManager:
 
                 if unassign_who is True:
                     try:
-                        self.ewmwho.unassign_robot_warehouseorder(
+                        ewmwho.unassign_robot_warehouseorder(
                             who_spec.data.lgnum, who_spec.data.rsrc, who_spec.data.who)
                     except (TimeoutError, ConnectionError) as err:
                         # If not successfull. Raise to put message back in queue
@@ -277,15 +308,25 @@ class EWMOrderManager:
                             _LOGGER.info(
                                 'Warehouse order queue of robot %s is empty. Start requesting a '
                                 'new warehouse order', robot)
-                        self.get_and_send_robot_whos(
-                            robotident, firstrequest=firstrequest, newwho=False, onlynewwho=True)
+                        if self.batch_assignment.enabled:
+                            self.batch_assignment.request(
+                                robotident, config_spec.rsrcgrp, config_spec.rsrctype)
+                        else:
+                            self.get_and_send_robot_whos(
+                                robotident, firstrequest=firstrequest, newwho=False,
+                                onlynewwho=True)
 
                 self.msg_mem.robot_conf_status[robot] = config_status
+            else:
+                self.batch_assignment.discard(robotident)
+        else:
+            self.batch_assignment.discard(robotident)
 
     def confirm_warehousetask(self, whtask: ConfirmWarehouseTask) -> None:
         """Confirm the warehouse task in SAP EWM using OData service."""
+        ewmwho = self.partitions.ewmwho(whtask.lgnum)
         # Get warehouse order from EWM
-        who = self.ewmwho.get_warehouseorder(
+        who = ewmwho.get_warehouseorder(
             whtask.lgnum, whtask.who, openwarehousetasks=True)
         # Check if warehouse task is still open
         whtopen = False
@@ -297,7 +338,7 @@ class EWMOrderManager:
         if whtopen is True:
             # Remove entry from warehouse order to check in the end if there are not more open
             # warehouse tasks left
-            who.warehousetasks.pop(wht_listno)
+            wht = who.warehousetasks.pop(wht_listno)
         else:
             _LOGGER.warning(
                 'Warehouse task "%s" of warehouse order "%s" was already '
@@ -309,7 +350,7 @@ class EWMOrderManager:
             # Perform first confirmation
             if whtask.confirmationnumber == ConfirmWarehouseTask.FIRST_CONF:
                 try:
-                    self.ewmwho.confirm_warehousetask_firststep(
+                    ewmwho.confirm_warehousetask_firststep(
                         whtask.lgnum, whtask.tanum, whtask.rsrc)
                 except (TimeoutError, ConnectionError) as err:
                     # If not successfull. Raise to put message back in queue
@@ -334,10 +375,12 @@ class EWMOrderManager:
                         'Warehouse task Lgnum "%s", Tanum "%s" of warehouse order "%s" got '
                         'successfull first confirmation by robot "%s"', whtask.lgnum, whtask.tanum,
                         whtask.who, whtask.rsrc)
+                    self.batch_assignment.update_robot_bin(
+                        RobotIdentifier(whtask.lgnum, whtask.rsrc), wht.vlpla)
             # Perform second confirmation
             elif whtask.confirmationnumber == ConfirmWarehouseTask.SECOND_CONF:
                 try:
-                    self.ewmwho.confirm_warehousetask(whtask.lgnum, whtask.tanum, whtask.rsrc)
+                    ewmwho.confirm_warehousetask(whtask.lgnum, whtask.tanum, whtask.rsrc)
                 except (TimeoutError, ConnectionError) as err:
                     # If not successfull. Raise to put message back in queue
                     _LOGGER.error(
@@ -363,6 +406,8 @@ class EWMOrderManager:
                     whtask.rsrc)
                 self.who_counter.labels(  # pylint: disable=no-member
                     robot=whtask.rsrc.lower(), result=STATE_SUCCEEDED).inc()
+                self.batch_assignment.update_robot_bin(
+                    RobotIdentifier(whtask.lgnum, whtask.rsrc), wht.nlpla)
 
                 # Cleanup warehouse order if there are no warehouse tasks
                 if not who.warehousetasks:
@@ -372,7 +417,7 @@ class EWMOrderManager:
         elif whtask.confirmationtype == ConfirmWarehouseTask.CONF_ERROR:
             # Send an error to SAP EWM if an error occured on the robot before a confirmation
             try:
-                self.ewmwho.send_confirmation_error(
+                ewmwho.send_confirmation_error(
                     whtask.lgnum, whtask.rsrc, whtask.who, whtask.tanum, whtask.confirmationnumber)
             except (TimeoutError, ConnectionError) as err:
                 # If not successfull. Raise to put message back in queue
@@ -424,12 +469,13 @@ class EWMOrderManager:
             self, robotident: RobotIdentifier, firstrequest: bool = False, newwho: bool = False,
             onlynewwho: bool = False) -> List[WarehouseOrder]:
         """Get warehouse order from SAP EWM."""
+        ewmwho = self.partitions.ewmwho(robotident.lgnum)
         # Init warehouse order list
         whos: List[WarehouseOrder] = []
         # First step - check it there are existing warehouse orders in SAP EWM
         if onlynewwho is False:
             try:
-                whos.extend(self.ewmwho.get_robot_warehouseorders(
+                whos.extend(ewmwho.get_robot_warehouseorders(
                     robotident.lgnum, robotident.rsrc))
             except NoOrderFoundError:
                 # Create log entry only for the initial query to SAP EWM
@@ -459,7 +505,7 @@ class EWMOrderManager:
         # SAP EWM warehouse order queue
         if not whos and (newwho or onlynewwho):
             try:
-                who = self.ewmwho.getnew_robot_warehouseorder(robotident.lgnum, robotident.rsrc)
+                who = ewmwho.getnew_robot_warehouseorder(robotident.lgnum, robotident.rsrc)
             except NoOrderFoundError:
                 # Processing of this message finished without success - return
                 return whos
@@ -474,7 +520,7 @@ class EWMOrderManager:
             else:
                 # Get the warehouse order again, because initially flgwho and flgto flags are not
                 # set yet
-                who = self.ewmwho.get_warehouseorder(who.lgnum, who.who, openwarehousetasks=True)
+                who = ewmwho.get_warehouseorder(who.lgnum, who.who, openwarehousetasks=True)
 
                 whos.append(who)
                 _LOGGER.info(
@@ -485,21 +531,95 @@ class EWMOrderManager:
         # orders from SAP EWM
         for who in whos:
             if who.flgwho is True:
-                whos.extend(self.ewmwho.get_warehouseorders(who.lgnum, topwhoid=who.who))
+                whos.extend(ewmwho.get_warehouseorders(who.lgnum, topwhoid=who.who))
 
         # Forth step - if a warehouse order includes warehouse tasks, but they are not received
         # yet, get those tasks from SAP EWM
         for i, who in enumerate(whos):
             if not who.warehousetasks:
-                whos[i] = self.ewmwho.get_warehouseorder(
+                whos[i] = ewmwho.get_warehouseorder(
                     who.lgnum, who.who, openwarehousetasks=True)
 
         return whos
 
+    @staticmethod
+    def _is_last_warehousetask(whos: List[WarehouseOrder], conf: ConfirmWarehouseTask) -> bool:
+        """Check if the confirmed warehouse task is the last one in the robot's order queue."""
+        if len(whos) != 1:
+            return False
+        who = whos[0]
+        return bool(
+            who.who == conf.who and not who.flgwho
+            and all(wht.tanum == conf.tanum for wht in who.warehousetasks))
+
+    def prefetch_robot_who(
+            self, robotident: RobotIdentifier, active_who: str) -> List[WarehouseOrder]:
+        """
+        Reserve the next warehouse order for a robot and assign it in SAP EWM.
+
+        Returns the assigned warehouse order with its open warehouse tasks or an empty list.
+        """
+        robot = robotident.rsrc.lower()
+        # Warehouse orders of robots in scope of an order auction are assigned by the auction
+        if self.is_orderauction_running(robot):
+            return []
+        try:
+            config_spec = structure(
+                self.robotconfigcontroller.get_cr(robot)['spec'], RobotConfigurationSpec)
+        except (ApiException, KeyError) as err:
+            _LOGGER.error('Unable to get robotconfiguration of robot %s: %s', robot, err)
+            return []
+        robot_status = self.robotcontroller.get_robot_status(robot)
+        if (config_spec.mode != RobotConfigurationSpec.MODE_RUN
+                or robot_status.robot.batteryPercentage < config_spec.batteryMin):
+            return []
+
+        ewmwho = self.partitions.ewmwho(robotident.lgnum)
+        # Batch assignment must not cancel the reservation before the order is assigned
+        with self.partitions.reservation_lock(robotident.lgnum):
+            try:
+                whos = ewmwho.getnew_rtype_warehouseorders(
+                    robotident.lgnum, config_spec.rsrcgrp, config_spec.rsrctype, 1)
+            except (NoOrderFoundError, ResourceTypeIsNoRobotError):
+                return []
+            except (ConnectionError, TimeoutError, IOError, ODataAPIException) as err:
+                _LOGGER.error(
+                    'Unable to prefetch warehouse order for robot %s: %s', robot, err)
+                return []
+
+            who = whos[0]
+            try:
+                ewmwho.assign_robot_warehouseorder(who.lgnum, robotident.rsrc, who.who)
+                who = ewmwho.get_warehouseorder(who.lgnum, who.who, openwarehousetasks=True)
+            except (NoOrderFoundError, RobotNotFoundError, RobotHasOrderError,
+                    WarehouseOrderAssignedError, WarehouseTaskAssignedError) as err:
+                _LOGGER.info(
+                    'Unable to prefetch warehouse order %s.%s for robot %s: %s', who.lgnum,
+                    who.who, robot, err)
+                # Cancel reservation
+                try:
+                    ewmwho.unset_warehouseorder_in_process(who.lgnum, who.who)
+                except (ConnectionError, TimeoutError, IOError, ODataAPIException) as err:
+                    _LOGGER.warning(
+                        'Unable to cancel reservation of warehouse order %s.%s: %s', who.lgnum,
+                        who.who, err)
+                return []
+            except (ConnectionError, TimeoutError, IOError, ODataAPIException) as err:
+                _LOGGER.error(
+                    'Unable to prefetch warehouse order %s.%s for robot %s: %s', who.lgnum,
+                    who.who, robot, err)
+                return []
+
+        _LOGGER.info(
+            'Prefetched warehouse order %s.%s for robot %s which is working on the last warehouse '
+            'task of warehouse order %s', who.lgnum, who.who, robot, active_who)
+        return [who]
+
     def cleanup_who(self, whoident: WhoIdentifier) -> None:
         """Cleanup warehouse order in Cloud Robotics when it is done."""
+        ewmwho = self.partitions.ewmwho(whoident.lgnum)
         try:
-            who = self.ewmwho.get_warehouseorder(whoident.lgnum, whoident.who)
+            who = ewmwho.get_warehouseorder(whoident.lgnum, whoident.who)
         except NotFoundError:
             _LOGGER.warning('Warehouse order %s not found in EWM during CR cleanup', whoident)
             who = WarehouseOrder(lgnum=whoident.lgnum, who=whoident.who)
@@ -574,9 +694,15 @@ class EWMOrderManager:
             if (robotident.rsrc is not None
                     and conf.confirmationnumber == ConfirmWarehouseTask.FIRST_CONF
                     and conf.confirmationtype == ConfirmWarehouseTask.CONF_SUCCESS):
-                success = self.get_and_send_robot_whos(
+                whos = self.get_robot_whos(
                     robotident, firstrequest=True, newwho=False, onlynewwho=False)
-                if success is False:
+                # Reserve the next warehouse order when the robot works on its last task, it is
+                # queued on the robot with a higher sequence
+                if self.order_prefetch and self._is_last_warehousetask(whos, conf):
+                    whos.extend(self.prefetch_robot_who(robotident, conf.who))
+                if whos:
+                    self.send_robot_whos(robotident, whos)
+                else:
                     _LOGGER.error(
                         'Unable to update warehouse order on robot %s. Warehouse order %s in '
                         'warehouse %s not found or not running', robotident.rsrc, conf.who,
@@ -589,8 +715,9 @@ class EWMOrderManager:
         who_spec = structure(custom_res['spec'], WarehouseOrderCRDSpec)
         if not confirmations and who_spec.order_status == WarehouseOrderCRDSpec.STATE_RUNNING:
             processed = False
+            ewmwho = self.partitions.ewmwho(who_spec.data.lgnum)
             try:
-                who = self.ewmwho.get_warehouseorder(who_spec.data.lgnum, who_spec.data.who)
+                who = ewmwho.get_warehouseorder(who_spec.data.lgnum, who_spec.data.who)
             except NotFoundError:
                 processed = True
                 _LOGGER.warning(
@@ -626,7 +753,7 @@ class EWMOrderManager:
         """Process Order requests CRs."""
         spec = structure(custom_res['spec'], OrderReservationSpec)
 
-        status = structure(custom_res['status'], OrderReservationStatus) if custom_res.get(
+        status = structure_trusted(custom_res['status'], OrderReservationStatus) if custom_res.get(
             'status') else OrderReservationStatus(
                 OrderReservationStatus.STATUS_NEW, self._datetime_reservation_timeout_iso())
 
@@ -648,6 +775,7 @@ class EWMOrderManager:
         # Return if wrong status
         if status.status != OrderReservationStatus.STATUS_NEW:
             return
+        ewmwho = self.partitions.ewmwho(spec.orderrequest.lgnum)
 
         # Init warehouse order lists
         whos: List[WarehouseOrder] = []
@@ -655,7 +783,7 @@ class EWMOrderManager:
 
         # Get warehouse orders from EWM if not done yet
         try:
-            whos_exist.extend(self.ewmwho.get_in_process_warehouseorders(
+            whos_exist.extend(ewmwho.get_in_process_warehouseorders(
                 spec.orderrequest.lgnum, spec.orderrequest.rsrcgrp, spec.orderrequest.rsrctype))
         except (ConnectionError, TimeoutError, IOError) as err:
             _LOGGER.error('Error connecting to SAP EWM Backend: "%s" - try again later', err)
@@ -683,7 +811,7 @@ class EWMOrderManager:
 
         if len(whos) < spec.orderrequest.quantity:
             try:
-                whos.extend(self.ewmwho.getnew_rtype_warehouseorders(
+                whos.extend(ewmwho.getnew_rtype_warehouseorders(
                     spec.orderrequest.lgnum, spec.orderrequest.rsrcgrp, spec.orderrequest.rsrctype,
                     spec.orderrequest.quantity-len(whos)))
             except NoOrderFoundError:
@@ -722,6 +850,7 @@ class EWMOrderManager:
         # Return if wrong status
         if status.status != OrderReservationStatus.STATUS_ACCEPTED:
             return
+        ewmwho = self.partitions.ewmwho(spec.orderrequest.lgnum)
 
         # Get warehouse orders with open warehouse tasks from EWM
         connection_error = False
@@ -731,7 +860,7 @@ class EWMOrderManager:
                 # Only get warehouse orders which do not include warehouse tasks yet
                 if not who.warehousetasks:
                     who_futures[executor.submit(
-                        self.ewmwho.get_warehouseorder, who.lgnum, who.who,
+                        ewmwho.get_warehouseorder, who.lgnum, who.who,
                         openwarehousetasks=True)] = i
 
             for future, i in who_futures.items():
@@ -757,6 +886,7 @@ class EWMOrderManager:
         # Return if wrong status
         if status.status != OrderReservationStatus.STATUS_RESERVATIONS:
             return
+        ewmwho = self.partitions.ewmwho(spec.orderrequest.lgnum)
 
         # Check process of the auction once warehouse orders are reserved
         try:
@@ -792,7 +922,7 @@ class EWMOrderManager:
                     continue
                 # Assign warehouse order to robot
                 try:
-                    self.ewmwho.assign_robot_warehouseorder(ord_as.lgnum, ord_as.rsrc, ord_as.who)
+                    ewmwho.assign_robot_warehouseorder(ord_as.lgnum, ord_as.rsrc, ord_as.who)
                 except (ConnectionError, TimeoutError, IOError) as err:
                     _LOGGER.error(
                         'Error connecting to SAP EWM Backend: "%s" - try again later', err)
@@ -832,7 +962,7 @@ class EWMOrderManager:
                 for whoident in reserved:
                     # Unset in process status for non assigned orders to cancel reservation
                     try:
-                        self.ewmwho.unset_warehouseorder_in_process(
+                        ewmwho.unset_warehouseorder_in_process(
                             whoident.lgnum, whoident.who)
                     except NoOrderFoundError:
                         _LOGGER.warning(
@@ -859,7 +989,7 @@ class EWMOrderManager:
 
             for who in status.warehouseorders:
                 try:
-                    self.ewmwho.unset_warehouseorder_in_process(who.lgnum, who.who)
+                    ewmwho.unset_warehouseorder_in_process(who.lgnum, who.who)
                 except NoOrderFoundError:
                     _LOGGER.warning(
                         'Warehouse order %s.%s not found. Continuing anyway',
@@ -878,6 +1008,138 @@ class EWMOrderManager:
             status.message = msg
             self.orderreservationcontroller.update_cr_status(name, unstructure(status))
 
+    def run_batch_assignment(self) -> None:
+        """Queue batch assignment of warehouses whose robots are waiting for work."""
+        for lgnum in self.batch_assignment.due_warehouses():
+            self.partitions.submit(
+                lgnum, ('BatchAssignment', lgnum), self.batch_assignment_cb, lgnum)
+
+    def batch_assignment_cb(self, lgnum: str) -> None:
+        """Handle exceptions of batch assignment."""
+        try:
+            self.assign_batch_whos(lgnum)
+        except (ConnectionError, TimeoutError, IOError) as err:
+            _LOGGER.error('Error connecting to SAP EWM Backend: "%s" - try again later', err)
+        except ODataAPIException as err:
+            _LOGGER.error('Error in SAP EWM Backend: "%s" - try again later', err)
+
+    def assign_batch_whos(self, lgnum: str) -> None:
+        """
+        Assign warehouse orders to all idle robots of a warehouse at once.
+
+        Orders are assigned to robots minimizing the total travel distance of the robots to the
+        source bins of the first warehouse tasks.
+        """
+        groups = self.batch_assignment.pop_requests(lgnum)
+        if not groups:
+            return
+        ewmwho = self.partitions.ewmwho(lgnum)
+        index = self._get_storagebin_index(lgnum)
+
+        for (rsrcgrp, rsrctype), robots in groups.items():
+            # Prefetching must not reserve warehouse orders of this warehouse in between
+            with self.partitions.reservation_lock(lgnum):
+                self._assign_batch_group(ewmwho, index, lgnum, rsrcgrp, rsrctype, robots)
+
+    def _assign_batch_group(
+            self, ewmwho: WarehouseOrderOData, index: Optional[StorageBinIndex], lgnum: str,
+            rsrcgrp: str, rsrctype: str, robots: List[str]) -> None:
+        """Assign warehouse orders to idle robots of one resource group and type."""
+        whos = self._get_batch_candidate_whos(ewmwho, lgnum, rsrcgrp, rsrctype, len(robots))
+        if not whos:
+            _LOGGER.debug(
+                'No warehouse orders for %s robots of resource type %s, group %s in warehouse '
+                '%s', len(robots), rsrctype, rsrcgrp, lgnum)
+            return
+
+        robotidents = [RobotIdentifier(lgnum, rsrc) for rsrc in robots]
+        cost = build_cost_matrix(
+            index, lgnum, [self.batch_assignment.robot_bin(ident) for ident in robotidents],
+            whos)
+        assigned = set()
+        for row, col in solve_assignment(cost):
+            robotident = robotidents[row]
+            who = whos[col]
+            try:
+                ewmwho.assign_robot_warehouseorder(lgnum, robotident.rsrc, who.who)
+            except (NoOrderFoundError, RobotNotFoundError, RobotHasOrderError,
+                    WarehouseOrderAssignedError, WarehouseTaskAssignedError) as err:
+                _LOGGER.error(
+                    'Unable to assign warehouse order %s.%s to robot %s: %s', lgnum, who.who,
+                    robotident.rsrc, err)
+                continue
+            assigned.add(col)
+            self.batch_assignment.mark_assigned(robotident)
+            _LOGGER.info(
+                'Warehouse order %s.%s assigned to robot %s with travel distance %.1f',
+                lgnum, who.who, robotident.rsrc, cost[row][col])
+            # Send warehouse order to robot
+            self.get_and_send_robot_whos(
+                robotident, firstrequest=False, newwho=False, onlynewwho=False)
+
+        # Cancel reservations of warehouse orders which were not assigned
+        for col, who in enumerate(whos):
+            if col in assigned:
+                continue
+            try:
+                ewmwho.unset_warehouseorder_in_process(lgnum, who.who)
+            except NoOrderFoundError:
+                _LOGGER.warning(
+                    'Warehouse order %s.%s not found. Continuing anyway', lgnum, who.who)
+
+    def _get_batch_candidate_whos(
+            self, ewmwho: WarehouseOrderOData, lgnum: str, rsrcgrp: str, rsrctype: str,
+            robots: int) -> List[WarehouseOrder]:
+        """Reserve warehouse orders with their open warehouse tasks for a batch of robots."""
+        quantity = robots * self.batch_assignment.candidates_per_robot
+        whos: List[WarehouseOrder] = []
+        try:
+            whos_exist = ewmwho.get_in_process_warehouseorders(lgnum, rsrcgrp, rsrctype)
+        except NoOrderFoundError:
+            whos_exist = []
+        except ResourceTypeIsNoRobotError:
+            _LOGGER.error(
+                'Resource type %s in warehouse %s is no robot, skipping batch assignment',
+                rsrctype, lgnum)
+            return whos
+
+        # Do not use warehouse orders reserved for order auctions
+        whos_reserved = self.orderreservationcontroller.get_reserved_warehouseorders()
+        for who in whos_exist:
+            if WarehouseOrderIdent(who.lgnum, who.who) not in whos_reserved:
+                whos.append(who)
+        whos = whos[:quantity]
+
+        if len(whos) < quantity:
+            try:
+                whos.extend(ewmwho.getnew_rtype_warehouseorders(
+                    lgnum, rsrcgrp, rsrctype, quantity - len(whos)))
+            except NoOrderFoundError:
+                pass
+
+        # Get open warehouse tasks to determine the source bins
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            who_futures: Dict[Future, int] = {}
+            for i, who in enumerate(whos):
+                if not who.warehousetasks:
+                    who_futures[executor.submit(
+                        ewmwho.get_warehouseorder, who.lgnum, who.who,
+                        openwarehousetasks=True)] = i
+            for future, i in who_futures.items():
+                whos[i] = future.result()
+
+        return whos
+
+    def _get_storagebin_index(self, lgnum: str) -> Optional[StorageBinIndex]:
+        """Get spatial index of storage bins of a warehouse, None if it is not available."""
+        try:
+            return self.partitions.storagebin_index(lgnum)
+        except (ConnectionError, TimeoutError, IOError, ODataAPIException) as err:
+            _LOGGER.error(
+                'Unable to get storage bins of warehouse %s, assigning warehouse orders without '
+                'travel distances: %s', lgnum, err)
+            return None
+
     def is_orderauction_running(self, robot: str, firstrequest: bool = False) -> bool:
         """Check if the order auction process is setup and running on the robot."""
         # Is the robot in scope of an auctioneer
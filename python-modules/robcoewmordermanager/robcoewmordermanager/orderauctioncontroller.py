@@ -17,8 +17,7 @@ import logging
 from collections import defaultdict
 from typing import DefaultDict, Dict
 
-from cattr import structure
-
+from robcoewmtypes.converter import structure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.auction import OrderAuctionSpec, OrderAuctionStatus
 
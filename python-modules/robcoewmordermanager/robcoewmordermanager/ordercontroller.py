@@ -19,8 +19,7 @@ import time
 from collections import OrderedDict
 from typing import Dict, List, OrderedDict as TOrderedDict, Tuple
 
-from cattr import structure
-
+from robcoewmtypes.converter import structure, structure_trusted
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.warehouseorder import WarehouseOrderCRDSpec, WarehouseOrderCRDStatus
 
@@ -277,7 +276,7 @@ class OrderController(K8sCRHandler):
                     and c_res['spec'].get('order_status') == WarehouseOrderCRDSpec.STATE_RUNNING):
                 who_spec = structure(c_res['spec'], WarehouseOrderCRDSpec)
                 if c_res.get('status', {}).get('data') is not None:
-                    who_status = structure(c_res['status'], WarehouseOrderCRDStatus)
+                    who_status = structure_trusted(c_res['status'], WarehouseOrderCRDStatus)
                 else:
                     who_status = WarehouseOrderCRDStatus()
 
@@ -18,8 +18,7 @@ from collections import defaultdict
 from threading import RLock
 from typing import DefaultDict, Dict, List
 
-from cattr import structure
-
+from robcoewmtypes.converter import structure_trusted
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.auction import OrderReservationStatus
 from robcoewmtypes.warehouseorder import WarehouseOrderIdent
@@ -66,7 +65,7 @@ class OrderReservationController(K8sCRHandler):
             if not custom_res.get('status'):
                 continue
             # Continue if CR is not in process
-            status = structure(custom_res.get('status'), OrderReservationStatus)
+            status = structure_trusted(custom_res.get('status'), OrderReservationStatus)
             if status.status not in OrderReservationStatus.IN_PROCESS_STATUS:
                 continue
             # Append warehouse order idents to list
@@ -98,7 +97,7 @@ class OrderReservationController(K8sCRHandler):
                 res_open = True
             else:
                 # Evaluate status of reservation
-                status = structure(custom_res.get('status'), OrderReservationStatus)
+                status = structure_trusted(custom_res.get('status'), OrderReservationStatus)
                 if status.status in OrderReservationStatus.IN_PROCESS_STATUS:
                     res_open = True
 
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Partition order manager processing by warehouse number."""
+
+import os
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from robcoewminterface.odata import ODataHandler
+from robcoewminterface.ewm import WarehouseOData, WarehouseOrderOData
+from robcoewminterface.spatial import StorageBinIndexCache
+from robcoewmtypes.spatial import StorageBinIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RateBudget:
+    """Token bucket limiting the request rate to SAP EWM."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Construct."""
+        # Rate in requests per second, 0 means unlimited
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until a request is allowed."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimitedODataHandler:
+    """OData handler proxy which takes requests from a rate budget."""
+
+    def __init__(self, odata: ODataHandler, budget: RateBudget) -> None:
+        """Construct."""
+        self._odata = odata
+        self._budget = budget
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else to the shared OData handler."""
+        return getattr(self._odata, name)
+
+    def http_get(self, *args, **kwargs) -> Any:
+        """Perform a HTTP GET request within the rate budget."""
+        self._budget.acquire()
+        return self._odata.http_get(*args, **kwargs)
+
+    def http_patch_post(self, *args, **kwargs) -> Any:
+        """Perform a HTTP Patch or Post request within the rate budget."""
+        self._budget.acquire()
+        return self._odata.http_patch_post(*args, **kwargs)
+
+
+class WarehousePartition:
+    """
+    Work queue, worker pool and EWM rate budget of one warehouse.
+
+    Work items are keyed. While an item is queued or running, newer items with the same key
+    replace the queued one, so each custom resource is processed by one worker at a time and
+    always with its latest state.
+    """
+
+    def __init__(self, lgnum: str, odata: ODataHandler, workers: int, rate: float,
+                 burst: int) -> None:
+        """Construct."""
+        self.lgnum = lgnum
+        self.budget = RateBudget(rate, burst)
+        odata_limited = RateLimitedODataHandler(odata, self.budget)
+        self.ewmwho = WarehouseOrderOData(odata_limited)
+        # Spatial index of storage bins, downloaded within the rate budget too
+        self.storagebins = StorageBinIndexCache(WarehouseOData(odata_limited))
+        # Serialize reservations of warehouse orders which are not assigned to a robot yet
+        self.reservation_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='lgnum-{}'.format(lgnum))
+        self._pending: Dict[Hashable, Tuple[Callable, Tuple]] = {}
+        self._running: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable, *args) -> None:
+        """Submit a work item to the queue of the warehouse."""
+        with self._lock:
+            queued = key in self._pending or key in self._running
+            self._pending[key] = (func, args)
+            if queued:
+                return
+            self._running.add(key)
+        try:
+            self.executor.submit(self._work, key)
+        except RuntimeError:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._running.discard(key)
+            _LOGGER.debug(
+                'Warehouse %s: partition already shut down, skipping %s', self.lgnum, key)
+
+    def _work(self, key: Hashable) -> None:
+        """Process work items of one key until none is left."""
+        while True:
+            with self._lock:
+                item = self._pending.pop(key, None)
+                if item is None:
+                    self._running.discard(key)
+                    return
+            func, args = item
+            try:
+                func(*args)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    'Warehouse %s: error when processing %s: %s', self.lgnum, key, err,
+                    exc_info=True)
+
+    def shutdown(self) -> None:
+        """Stop processing of the warehouse."""
+        self.executor.shutdown(wait=False)
+
+
+class WarehousePartitions:
+    """
+    Partitions of the order manager per warehouse number.
+
+    Each warehouse gets its own work queue, worker pool and EWM rate budget, thus a slow
+    warehouse does not block the others. Set LGNUMS to run the order manager only for some
+    warehouses, e.g. one process or deployment per warehouse.
+    """
+
+    def __init__(self, odata: ODataHandler) -> None:
+        """Construct."""
+        self.odata = odata
+        self.workers = int(os.environ.get('EWM_PARTITION_WORKERS', 5))
+        self.rate = float(os.environ.get('EWM_PARTITION_RATE', 0))
+        self.burst = int(os.environ.get('EWM_PARTITION_BURST', 10))
+        lgnums = os.environ.get('LGNUMS', '')
+        self.lgnums: Optional[Set[str]] = {
+            lgnum.strip() for lgnum in lgnums.split(',') if lgnum.strip()} or None
+
+        self._partitions: Dict[str, WarehousePartition] = {}
+        self._lock = threading.Lock()
+
+        if self.lgnums:
+            _LOGGER.info('Order manager processing warehouses %s', sorted(self.lgnums))
+
+    def in_scope(self, lgnum: Optional[str]) -> bool:
+        """Check if a warehouse is processed by this order manager."""
+        return bool(lgnum) and (self.lgnums is None or lgnum in self.lgnums)
+
+    def get(self, lgnum: str) -> WarehousePartition:
+        """Get partition of a warehouse, create it if it does not exist yet."""
+        with self._lock:
+            partition = self._partitions.get(lgnum)
+            if partition is None:
+                partition = WarehousePartition(
+                    lgnum, self.odata, self.workers, self.rate, self.burst)
+                self._partitions[lgnum] = partition
+                _LOGGER.info(
+                    'Created partition for warehouse %s with %s workers', lgnum, self.workers)
+            return partition
+
+    def ewmwho(self, lgnum: str) -> WarehouseOrderOData:
+        """Get rate limited EWM warehouse order API of a warehouse."""
+        return self.get(lgnum).ewmwho
+
+    def storagebin_index(self, lgnum: str) -> StorageBinIndex:
+        """Get spatial index of storage bins of a warehouse."""
+        return self.get(lgnum).storagebins.get(lgnum)
+
+    def reservation_lock(self, lgnum: str) -> threading.Lock:
+        """Get lock for reservations of warehouse orders of a warehouse."""
+        return self.get(lgnum).reservation_lock
+
+    def submit(self, lgnum: Optional[str], key: Hashable, func: Callable, *args) -> None:
+        """Submit a work item to the partition of a warehouse."""
+        if not lgnum:
+            _LOGGER.warning('No warehouse number, skipping %s', key)
+            return
+        if not self.in_scope(lgnum):
+            _LOGGER.debug(
+                'Warehouse %s not in scope of this order manager, skipping %s', lgnum, key)
+            return
+        self.get(lgnum).submit(key, func, *args)
+
+    def shutdown(self) -> None:
+        """Stop processing of all warehouses."""
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.shutdown()
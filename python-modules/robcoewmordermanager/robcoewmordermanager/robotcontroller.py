@@ -14,9 +14,9 @@
 
 import logging
 
-from cattr import structure
 from kubernetes.client.rest import ApiException
 
+from robcoewmtypes.converter import structure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.robot import RobcoRobotCRStatus
 from k8scrhandler.k8scrhandler import K8sCRHandler
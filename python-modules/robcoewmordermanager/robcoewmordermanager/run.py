@@ -96,6 +96,9 @@ def run_ordermanager():
             # Refresh bearer token when using OAuth
             if manager.odataconfig.authorization == manager.odataconfig.AUTH_OAUTH:
                 manager.odatahandler.refresh_access_token()
+            # Assign warehouse orders to robots waiting for work in batch assignment mode
+            if manager.batch_assignment.enabled:
+                manager.run_batch_assignment()
             # Check if K8S CR handler exception occured
             for k, exc in manager.ordercontroller.thread_exceptions.items():
                 _LOGGER.error(
@@ -142,3 +145,5 @@ def run_ordermanager():
         manager.orderauctioncontroller.stop_watcher()
         manager.auctioneercontroller.stop_watcher()
         manager.robotcontroller.stop_watcher()
+        # Stop warehouse partitions
+        manager.partitions.shutdown()
@@ -25,6 +25,10 @@ REQUIRES = [
     'robcoewminterface'
     ]
 
+EXTRAS_REQUIRE = {
+    'numpy': ['numpy']
+    }
+
 setup(
     name='robcoewmordermanager',
     version='0.2.0',
@@ -33,5 +37,6 @@ setup(
     author='SAP SE',
     license='Apache License 2.0',
     packages=find_packages(),
-    install_requires=REQUIRES
+    install_requires=REQUIRES,
+    extras_require=EXTRAS_REQUIRE
 )
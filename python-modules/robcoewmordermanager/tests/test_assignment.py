@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+
+"""Tests for batch assignment of warehouse orders."""
+
+import unittest
+
+from unittest import mock
+
+from robcoewmtypes.spatial import StorageBinIndex
+from robcoewmtypes.warehouse import StorageBin
+from robcoewmtypes.warehouseorder import WarehouseOrder, WarehouseTask
+
+from robcoewmordermanager import assignment
+from robcoewmordermanager.assignment import build_cost_matrix, solve_assignment
+
+
+def who_from(who: str, vlpla: str) -> WarehouseOrder:
+    """Get a warehouse order with one task from a source bin."""
+    task = WarehouseTask(lgnum='1710', tanum=who, vlpla=vlpla)
+    return WarehouseOrder(lgnum='1710', who=who, warehousetasks=[task])
+
+
+class TestBuildCostMatrix(unittest.TestCase):
+    """Tests for build_cost_matrix."""
+
+    def setUp(self) -> None:
+        """Create an index and some warehouse orders."""
+        self.index = StorageBinIndex([
+            StorageBin(lgnum='1710', lgpla='A', xcord=0.0, ycord=0.0),
+            StorageBin(lgnum='1710', lgpla='B', xcord=10.0, ycord=0.0)])
+        self.whos = [who_from('1', 'A'), who_from('2', 'B'), who_from('3', 'UNKNOWN')]
+
+    def check_assigns_all(self, cost) -> None:
+        """Check that each robot gets a different order."""
+        pairs = solve_assignment(cost)
+        self.assertEqual([row for row, _ in pairs], [0, 1])
+        self.assertEqual(len({col for _, col in pairs}), 2)
+
+    def check_cases(self) -> None:
+        """Check cost matrices with known and unknown locations."""
+        # Robots at known bins get the nearest orders
+        cost = build_cost_matrix(self.index, '1710', ['B', 'A'], self.whos)
+        self.assertEqual(solve_assignment(cost), [(0, 1), (1, 0)])
+
+        # No known robot positions, e.g. before the first confirmation
+        cost = build_cost_matrix(self.index, '1710', [None, None], self.whos)
+        self.assertEqual([len(row) for row in cost], [3, 3])
+        self.check_assigns_all(cost)
+
+        # No storage bin index, all orders have the same costs
+        cost = build_cost_matrix(None, '1710', ['A', 'B'], self.whos)
+        self.assertEqual(len({value for row in cost for value in row}), 1)
+        self.check_assigns_all(cost)
+
+    @unittest.skipIf(assignment.np is None, 'numpy is not installed')
+    def test_numpy(self) -> None:
+        """Cost matrices with numpy."""
+        self.check_cases()
+
+    def test_pure_python(self) -> None:
+        """Cost matrices without numpy."""
+        with mock.patch.object(assignment, 'np', None), \
+                mock.patch('robcoewmtypes.spatial.np', None):
+            self.check_cases()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,7 +20,6 @@ import time
 from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
-from cattr import structure, unstructure
 from retrying import retry
 
 from robcoewminterface.types import ODataConfig
@@ -29,6 +28,7 @@ from robcoewminterface.ewm import RobotOData
 from robcoewminterface.exceptions import (
     ODataAPIException, RobotNotFoundError, InternalError, InternalServerError,
     ForeignLockError)
+from robcoewmtypes.converter import structure, unstructure
 from robcoewmtypes.robot import RobotConfigurationSpec
 
 from .helper import retry_on_connection_error
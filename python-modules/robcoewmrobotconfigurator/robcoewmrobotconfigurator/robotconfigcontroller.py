@@ -17,8 +17,7 @@ import logging
 
 from typing import Dict
 
-from cattr import unstructure
-
+from robcoewmtypes.converter import unstructure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.robot import RobotConfigurationSpec
 from k8scrhandler.k8scrhandler import K8sCRHandler
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Prometheus metrics with label children resolved once."""
+
+from typing import Any, Dict
+
+
+class LabeledChildren:
+    """
+    Children of a labeled metric, resolved once per label values.
+
+    Resolving a child by labels() validates and hashes the label values and acquires the lock of
+    the metric on each call. Here children are cached, so later calls are a dict lookup.
+    """
+
+    def __init__(self, metric: Any, **labels: str) -> None:
+        """Construct with a metric and its label values, which are the same for all children."""
+        self._metric = metric
+        self._labels = labels
+        self._children: Dict[tuple, Any] = {}
+
+    def labels(self, **labels: str) -> Any:
+        """Get child of the metric with the remaining label values."""
+        key = tuple(labels.items())
+        child = self._children.get(key)
+        if child is None:
+            child = self._metric.labels(**self._labels, **labels)
+            self._children[key] = child
+        return child
@@ -44,7 +44,8 @@ class MissionHandler(K8sCRHandler):
             'missions',
             namespace,
             template_cr,
-            labels
+            labels,
+            robot_label_selector=True
         )
 
 
@@ -97,6 +98,16 @@ class MissionController:
             'update_chargers_{}'.format(self.robot_config.robot_name),
             ['ADDED', 'MODIFIED'], self.update_chargers_cb, self.robot_config.robot_name)
 
+    def unregister_callbacks(self) -> None:
+        """Unregister all callbacks of this controller."""
+        robot_name = self.robot_config.robot_name
+        self.robot_handler.unregister_callback(
+            'mission_controller_{}'.format(robot_name), robot_name)
+        self.handler.unregister_callback('update_mission_status_{}'.format(robot_name), robot_name)
+        self.handler.unregister_callback('mission_deleted_{}'.format(robot_name), robot_name)
+        self.robot_config.handler.unregister_callback(
+            'update_chargers_{}'.format(robot_name), robot_name)
+
     def update_mission_status_cb(self, name: str, custom_res: Dict) -> None:
         """Update self.mission_status."""
         # Only process custom resources labeled with own robot name
@@ -16,8 +16,7 @@ import logging
 
 from typing import Dict, Optional
 
-from cattr import structure
-
+from robcoewmtypes.converter import structure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.warehouseorder import (
     ConfirmWarehouseTask, WarehouseOrderCRDSpec)
@@ -41,7 +40,8 @@ class OrderHandler(K8sCRHandler):
             'warehouseorders',
             namespace,
             template_cr,
-            labels
+            labels,
+            robot_label_selector=True
         )
 
     @staticmethod
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Warehouse order queue of a robot."""
+
+import heapq
+import itertools
+import threading
+
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from robcoewmtypes.warehouseorder import WarehouseOrderCRDSpec
+
+WhoIdentifier = namedtuple('WhoIdentifier', ['lgnum', 'who'])
+
+_MISSING = object()
+
+
+class WarehouseOrderQueue:
+    """
+    Warehouse order CRD specs of a robot ordered by their sequence.
+
+    A heap with an index by warehouse order. Insert, update, remove and pop of the next warehouse
+    order take O(log n). Orders with the same sequence keep the order in which they were added.
+    """
+
+    def __init__(self) -> None:
+        """Construct."""
+        # Heap entries are [sequence, position, entry id, key, spec], removed entries have key None
+        # Position is kept on updates to preserve the order of equal sequences
+        self._heap: List[List[Any]] = []
+        self._entries: Dict[WhoIdentifier, List[Any]] = {}
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Get number of warehouse orders in queue."""
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        """Check if there are warehouse orders in queue."""
+        return bool(self._entries)
+
+    def __contains__(self, key: WhoIdentifier) -> bool:
+        """Check if a warehouse order is in queue."""
+        return key in self._entries
+
+    def __getitem__(self, key: WhoIdentifier) -> WarehouseOrderCRDSpec:
+        """Get a warehouse order from queue."""
+        return self._entries[key][4]
+
+    def __setitem__(self, key: WhoIdentifier, spec: WarehouseOrderCRDSpec) -> None:
+        """Add or update a warehouse order."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == spec.sequence:
+                    # Same position in queue, replace spec only
+                    entry[4] = spec
+                    return
+                position = entry[1]
+                self._remove_entry(entry)
+            else:
+                position = next(self._counter)
+            entry = [spec.sequence, position, next(self._counter), key, spec]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+
+    def __iter__(self) -> Iterator[WhoIdentifier]:
+        """Iterate over warehouse orders in queue order."""
+        return iter([key for key, _ in self.items()])
+
+    def _remove_entry(self, entry: List[Any]) -> None:
+        """Mark a heap entry as removed."""
+        del self._entries[entry[3]]
+        entry[3] = None
+        entry[4] = None
+        # Rebuild heap when it consists mostly of removed entries
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [e for e in self._heap if e[3] is not None]
+            heapq.heapify(self._heap)
+
+    def _discard_removed(self) -> None:
+        """Remove removed entries from top of the heap."""
+        while self._heap and self._heap[0][3] is None:
+            heapq.heappop(self._heap)
+
+    def get(self, key: WhoIdentifier,
+            default: Optional[WarehouseOrderCRDSpec] = None) -> Optional[WarehouseOrderCRDSpec]:
+        """Get a warehouse order from queue or default."""
+        entry = self._entries.get(key)
+        return entry[4] if entry is not None else default
+
+    def pop(self, key: WhoIdentifier, default: Any = _MISSING) -> Any:
+        """Remove a warehouse order from queue and return it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if default is _MISSING:
+                    raise KeyError(key)
+                return default
+            spec = entry[4]
+            self._remove_entry(entry)
+            return spec
+
+    def peek(self) -> Optional[WarehouseOrderCRDSpec]:
+        """Get the next warehouse order without removing it, None if queue is empty."""
+        with self._lock:
+            self._discard_removed()
+            return self._heap[0][4] if self._heap else None
+
+    def popnext(self) -> Optional[WarehouseOrderCRDSpec]:
+        """Remove the next warehouse order from queue and return it, None if queue is empty."""
+        with self._lock:
+            self._discard_removed()
+            if not self._heap:
+                return None
+            entry = heapq.heappop(self._heap)
+            del self._entries[entry[3]]
+            return entry[4]
+
+    def items(self) -> List[Tuple[WhoIdentifier, WarehouseOrderCRDSpec]]:
+        """Get warehouse orders in queue order."""
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: (e[0], e[1]))
+        return [(entry[3], entry[4]) for entry in entries]
+
+    def values(self) -> List[WarehouseOrderCRDSpec]:
+        """Get warehouse order specs in queue order."""
+        return [spec for _, spec in self.items()]
+
+    def clear(self) -> None:
+        """Remove all warehouse orders from queue."""
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
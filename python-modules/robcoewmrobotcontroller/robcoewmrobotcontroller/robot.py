@@ -107,12 +107,19 @@ class EWMRobot:
             _LOGGER.info('Initialize fresh state machine')
             self.state_machine = RobotEWMMachine(
                 self.robot_config, self.mission_api, self.orderhandler)
-            self.state_machine.start_fresh_machine()
+            self.state_machine.start_fresh_machine()  # pylint: disable=no-member
 
         # Connect state machine to external events
         _LOGGER.info('Connect state machine to CR handler')
         self.state_machine.connect_external_events()
 
+    def stop(self) -> None:
+        """Stop robot by disconnecting it from all CR handlers."""
+        _LOGGER.info('Stopping SAP EWM Robot "%s"', self.robot_config.rsrc)
+        self.state_machine.disconnect_external_events()
+        self.mission_api.unregister_callbacks()
+        self.robot_config.unregister_callbacks()
+
     def _get_validated_state_restore(self) -> Optional[ValidStateRestore]:
         """Return robot state if it is valid."""
         state_restore = self.robot_config.get_robot_state()
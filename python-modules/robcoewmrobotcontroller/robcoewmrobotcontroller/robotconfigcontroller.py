@@ -17,8 +17,7 @@ import logging
 
 from typing import Dict, Optional
 
-from cattr import structure, unstructure
-
+from robcoewmtypes.converter import structure, structure_trusted, unstructure
 from robcoewmtypes.helper import get_sample_cr
 from robcoewmtypes.robot import RobotConfigurationStatus, RobotConfigurationSpec
 from k8scrhandler.k8scrhandler import K8sCRHandler
@@ -29,7 +28,7 @@ _LOGGER = logging.getLogger(__name__)
 class RobotConfigurationHandler(K8sCRHandler):
     """Handle K8s RobotConfiguration custom resources."""
 
-    def __init__(self, namespace: str) -> None:
+    def __init__(self, namespace: str, robot_label_selector: bool = True) -> None:
         """Construct."""
         template_cr = get_sample_cr('robotconfiguration')
 
@@ -40,7 +39,8 @@ class RobotConfigurationHandler(K8sCRHandler):
             'robotconfigurations',
             namespace,
             template_cr,
-            labels
+            labels,
+            robot_label_selector=robot_label_selector
         )
 
 
@@ -64,6 +64,11 @@ class RobotConfigurationController:
             'robotconfig_update_{}'.format(self.robot_name), [
                 'ADDED', 'MODIFIED', 'REPROCESS'], self.robotconfiguration_cb, self.robot_name)
 
+    def unregister_callbacks(self) -> None:
+        """Unregister all callbacks of this controller."""
+        self.handler.unregister_callback(
+            'robotconfig_update_{}'.format(self.robot_name), self.robot_name)
+
     def init_robot_fromenv(self) -> None:
         """Initialize EWM Robot from environment variables."""
         # Read environment variables
@@ -86,7 +91,7 @@ class RobotConfigurationController:
         """Get current state of robot's state machine from CR."""
         custom_res = self.handler.get_cr(self.robot_name)
         if custom_res.get('status'):
-            state = structure(custom_res['status'], RobotConfigurationStatus)
+            state = structure_trusted(custom_res['status'], RobotConfigurationStatus)
         else:
             state = None
         return state
@@ -37,5 +37,6 @@ class RobotHandler(K8sCRHandler):
             'robots',
             namespace,
             template_cr,
-            labels
+            labels,
+            robot_label_selector=True
         )
@@ -14,10 +14,11 @@
 
 import os
 import signal
+import socket
 import logging
 import time
 
-from typing import List
+from typing import Dict, List, Optional
 
 import attr
 
@@ -26,6 +27,7 @@ from prometheus_client import start_http_server
 from robcoewmrobotcontroller.ordercontroller import OrderHandler
 from robcoewmrobotcontroller.robot import EWMRobot
 from robcoewmrobotcontroller.robotcontroller import RobotHandler
+from robcoewmrobotcontroller.sharding import LeaseMembership, ShardManager
 from robcoewmrobotcontroller.missioncontroller import MissionController, MissionHandler
 from robcoewmrobotcontroller.robotconfigcontroller import (
     RobotConfigurationController, RobotConfigurationHandler)
@@ -93,6 +95,36 @@ def run_robot(
     return robot
 
 
+def start_sharded_robots(
+        robots_name: List[str],
+        rc_handler: RobotConfigurationHandler,
+        r_handler: RobotHandler,
+        m_handler: MissionHandler,
+        o_handler: OrderHandler) -> Dict[str, EWMRobot]:
+    """Start robots which were assigned to this replica while handlers are running."""
+    # Watch custom resources of the new robots, they are processed explicitly below
+    # Usually they were added to the label selectors during handover already
+    for handler in (rc_handler, r_handler, m_handler, o_handler):
+        handler.add_selector_robots(robots_name, replay=False)
+
+    # Each handler processes the existing CRs of a new robot once
+    robots: Dict[str, EWMRobot] = {}
+    for robot_name in robots_name:
+        robot_controller = create_robot_controller(robot_name, rc_handler, r_handler, m_handler)
+        # Robot configuration and robot state are required when the state machine starts
+        for handler in (rc_handler, r_handler):
+            handler.process_all_crs('ADDED', robot_name)
+        robot = run_robot(robot_controller, o_handler)
+        _LOGGER.info('SAP EWM Robot "%s" started', robot.robot_config.rsrc)
+        # Missions and warehouse orders are reprocessed like at startup, when the state machine
+        # is connected
+        for handler in (m_handler, o_handler):
+            handler.process_all_crs(robot_name=robot_name)
+        robots[robot_name] = robot
+
+    return robots
+
+
 def run_robots():
     """Run all robot of this controller."""
     # Register handler to control main loop
@@ -104,26 +136,42 @@ def run_robots():
     # Identify namespace for custom resources
     namespace = os.environ.get('K8S_NAMESPACE', 'default')
 
+    # Sharding of robots across multiple replicas
+    sharding = os.environ.get('SHARDING', '').lower() == 'true'
+
     # Create handler
-    rc_handler = RobotConfigurationHandler(namespace)
+    # In sharding mode all robot configurations are watched to determine the robots of a shard
+    rc_handler = RobotConfigurationHandler(namespace, robot_label_selector=not sharding)
     r_handler = RobotHandler(namespace)
     m_handler = MissionHandler(namespace)
     o_handler = OrderHandler(namespace)
 
     # Get robots
-    robots_env = os.environ.get('ROBOTS')
-    if robots_env is None:
-        raise ValueError('No robots in environment variable ROBOTS')
-    robots_name = robots_env.split(',')
+    robots_name: List[str] = []
+    shard_manager: Optional[ShardManager] = None
+    if sharding:
+        identity = os.environ.get('POD_NAME', socket.gethostname())
+        group = os.environ.get('SHARDING_GROUP', 'ewm-robot-controller')
+        membership = LeaseMembership(namespace, identity, group)
+        membership.run()
+        shard_manager = ShardManager(membership)
+        _LOGGER.info('Sharding mode enabled, replica %s of group %s', identity, group)
+    else:
+        robots_env = os.environ.get('ROBOTS')
+        if robots_env is None:
+            raise ValueError('No robots in environment variable ROBOTS')
+        robots_name = [r for r in robots_env.split(',') if r]
 
     # Create controller
     robot_controllers: List[RobotController] = []
     for robot_name in robots_name:
-        if not robot_name:
-            continue
         robot_controller = create_robot_controller(robot_name, rc_handler, r_handler, m_handler)
         robot_controllers.append(robot_controller)
 
+    # Watch only custom resources of robots of this controller
+    for handler in (rc_handler, r_handler, m_handler, o_handler):
+        handler.add_selector_robots(robots_name)
+
     # Start handler
     rc_handler.run(multiple_executor_threads=True)
     r_handler.run(multiple_executor_threads=True)
@@ -131,16 +179,15 @@ def run_robots():
     o_handler.run(multiple_executor_threads=True)
 
     # Create robots
-    robots: List[EWMRobot] = []
+    robots: Dict[str, EWMRobot] = {}
     for robot_controller in robot_controllers:
         robot = run_robot(robot_controller, o_handler)
         _LOGGER.info('SAP EWM Robot "%s" started', robot.robot_config.rsrc)
-        robots.append(robot)
+        robots[robot.robot_config.robot_name] = robot
 
     _LOGGER.info('All %s robots started', len(robots))
     _LOGGER.info('Watching custom resources of namespace %s', namespace)
 
-
     # Reprocess CRs from all handler once when all robots are started
     rc_handler.process_all_crs()
     r_handler.process_all_crs()
@@ -172,6 +219,29 @@ def run_robots():
                     'main thread', k)
                 raise exc
 
+            # Rebalance robots of this replica
+            if shard_manager is not None:
+                for k, exc in shard_manager.membership.thread_exceptions.items():
+                    _LOGGER.error(
+                        'Uncovered exception in "%s" thread of shard membership. Raising it in '
+                        'main thread', k)
+                    raise exc
+                robots_pending = shard_manager.pending
+                robots_start, robots_stop = shard_manager.rebalance(
+                    cr['metadata']['name'] for cr in rc_handler.list_all_cr())
+                for robot_name in robots_stop:
+                    robots.pop(robot_name).stop()
+                # Robots which were assigned to other replicas before their handover was over
+                robots_dropped = robots_pending - shard_manager.pending - set(robots_start)
+                # Watch CRs of robots waiting for handover in advance and stop watching CRs of
+                # robots of other replicas. Selector changes are collected by the handlers, thus
+                # all kinds are listed again only once
+                for handler in (r_handler, m_handler, o_handler):
+                    handler.update_selector_robots(
+                        add=shard_manager.pending, remove=[*robots_stop, *robots_dropped])
+                robots.update(start_sharded_robots(
+                    robots_start, rc_handler, r_handler, m_handler, o_handler))
+
             # Sleep maximum 1.0 second
             loop_control.sleep(1.0)
     except KeyboardInterrupt:
@@ -180,8 +250,11 @@ def run_robots():
         _LOGGER.info('System exit - terminating')
     finally:
         # Disconnect state machines
-        for robot in robots:
+        for robot in robots.values():
             robot.state_machine.disconnect_external_events()
+        # Leave shard group
+        if shard_manager is not None:
+            shard_manager.membership.stop()
         # Stop K8S CR watcher
         _LOGGER.info('Stopping K8S CR watchers')
         rc_handler.stop_watcher()
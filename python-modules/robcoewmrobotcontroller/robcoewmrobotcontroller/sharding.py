@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Shard robots across multiple robot controller replicas."""
+
+import os
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    VNODES = 64
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = VNODES) -> None:
+        """Construct."""
+        self.vnodes = vnodes
+        self.nodes: List[str] = []
+        self._ring: List[Tuple[int, str]] = []
+        self._hashes: List[int] = []
+        self.set_nodes(nodes)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """Get hash value of a key."""
+        return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+    def set_nodes(self, nodes: Iterable[str]) -> None:
+        """Set nodes of the ring."""
+        self.nodes = sorted(set(nodes))
+        ring = []
+        for node in self.nodes:
+            for i in range(self.vnodes):
+                ring.append((self._hash('{}#{}'.format(node, i)), node))
+        ring.sort()
+        self._ring = ring
+        self._hashes = [h for h, _ in ring]
+
+    def get_node(self, key: str) -> Optional[str]:
+        """Get node which is responsible for a key."""
+        if not self._ring:
+            return None
+        idx = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[idx][1]
+
+
+class LeaseMembership:
+    """
+    Track members of a replica group using K8s coordination leases.
+
+    Each replica holds its own lease and renews it periodically. Replicas with a lease which was
+    renewed within lease duration are members of the group.
+    """
+
+    LEASE_DURATION = 30
+    RENEW_INTERVAL = 10
+    GROUP_LABEL = 'ewm.sap.com/shard-group'
+
+    def __init__(self, namespace: str, identity: str, group: str) -> None:
+        """Construct."""
+        if 'KUBERNETES_PORT' in os.environ:
+            config.load_incluster_config()
+        else:
+            config.load_kube_config()
+        self.coordination_api = client.CoordinationV1Api()
+
+        self.namespace = namespace
+        self.identity = identity
+        self.group = group
+        self.lease_name = '{}-{}'.format(group, identity)
+
+        # Current members of the group
+        self._members: List[str] = []
+        self._members_lock = threading.Lock()
+
+        # Dict to save thread exceptions
+        self.thread_exceptions: Dict[str, Exception] = {}
+        # Init threads
+        self.membership_thread = threading.Thread(target=self._membership_loop, daemon=True)
+        # Control flag for thread
+        self.thread_run = True
+
+    @property
+    def members(self) -> List[str]:
+        """Get current members of the group."""
+        with self._members_lock:
+            return self._members.copy()
+
+    def run(self) -> None:
+        """Acquire own lease and start tracking members."""
+        self._renew_lease()
+        self._update_members()
+        self.membership_thread.start()
+
+    def stop(self) -> None:
+        """Stop tracking members and release own lease."""
+        self.thread_run = False
+        try:
+            self.coordination_api.delete_namespaced_lease(self.lease_name, self.namespace)
+        except ApiException as err:
+            _LOGGER.error('Unable to delete lease %s: %s', self.lease_name, err)
+        else:
+            _LOGGER.info('Released lease %s', self.lease_name)
+
+    def _renew_lease(self) -> None:
+        """Create or renew own lease."""
+        cls = self.__class__
+        now = datetime.now(timezone.utc)
+        spec = client.V1LeaseSpec(
+            holder_identity=self.identity, lease_duration_seconds=cls.LEASE_DURATION,
+            renew_time=now)
+        try:
+            self.coordination_api.patch_namespaced_lease(
+                self.lease_name, self.namespace, {'spec': spec})
+        except ApiException as err:
+            if err.status != 404:
+                raise
+            lease = client.V1Lease(
+                metadata=client.V1ObjectMeta(
+                    name=self.lease_name, labels={cls.GROUP_LABEL: self.group}),
+                spec=spec)
+            lease.spec.acquire_time = now
+            self.coordination_api.create_namespaced_lease(self.namespace, lease)
+            _LOGGER.info('Created lease %s', self.lease_name)
+
+    def _update_members(self) -> None:
+        """Update members from valid leases of the group."""
+        cls = self.__class__
+        leases = self.coordination_api.list_namespaced_lease(
+            self.namespace, label_selector='{}={}'.format(cls.GROUP_LABEL, self.group))
+        now = datetime.now(timezone.utc)
+        members = []
+        for lease in leases.items:
+            spec = lease.spec
+            if not spec.holder_identity or spec.renew_time is None:
+                continue
+            duration = timedelta(seconds=spec.lease_duration_seconds or cls.LEASE_DURATION)
+            if spec.renew_time + duration >= now:
+                members.append(spec.holder_identity)
+        # Own lease was just renewed, it is always a member
+        if self.identity not in members:
+            members.append(self.identity)
+        members.sort()
+
+        with self._members_lock:
+            if members != self._members:
+                _LOGGER.info('Members of group %s changed to %s', self.group, members)
+                self._members = members
+
+    def _membership_loop(self) -> None:
+        """Renew own lease and update members in a loop."""
+        cls = self.__class__
+        while self.thread_run:
+            time.sleep(cls.RENEW_INTERVAL)
+            if not self.thread_run:
+                break
+            try:
+                self._renew_lease()
+                self._update_members()
+            except ApiException as err:
+                _LOGGER.error('Error renewing lease %s: %s', self.lease_name, err)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.error(
+                    'Error in membership loop of lease %s: %s', self.lease_name, err,
+                    exc_info=True)
+                # On uncovered exception in thread save the exception
+                self.thread_exceptions['membership'] = err
+                self.thread_run = False
+
+
+class ShardManager:
+    """
+    Assign robots to the replicas of a group using consistent hashing.
+
+    Robots which are newly assigned to this replica are started only after a handover delay,
+    giving their previous owner time to notice the membership change and to stop them. The
+    first rebalance starts robots right away only if this replica is the only member of the
+    group. Otherwise, like during a rolling restart or a scale up, other replicas might still run
+    them.
+    """
+
+    def __init__(self, membership: LeaseMembership,
+                 handover_delay: float = 2 * LeaseMembership.RENEW_INTERVAL) -> None:
+        """Construct."""
+        self.membership = membership
+        self.handover_delay = handover_delay
+        self.ring = HashRing()
+        # Robots running on this replica
+        self.robots: Set[str] = set()
+        # Robots assigned to this replica, waiting for handover
+        self._pending: Dict[str, float] = {}
+        self._first_rebalance = True
+
+    @property
+    def pending(self) -> Set[str]:
+        """Get robots assigned to this replica which are waiting for handover."""
+        return set(self._pending)
+
+    def get_shard(self, robot_names: Iterable[str]) -> Set[str]:
+        """Get robots which are assigned to this replica."""
+        members = self.membership.members
+        if members != self.ring.nodes:
+            self.ring.set_nodes(members)
+        return {r for r in robot_names if self.ring.get_node(r) == self.membership.identity}
+
+    def rebalance(self, robot_names: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """
+        Rebalance robots.
+
+        Returns robots to start and to stop on this replica.
+        """
+        shard = self.get_shard(robot_names)
+        single_member = self.ring.nodes == [self.membership.identity]
+        now = time.time()
+
+        # Stop robots which are assigned to other replicas immediately
+        stop = sorted(self.robots - shard)
+        self.robots.difference_update(stop)
+
+        # Start robots once handover delay is over
+        for robot in list(self._pending):
+            if robot not in shard:
+                self._pending.pop(robot)
+        handover_delay = self.handover_delay
+        if self._first_rebalance and single_member:
+            handover_delay = 0.0
+        self._first_rebalance = False
+        for robot in shard - self.robots:
+            self._pending.setdefault(robot, now + handover_delay)
+        start = sorted(r for r, ts in self._pending.items() if ts <= now)
+        for robot in start:
+            self._pending.pop(robot)
+        self.robots.update(start)
+
+        if start or stop:
+            _LOGGER.info(
+                'Rebalanced robots of replica %s: start %s, stop %s', self.membership.identity,
+                start, stop)
+
+        return start, stop
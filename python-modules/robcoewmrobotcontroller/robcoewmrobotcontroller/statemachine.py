@@ -12,37 +12,40 @@
 
 """Robot state machine for robcoewm robots."""
 
+import copy
 import logging
+import threading
 import time
-from collections import namedtuple, OrderedDict, defaultdict
+from collections import OrderedDict, defaultdict, deque
 from datetime import datetime, timezone
 from typing import DefaultDict, Dict, Optional, OrderedDict as TOrderedDict
 
 from transitions.core import EventData
 from transitions.extensions import LockedHierarchicalMachine as Machine
+from transitions.extensions.locking import IdentManager, PicklableLock
 from transitions.extensions.states import add_state_features, Timeout
 
 from prometheus_client import Counter, Histogram
 
 import attr
-from cattr import structure, unstructure
 
+from robcoewmtypes.converter import structure, unstructure
 from robcoewmtypes.robot import RobotMission, RobotConfigurationStatus
 from robcoewmtypes.statemachine_config import RobotEWMConfig
 from robcoewmtypes.warehouseorder import (
     WarehouseOrder, WarehouseOrderCRDSpec, WarehouseTask, ConfirmWarehouseTask)
 
 from .ordercontroller import OrderHandler
+from .orderqueue import WarehouseOrderQueue, WhoIdentifier
 from .missioncontroller import MissionController
 from .robotconfigcontroller import RobotConfigurationController
+from .metrics import LabeledChildren
 
 _LOGGER = logging.getLogger(__name__)
 
 STATE_SUCCEEDED = 'SUCCEEDED'
 STATE_FAILED = 'FAILED'
 
-WhoIdentifier = namedtuple('WhoIdentifier', ['lgnum', 'who'])
-
 
 @attr.s
 class WarehouseOrderTimestamps:
@@ -54,16 +57,66 @@ class WarehouseOrderTimestamps:
     return_trolley: float = attr.ib(default=0.0, validator=attr.validators.instance_of(float))
 
 
-@add_state_features(Timeout)
-class RobotEWMMachine(Machine):
-    """Robot state machine to handle SAP EWM warehouse orders."""
+class ModelTimeout(Timeout):
+    """Timeout state whose timeout could be overwritten per model in its state_timeouts."""
+
+    def enter(self, event_data: EventData) -> None:
+        """Start a timeout timer for the model which entered the state."""
+        timeout = getattr(event_data.model, 'state_timeouts', {}).get(self.name, self.timeout)
+        if timeout > 0 and self.on_timeout:
+            timer = threading.Timer(timeout, self._process_timeout, args=(event_data,))
+            timer.daemon = True
+            timer.start()
+            self.runner[id(event_data.model)] = timer
+        # Skip Timeout.enter which would start a timer with the default timeout
+        super(Timeout, self).enter(event_data)  # pylint: disable=bad-super-call
+
+
+@add_state_features(ModelTimeout)
+class SharedMachine(Machine):
+    """
+    Hierarchical state machine whose compiled states and events are shared between robots.
+
+    The machine is compiled once and cloned for each robot. A clone gets its own lock, event queue
+    and scope, thus transitions of one robot do not block the transitions of other robots.
+    """
+
+    def clone(self) -> 'SharedMachine':
+        """Get a machine for one robot which shares states and events with this one."""
+        # pylint: disable=protected-access,attribute-defined-outside-init
+        machine = copy.copy(self)
+        machine._ident = IdentManager()
+        machine.machine_context = [PicklableLock(), machine._ident]
+        machine.model_context_map = defaultdict(list)
+        machine._transition_queue = deque()
+        machine._stack = []
+        machine._next_scope = None
+        machine.scoped = machine
+        machine.prefix_path = []
+        machine.models = []
+        return machine
+
+
+class RobotEWMMachine:
+    """
+    Robot state machine to handle SAP EWM warehouse orders.
+
+    States and transitions are compiled once per process. Each robot is the model of a clone of
+    this compiled machine, which holds the robot's state only.
+    """
 
     # Disable name check because generated methods are not snake case style
     # pylint: disable=invalid-name
+    # Disable member check because triggers and state checks are added by the state machine
+    # pylint: disable=no-member
 
     # Config of the state machine
     conf = RobotEWMConfig
 
+    # Compiled state machine shared by all robots
+    _machine: Optional[SharedMachine] = None
+    _machine_lock = threading.Lock()
+
     buckets = (
         1.0, 5.0, 10.0, 30.0, 60.0, 90.0, 120.0, 180.0, 240.0, 300.0, 360.0, 420.0, 480.0, 540.0,
         600.0, '+Inf')
@@ -84,17 +137,10 @@ class RobotEWMMachine(Machine):
             self, robot_config_ctrl: RobotConfigurationController, mission_ctrl: MissionController,
             order_handler: OrderHandler, initial: str = 'idle') -> None:
         """Construct."""
-        cls = self.__class__
-
-        # Check if all methods for transitions are implemented
-        cls.conf.check_transitions_complete(cls)
-
-        # Initialize state machine
-        super().__init__(self, states=cls.conf.states, transitions=cls.conf.transitions,
-                         send_event=True, queued=True,
-                         before_state_change=self._run_before_state_change,
-                         after_state_change=self._run_after_state_change,
-                         initial=initial)
+        # State is set when robot is added to its state machine
+        self.state: str
+        # Timeouts of states specific for this robot
+        self.state_timeouts: Dict[str, float] = {}
 
         # Controller
         # configuration of the robot
@@ -108,8 +154,8 @@ class RobotEWMMachine(Machine):
         self.processed_order_spec: Dict[str, Dict] = {}
 
         # EWM
-        # List of warehouse order assigned to this robot
-        self.warehouseorders: TOrderedDict[WhoIdentifier, WarehouseOrderCRDSpec] = OrderedDict()
+        # Queue of warehouse orders assigned to this robot ordered by their sequence
+        self.warehouseorders = WarehouseOrderQueue()
         # List of sub warehouse orders of robot's warehouse orders for Pick, Pack and Pass
         # Scenario. Those are not assigned to the robot
         self.sub_warehouseorders: TOrderedDict[
@@ -133,6 +179,35 @@ class RobotEWMMachine(Machine):
         # Timestamps for warehouse order processing
         self.who_ts: Optional[WarehouseOrderTimestamps] = None
 
+        # Prometheus metrics of this robot
+        cls = self.__class__
+        robot_name = self.robot_config.robot_name
+        self._p_who_counter = LabeledChildren(cls.who_counter, robot=robot_name)
+        self._p_who_times = LabeledChildren(cls.who_times, robot=robot_name)
+        self._p_state_retention_times = LabeledChildren(
+            cls.state_rentention_times, robot=robot_name)
+
+        # Add robot to its own state machine
+        self.machine = self.get_machine()
+        with self._machine_lock:
+            # Adding a model registers its state callbacks at the shared states
+            self.machine.add_model(self, initial=initial)
+
+    @classmethod
+    def get_machine(cls) -> SharedMachine:
+        """Get a state machine for one robot, compile the shared one on first use."""
+        with cls._machine_lock:
+            if cls._machine is None:
+                # Check if all methods for transitions are implemented
+                cls.conf.check_transitions_complete(cls)
+                # Callbacks are method names which are resolved on the robot's model
+                cls._machine = SharedMachine(
+                    model=None, states=cls.conf.states, transitions=cls.conf.transitions,
+                    send_event=True, queued=True,
+                    before_state_change='_run_before_state_change',
+                    after_state_change='_run_after_state_change', initial='idle')
+            return cls._machine.clone()
+
     def connect_external_events(self) -> None:
         """Connect state machine to external event sources of Cloud Robotics."""
         name = 'ewm_statemachine_{}'.format(self.robot_config.robot_name)
@@ -156,23 +231,34 @@ class RobotEWMMachine(Machine):
 
     def disconnect_external_events(self) -> None:
         """Disconnect state machine from external events sources of Cloud Robotics."""
-        name = 'ewm-statemachine-{}'.format(self.robot_config.robot_name)
+        name = 'ewm_statemachine_{}'.format(self.robot_config.robot_name)
         self.mission_ctrl.robot_handler.unregister_callback(name, self.robot_config.robot_name)
         self.order_handler.unregister_callback(name, self.robot_config.robot_name)
         self.order_handler.unregister_callback(name+'_deleted', self.robot_config.robot_name)
         self.mission_ctrl.handler.unregister_callback(name, self.robot_config.robot_name)
-        self.robot_config.handler.unregister_callback(name, self.robot_config.robot_name)
+        self.robot_config.handler.unregister_callback(
+            name+'_recover', self.robot_config.robot_name)
+        self.robot_config.handler.unregister_callback(
+            name+'_staging_timeout', self.robot_config.robot_name)
+        # Cancel running state timeouts
+        for state_name in self.machine.get_nested_state_names():
+            runner = getattr(self.machine.get_state(state_name), 'runner', {})
+            timer = runner.pop(id(self), None)
+            if timer is not None:
+                timer.cancel()
+        # Remove robot from its state machine
+        if self in self.machine.models:
+            self.machine.remove_model(self)
 
     def _run_before_state_change(self, event: EventData) -> None:
         """Run these methods before state changes."""
         # Log retention time in a state
         retention_time = time.time() - self.state_enter_ts
-        self.state_rentention_times.labels(  # pylint: disable=no-member
-            robot=self.robot_config.robot_name, state=self.state).observe(retention_time)
+        self._p_state_retention_times.labels(state=self.state).observe(retention_time)
 
         # Update timeout depending on max_idle_time
-        if self.states.get('idle') and self.robot_config.conf.maxIdleTime > 0:
-            self.states['idle'].timeout = self.robot_config.conf.maxIdleTime
+        if self.robot_config.conf.maxIdleTime > 0:
+            self.state_timeouts['idle'] = self.robot_config.conf.maxIdleTime
 
     def _run_after_state_change(self, event: EventData) -> None:
         """Run these methods after state changed."""
@@ -247,7 +333,7 @@ class RobotEWMMachine(Machine):
                     # Cancel charge mission
                     self.cancel_active_mission()
                     # Process warehouse order
-                    next_who_crd = next(iter(self.warehouseorders.values()))
+                    next_who_crd = self.warehouseorders.peek()
                     if isinstance(next_who_crd, WarehouseOrderCRDSpec):
                         self.process_warehouseorder(warehouseorder=next_who_crd.data)
                     else:
@@ -369,14 +455,6 @@ class RobotEWMMachine(Machine):
                 'provided for the transition')
             return False
 
-    def _sort_warehouseorders(self) -> None:
-        """Sort self.warehouseorders by sequence."""
-        try:
-            self.warehouseorders = OrderedDict(sorted(
-                self.warehouseorders.items(), key=lambda items: items[1].sequence))  # type: ignore
-        except AttributeError as err:
-            _LOGGER.error('Sorting self.warehouseorders failed with this AttributeError: %s', err)
-
     def _update_who(self, event: EventData) -> None:
         """Update a warehouse order of this state machine."""
         warehouseorder_spec = event.kwargs.get('warehouseorder')
@@ -401,9 +479,6 @@ class RobotEWMMachine(Machine):
         # Update queue of all warehouse order specs
         self.warehouseorders[who] = warehouseorder_spec
 
-        # Sort warehouse order queue
-        self._sort_warehouseorders()
-
         # Update active warehouse order
         # No warehouse order in process and received order is assigned to robot
         if self.active_who is None:
@@ -732,7 +807,7 @@ class RobotEWMMachine(Machine):
                 and self.robot_config.conf.mode in [
                     self.robot_config.conf.MODE_RUN, self.robot_config.conf.MODE_IDLE]):
             _LOGGER.info('Warehouse order in queue, start processing')
-            next_who_crd = next(iter(self.warehouseorders.values()))
+            next_who_crd = self.warehouseorders.peek()
             if isinstance(next_who_crd, WarehouseOrderCRDSpec):
                 self.process_warehouseorder(warehouseorder=next_who_crd.data)
             else:
@@ -847,9 +922,9 @@ class RobotEWMMachine(Machine):
         if isinstance(self.who_ts, WarehouseOrderTimestamps):
             self.who_ts.end = time.time()
             time_elapsed = self.who_ts.end - self.who_ts.start
-            self.who_times.labels(
-                robot=self.robot_config.robot_name, order_type=self.conf.get_process_type(
-                    event.state.name), activity='completed').observe(time_elapsed)
+            self._p_who_times.labels(
+                order_type=self.conf.get_process_type(event.state.name),
+                activity='completed').observe(time_elapsed)
         else:
             _LOGGER.error('Warehouse order processing times logging not started correctly.')
         # Unset timestamps
@@ -864,9 +939,9 @@ class RobotEWMMachine(Machine):
                 time_elapsed = self.who_ts.get_trolley - self.who_ts.return_trolley
             else:
                 time_elapsed = self.who_ts.get_trolley - self.who_ts.start
-            self.who_times.labels(
-                robot=self.robot_config.robot_name, order_type=self.conf.get_process_type(
-                    event.state.name), activity='get_trolley').observe(time_elapsed)
+            self._p_who_times.labels(
+                order_type=self.conf.get_process_type(event.state.name),
+                activity='get_trolley').observe(time_elapsed)
         else:
             _LOGGER.error('Warehouse order processing times logging not started correctly.')
 
@@ -875,9 +950,9 @@ class RobotEWMMachine(Machine):
         if isinstance(self.who_ts, WarehouseOrderTimestamps):
             self.who_ts.return_trolley = time.time()
             time_elapsed = self.who_ts.return_trolley - self.who_ts.get_trolley
-            self.who_times.labels(
-                robot=self.robot_config.robot_name, order_type=self.conf.get_process_type(
-                    event.state.name), activity='return_trolley').observe(time_elapsed)
+            self._p_who_times.labels(
+                order_type=self.conf.get_process_type(event.state.name),
+                activity='return_trolley').observe(time_elapsed)
         else:
             _LOGGER.error('Warehouse order processing times logging not started correctly.')
 
@@ -888,9 +963,9 @@ class RobotEWMMachine(Machine):
         # Log processing times
         self._log_warehouse_order_completed(event)
         # Log outcome
-        self.who_counter.labels(
-            robot=self.robot_config.robot_name, order_type=self.conf.get_process_type(
-                event.state.name), result=STATE_FAILED).inc()
+        self._p_who_counter.labels(
+            order_type=self.conf.get_process_type(event.state.name),
+            result=STATE_FAILED).inc()
 
     def _log_warehouse_order_success(self, event: EventData) -> None:
         """Log a succeeeded warehouse order."""
@@ -899,9 +974,9 @@ class RobotEWMMachine(Machine):
         # Log processing times
         self._log_warehouse_order_completed(event)
         # Log outcome
-        self.who_counter.labels(
-            robot=self.robot_config.robot_name, order_type=self.conf.get_process_type(
-                event.state.name), result=STATE_SUCCEEDED).inc()
+        self._p_who_counter.labels(
+            order_type=self.conf.get_process_type(event.state.name),
+            result=STATE_SUCCEEDED).inc()
 
     def on_enter_atStaging(self, event: EventData) -> None:
         """Decide what's next when arriving at staging area."""
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Microbenchmark of CR structure and unstructure per event."""
+
+import timeit
+
+from typing import Any, Callable, List, Tuple
+
+import cattr
+
+from robcoewmtypes import converter
+from robcoewmtypes.auction import (
+    OrderAuctionStatus, OrderReservationStatus, WarehouseOrderBidding)
+from robcoewmtypes.robot import RobotConfigurationSpec, RobotConfigurationStatus
+from robcoewmtypes.warehouseorder import (
+    ConfirmWarehouseTask, WarehouseOrder, WarehouseOrderCRDSpec, WarehouseTask)
+
+
+def sample_warehouseorder(who: int, tasks: int = 3) -> WarehouseOrder:
+    """Get a warehouse order with warehouse tasks."""
+    return WarehouseOrder(
+        lgnum='1710', who=str(who), status='D', queue='ROBOTS', rsrc='ROBOT1',
+        warehousetasks=[
+            WarehouseTask(lgnum='1710', tanum=str(who * 10 + i), vlpla='SRC-01', nlpla='DST-01',
+                          who=str(who))
+            for i in range(tasks)])
+
+
+# Data class and an instance of it like it is processed per event
+CASES: List[Tuple[str, Any, Any]] = [
+    ('robotconfiguration.spec', RobotConfigurationSpec, RobotConfigurationSpec(
+        lgnum='1710', rsrctype='RB01', rsrcgrp='RB02', batteryMin=10, mode='RUN')),
+    ('robotconfiguration.status', RobotConfigurationStatus, RobotConfigurationStatus(
+        statemachine='idle', lgnum='1710', who='1000')),
+    ('orderreservation.status', OrderReservationStatus, OrderReservationStatus(
+        status='RESERVATIONS', warehouseorders=[sample_warehouseorder(i) for i in range(5)])),
+    ('orderauction.status', OrderAuctionStatus, OrderAuctionStatus(biddings=[
+        WarehouseOrderBidding(lgnum='1710', who=str(i), bidding=i) for i in range(10)])),
+    ('warehouseorder.spec', WarehouseOrderCRDSpec, WarehouseOrderCRDSpec(
+        data=sample_warehouseorder(1000), order_status='RUNNING', process_status=[
+            ConfirmWarehouseTask(lgnum='1710', tanum='10000', confirmationnumber='FIRST',
+                                 confirmationtype='SUCCESS', who='1000')])),
+]
+
+
+def measure(func: Callable, number: int) -> float:
+    """Return microseconds per call, best of 7 runs."""
+    return min(timeit.repeat(func, number=number, repeat=7)) / number * 1e6
+
+
+def main(number: int = 2000) -> None:
+    """Run the benchmark."""
+    print('{:<28} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'us per event', 'cattr', 'converter', 'trusted', 'unstr cattr', 'unstr conv'))
+    for name, cls, obj in CASES:
+        data = cattr.unstructure(obj)
+        # pylint: disable=cell-var-from-loop
+        results = [
+            measure(lambda: cattr.structure(data, cls), number),
+            measure(lambda: converter.structure(data, cls), number),
+            measure(lambda: converter.structure_trusted(data, cls), number),
+            measure(lambda: cattr.unstructure(obj), number),
+            measure(lambda: converter.unstructure(obj), number),
+        ]
+        print('{:<28} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(name, *results))
+
+
+if __name__ == '__main__':
+    main()
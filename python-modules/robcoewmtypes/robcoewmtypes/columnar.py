@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Columnar representation of warehouse task sets."""
+
+import operator
+import sys
+
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import attr
+
+from .warehouseorder import WarehouseOrder, WarehouseTask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Type codes of numeric attributes and of the codes of string attributes
+_TYPECODES = {bool: 'b', int: 'q', float: 'd', str: 'l'}
+_DTYPES = {bool: '?', int: 'i8', float: 'f8', str: 'i4'}
+
+_COMPARE_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    '<': operator.lt, '<=': operator.le, '==': operator.eq, '!=': operator.ne,
+    '>=': operator.ge, '>': operator.gt}
+
+
+def _make_array(value_type: type, values: Iterable) -> Any:
+    """Create a numpy array or a compact array of values."""
+    if np is not None:
+        return np.array(list(values), dtype=_DTYPES[value_type])
+    return array(_TYPECODES[value_type], values)
+
+
+class WarehouseTaskColumns:
+    """
+    Warehouse tasks stored column by column.
+
+    Numeric attributes like priority, weight and volum are stored in numpy arrays or, if numpy is
+    not installed, in compact arrays. String attributes like bins and keys are dictionary
+    encoded: each column holds integer codes of its interned distinct values.
+    Masks and indices returned and accepted by this class are numpy arrays if numpy is available
+    and lists otherwise.
+    """
+
+    FIELDS = attr.fields(WarehouseTask)
+    STRING_FIELDS = tuple(f.name for f in FIELDS if f.type is str)
+    NUMERIC_FIELDS = tuple(f.name for f in FIELDS if f.type is not str)
+
+    def __init__(self, columns: Dict[str, Any], categories: Dict[str, List[str]],
+                 length: int) -> None:
+        """Construct. Use from_tasks or from_warehouseorders to create an instance."""
+        self._columns = columns
+        self._categories = categories
+        self._length = length
+        self._category_index: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        """Get number of warehouse tasks."""
+        return self._length
+
+    @classmethod
+    def from_tasks(cls, tasks: Iterable[WarehouseTask]) -> 'WarehouseTaskColumns':
+        """Create columns from warehouse tasks."""
+        tasks = list(tasks)
+        columns: Dict[str, Any] = {}
+        categories: Dict[str, List[str]] = {}
+        for field in cls.FIELDS:
+            values = [getattr(wht, field.name) for wht in tasks]
+            if field.type is str:
+                index: Dict[str, int] = {}
+                codes = [index.setdefault(value, len(index)) for value in values]
+                categories[field.name] = [sys.intern(value) for value in index]
+                columns[field.name] = _make_array(str, codes)
+            else:
+                columns[field.name] = _make_array(field.type, values)
+
+        return cls(columns, categories, len(tasks))
+
+    @classmethod
+    def from_warehouseorders(
+            cls, warehouseorders: Iterable[WarehouseOrder]) -> 'WarehouseTaskColumns':
+        """Create columns from the warehouse tasks of warehouse orders."""
+        return cls.from_tasks(wht for who in warehouseorders for wht in who.warehousetasks)
+
+    def task(self, index: int) -> WarehouseTask:
+        """Get warehouse task at an index."""
+        values = {}
+        for name in self.STRING_FIELDS:
+            values[name] = self._categories[name][self._columns[name][index]]
+        for name in self.NUMERIC_FIELDS:
+            values[name] = self._columns[name][index].item() if np is not None else (
+                self._columns[name][index])
+        return WarehouseTask(**values)
+
+    def to_tasks(self) -> List[WarehouseTask]:
+        """Convert columns to a list of warehouse tasks."""
+        return [self.task(i) for i in range(self._length)]
+
+    def array(self, name: str) -> Any:
+        """Get raw column of an attribute. String attributes return their codes."""
+        return self._columns[name]
+
+    def values(self, name: str) -> List:
+        """Get values of an attribute as list."""
+        if name in self._categories:
+            categories = self._categories[name]
+            return [categories[code] for code in self._columns[name]]
+        return self._columns[name].tolist()
+
+    def _codes(self, name: str, values: Iterable[str]) -> List[int]:
+        """Get codes of string values in a column, skipping values which do not exist."""
+        index = self._category_index.get(name)
+        if index is None:
+            index = {value: i for i, value in enumerate(self._categories[name])}
+            self._category_index[name] = index
+        return [index[value] for value in values if value in index]
+
+    def isin(self, name: str, values: Iterable) -> Any:
+        """Get a mask of warehouse tasks whose attribute is one of the values."""
+        column = self._columns[name]
+        if name in self._categories:
+            selected = self._codes(name, values)
+        else:
+            selected = list(values)
+        if np is not None:
+            return np.isin(column, selected)
+        selected_set = set(selected)
+        return [value in selected_set for value in column]
+
+    def compare(self, name: str, op: str, value: Any) -> Any:
+        """Get a mask of warehouse tasks comparing a numeric attribute with a value."""
+        if name in self._categories:
+            raise ValueError('Attribute "{}" is not numeric'.format(name))
+        func = _COMPARE_OPS[op]
+        column = self._columns[name]
+        if np is not None:
+            return func(column, value)
+        return [func(entry, value) for entry in column]
+
+    def take(self, indices: Sequence[int]) -> 'WarehouseTaskColumns':
+        """Get warehouse tasks at indices."""
+        if np is not None:
+            indices = np.asarray(indices, dtype=np.intp)
+            columns = {name: column[indices] for name, column in self._columns.items()}
+        else:
+            columns = {
+                name: array(column.typecode, (column[i] for i in indices))
+                for name, column in self._columns.items()}
+        # Categories are shared, unused values do not matter
+        return self.__class__(columns, self._categories, len(indices))
+
+    def filter(self, mask: Sequence[bool]) -> 'WarehouseTaskColumns':
+        """Get warehouse tasks where mask is True."""
+        if np is not None:
+            return self.take(np.flatnonzero(mask))
+        return self.take([i for i, selected in enumerate(mask) if selected])
+
+    def _sort_key(self, name: str) -> Any:
+        """Get column values whose order is the sort order of the attribute."""
+        column = self._columns[name]
+        if name not in self._categories:
+            return column
+        # Replace codes of string columns by the rank of their values
+        categories = self._categories[name]
+        ranks = [0] * len(categories)
+        for rank, code in enumerate(sorted(range(len(categories)), key=categories.__getitem__)):
+            ranks[code] = rank
+        if np is not None:
+            return np.asarray(ranks, dtype=np.intp)[column]
+        return [ranks[code] for code in column]
+
+    def argsort(self, *names: str, descending: bool = False) -> Any:
+        """Get indices which sort warehouse tasks by attributes, the first one is primary."""
+        keys = [self._sort_key(name) for name in names]
+        if np is not None:
+            if not keys:
+                return np.arange(self._length)
+            if descending:
+                # Negate keys to keep the sort stable
+                keys = [-key.astype('f8' if key.dtype.kind == 'f' else 'i8') for key in keys]
+            # lexsort sorts by the last key first
+            return np.lexsort(keys[::-1])
+        return sorted(
+            range(self._length), key=lambda i: tuple(key[i] for key in keys),
+            reverse=descending)
+
+    def sort_by(self, *names: str, descending: bool = False) -> 'WarehouseTaskColumns':
+        """Get warehouse tasks sorted by attributes, the first one is primary."""
+        return self.take(self.argsort(*names, descending=descending))
+
+    def first(self) -> Optional[WarehouseTask]:
+        """Get first warehouse task or None if there is none."""
+        return self.task(0) if self._length else None
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Precompiled converters for robcoewmtypes data classes."""
+
+from typing import Any, Callable, Dict, Type, TypeVar
+
+import attr
+from cattr import GenConverter
+from cattr.gen import make_dict_structure_fn, make_dict_unstructure_fn
+
+from .auction import (
+    Scope, Configuration, AuctioneerSpec, AuctioneerStatus, OrderAuctionSpec,
+    WarehouseOrderBidding, OrderAuctionStatus, OrderRequest, OrderAssignment,
+    OrderReservationSpec, OrderReservationStatus)
+from .robot import (
+    Robot, RobotMission, RobotConfigurationSpec, RobotConfigurationStatus,
+    RobcoRobotCRStatusRobot, RobcoRobotCRStatus)
+from .warehouse import StorageBin, FrozenStorageBin
+from .warehouseorder import (
+    WarehouseTask, WarehouseOrder, ConfirmWarehouseTask, WarehouseOrderIdent,
+    WarehouseOrderCRDSpec, WarehouseOrderCRDStatus, FrozenWarehouseTask, FrozenWarehouseOrder,
+    FrozenConfirmWarehouseTask)
+
+T = TypeVar('T')
+
+# Data classes used in custom resources
+CR_TYPES = [
+    Scope, Configuration, AuctioneerSpec, AuctioneerStatus, WarehouseTask, WarehouseOrder,
+    OrderAuctionSpec, WarehouseOrderBidding, OrderAuctionStatus, OrderRequest, OrderAssignment,
+    OrderReservationSpec, OrderReservationStatus, Robot, RobotMission, RobotConfigurationSpec,
+    RobotConfigurationStatus, RobcoRobotCRStatusRobot, RobcoRobotCRStatus, StorageBin,
+    ConfirmWarehouseTask, WarehouseOrderIdent, WarehouseOrderCRDSpec, WarehouseOrderCRDStatus]
+# Slotted and immutable variants of data classes
+FROZEN_TYPES = [
+    FrozenWarehouseTask, FrozenWarehouseOrder, FrozenConfirmWarehouseTask, FrozenStorageBin]
+
+# Converter with generated structure and unstructure functions
+converter = GenConverter(prefer_attrib_converters=True)
+# Converter for trusted input, which is structured without running attrs validators
+trusted_converter = GenConverter()
+
+
+def make_trusted_structure_fn(cls: Type[T], conv: GenConverter) -> Callable[[Dict, Any], T]:
+    """
+    Generate a function structuring trusted input to an attrs class.
+
+    Attribute converters and defaults are applied, validators are skipped.
+    """
+    globs: Dict[str, Any] = {'__cls': cls, '__conv': conv, '__setattr': object.__setattr__}
+    lines = ['def structure_trusted(o, _):', '    inst = __cls.__new__(__cls)']
+    # Set attributes directly in instance dictionary unless the class is slotted
+    if '__slots__' in cls.__dict__:
+        setter = "__setattr(inst, '{0}', {1})"
+    else:
+        lines.append('    inst_dict = inst.__dict__')
+        setter = "inst_dict['{0}'] = {1}"
+    for field in attr.fields(cls):
+        name = field.name
+        # attrs converters take care of type conversion themselves
+        if field.converter is not None:
+            globs['__c_' + name] = field.converter
+            value = "__c_{0}(o['{0}'])".format(name)
+        else:
+            globs['__t_' + name] = field.type
+            value = "__conv.structure(o['{0}'], __t_{0})".format(name)
+        lines.append("    if '{}' in o:".format(name))
+        lines.append('        ' + setter.format(name, value))
+        if field.default is attr.NOTHING:
+            lines.append('    else:')
+            lines.append("        raise KeyError('{}')".format(name))
+        elif isinstance(field.default, attr.Factory):  # type: ignore
+            if field.default.takes_self:  # type: ignore
+                raise TypeError('Factories taking self are not supported for {}'.format(cls))
+            globs['__d_' + name] = field.default.factory  # type: ignore
+            lines.append('    else:')
+            lines.append('        ' + setter.format(name, '__d_{}()'.format(name)))
+        else:
+            globs['__d_' + name] = field.default
+            lines.append('    else:')
+            lines.append('        ' + setter.format(name, '__d_{}'.format(name)))
+    lines.append('    return inst')
+
+    script = '\n'.join(lines)
+    filename = '<trusted structure {}>'.format(cls.__name__)
+    exec(compile(script, filename, 'exec'), globs)  # pylint: disable=exec-used
+    return globs['structure_trusted']
+
+
+def _register_hooks() -> None:
+    """Generate structure and unstructure functions for all CR types."""
+    for cls in CR_TYPES + FROZEN_TYPES:
+        converter.register_structure_hook(cls, make_dict_structure_fn(
+            cls, converter, _cattrs_prefer_attrib_converters=True))
+        converter.register_unstructure_hook(cls, make_dict_unstructure_fn(cls, converter))
+        trusted_converter.register_structure_hook(
+            cls, make_trusted_structure_fn(cls, trusted_converter))
+
+
+_register_hooks()
+
+
+def structure(obj: Any, cl: Type[T]) -> T:
+    """Structure data to a robcoewmtypes class."""
+    return converter.structure(obj, cl)
+
+
+def structure_trusted(obj: Any, cl: Type[T]) -> T:
+    """
+    Structure trusted data to a robcoewmtypes class without running validators.
+
+    Use it only for data which was created by unstructuring the same class, e.g. the status of
+    custom resources written by the controllers of this project.
+    """
+    return trusted_converter.structure(obj, cl)
+
+
+def unstructure(obj: Any) -> Any:
+    """Unstructure a robcoewmtypes class to primitive data."""
+    return converter.unstructure(obj)
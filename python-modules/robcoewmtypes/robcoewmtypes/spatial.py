@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+"""Spatial index of storage bins."""
+
+import heapq
+import itertools
+import math
+
+from collections import defaultdict
+from typing import (
+    Any, Callable, DefaultDict, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple)
+
+from .warehouse import StorageBin
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BinKey = Tuple[str, str]
+Cell = Tuple[int, ...]
+Point = Tuple[float, ...]
+
+
+def pairwise_distances(points_a: Sequence[Sequence[float]],
+                       points_b: Sequence[Sequence[float]]) -> Any:
+    """
+    Get euclidean distances between all points of two lists.
+
+    Returns a numpy matrix if numpy is available and a list of lists otherwise.
+    """
+    if np is not None:
+        if not points_a or not points_b:
+            return np.zeros((len(points_a), len(points_b)))
+        array_a = np.asarray(points_a, dtype='f8').reshape(len(points_a), -1)
+        array_b = np.asarray(points_b, dtype='f8').reshape(len(points_b), -1)
+        diff = array_a[:, np.newaxis, :] - array_b[np.newaxis, :, :]
+        return np.sqrt((diff * diff).sum(axis=-1))
+    return [[math.dist(point_a, point_b) for point_b in points_b] for point_a in points_a]
+
+
+class StorageBinIndex:
+    """
+    Uniform grid index of storage bins by their coordinates.
+
+    Distances are measured in the x/y plane by default, set use_z to include the z coordinate.
+    Bins are identified by lgnum and lgpla, the index could be updated incrementally.
+    """
+
+    # Average number of bins per grid cell if cell size is chosen automatically
+    BINS_PER_CELL = 4
+
+    def __init__(self, storagebins: Iterable[StorageBin] = (),
+                 cell_size: Optional[float] = None, use_z: bool = False) -> None:
+        """Construct."""
+        self.use_z = use_z
+        self.cell_size = cell_size
+        self._bins: Dict[BinKey, StorageBin] = {}
+        self._points: Dict[BinKey, Point] = {}
+        self._cells: DefaultDict[Cell, Set[BinKey]] = defaultdict(set)
+        # Bounds of occupied cells
+        self._min_cell: Optional[Cell] = None
+        self._max_cell: Optional[Cell] = None
+
+        storagebins = list(storagebins)
+        if self.cell_size is None:
+            self.cell_size = self._auto_cell_size(storagebins)
+        self.update(storagebins)
+
+    def __len__(self) -> int:
+        """Get number of bins in the index."""
+        return len(self._bins)
+
+    def __contains__(self, key: BinKey) -> bool:
+        """Check if a bin is in the index."""
+        return key in self._bins
+
+    def _auto_cell_size(self, storagebins: List[StorageBin]) -> float:
+        """Choose a cell size for the given bins."""
+        if len(storagebins) < 2:
+            return 1.0
+        points = [self._point(sbin) for sbin in storagebins]
+        extents = [max(axis) - min(axis) for axis in zip(*points)]
+        volume = math.prod(extent for extent in extents if extent > 0)
+        dims = len([extent for extent in extents if extent > 0])
+        if not dims:
+            return 1.0
+        cls = self.__class__
+        return (volume * cls.BINS_PER_CELL / len(storagebins)) ** (1 / dims)
+
+    def _point(self, storagebin: StorageBin) -> Point:
+        """Get coordinates of a bin."""
+        if self.use_z:
+            return (storagebin.xcord, storagebin.ycord, storagebin.zcord)
+        return (storagebin.xcord, storagebin.ycord)
+
+    def _query_point(self, x: float, y: float, z: float) -> Point:
+        """Get coordinates of a query."""
+        return (x, y, z) if self.use_z else (x, y)
+
+    def _cell(self, point: Point) -> Cell:
+        """Get grid cell of a point."""
+        return tuple(math.floor(coord / self.cell_size) for coord in point)  # type: ignore
+
+    def _update_bounds(self, cell: Cell) -> None:
+        """Extend bounds of occupied cells."""
+        if self._min_cell is None or self._max_cell is None:
+            self._min_cell = self._max_cell = cell
+        else:
+            self._min_cell = tuple(map(min, self._min_cell, cell))
+            self._max_cell = tuple(map(max, self._max_cell, cell))
+
+    @staticmethod
+    def key(storagebin: StorageBin) -> BinKey:
+        """Get key of a bin."""
+        return (storagebin.lgnum, storagebin.lgpla)
+
+    def get(self, lgnum: str, lgpla: str) -> Optional[StorageBin]:
+        """Get a bin from the index."""
+        return self._bins.get((lgnum, lgpla))
+
+    def point(self, lgnum: str, lgpla: str) -> Optional[Point]:
+        """Get coordinates of a bin in the index."""
+        return self._points.get((lgnum, lgpla))
+
+    def update(self, storagebins: Iterable[StorageBin]) -> None:
+        """Add or replace bins."""
+        for storagebin in storagebins:
+            key = self.key(storagebin)
+            point = self._point(storagebin)
+            old_point = self._points.get(key)
+            if old_point is not None:
+                if old_point == point:
+                    self._bins[key] = storagebin
+                    continue
+                self._remove_from_cell(key, old_point)
+            self._bins[key] = storagebin
+            self._points[key] = point
+            cell = self._cell(point)
+            self._cells[cell].add(key)
+            self._update_bounds(cell)
+
+    def _remove_from_cell(self, key: BinKey, point: Point) -> None:
+        """Remove a bin from its grid cell."""
+        cell = self._cell(point)
+        keys = self._cells.get(cell)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    def remove(self, keys: Iterable[BinKey]) -> None:
+        """Remove bins."""
+        for key in keys:
+            point = self._points.pop(key, None)
+            self._bins.pop(key, None)
+            if point is not None:
+                self._remove_from_cell(key, point)
+
+    def refresh(self, storagebins: Iterable[StorageBin]) -> Tuple[int, int]:
+        """
+        Synchronize index with the current bins of its warehouses.
+
+        Only changed bins are updated. Returns the number of updated and removed bins.
+        """
+        current = {self.key(sbin): sbin for sbin in storagebins}
+        removed = [key for key in self._bins if key not in current]
+        changed = [sbin for key, sbin in current.items() if self._bins.get(key) != sbin]
+        self.remove(removed)
+        self.update(changed)
+        return len(changed), len(removed)
+
+    def _ring(self, center: Cell, radius: int) -> Iterator[Cell]:
+        """Get cells with chebyshev distance radius from center cell."""
+        if radius == 0:
+            yield center
+            return
+        offsets = range(-radius, radius + 1)
+        for offset in itertools.product(offsets, repeat=len(center)):
+            if max(abs(o) for o in offset) == radius:
+                yield tuple(c + o for c, o in zip(center, offset))
+
+    def _max_radius(self, center: Cell) -> int:
+        """Get ring radius which covers all occupied cells."""
+        if self._min_cell is None or self._max_cell is None:
+            return -1
+        return max(
+            max(abs(c - lo), abs(c - hi))
+            for c, lo, hi in zip(center, self._min_cell, self._max_cell))
+
+    def knn(self, x: float, y: float, k: int, z: float = 0.0,
+            predicate: Optional[Callable[[StorageBin], bool]] = None
+            ) -> List[Tuple[float, StorageBin]]:
+        """Get the k nearest bins and their distances, optionally filtered by a predicate."""
+        if k <= 0 or not self._bins:
+            return []
+        point = self._query_point(x, y, z)
+        center = self._cell(point)
+        # Max heap of the k best entries as (-distance, key)
+        best: List[Tuple[float, BinKey]] = []
+        for radius in range(self._max_radius(center) + 1):
+            for cell in self._ring(center, radius):
+                for key in self._cells.get(cell, ()):
+                    if predicate is not None and not predicate(self._bins[key]):
+                        continue
+                    dist = math.dist(point, self._points[key])
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, key))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, key))
+            # Unvisited cells are at least radius cell sizes away
+            if len(best) == k and -best[0][0] <= radius * self.cell_size:  # type: ignore
+                break
+        return [(-dist, self._bins[key]) for dist, key in sorted(best, reverse=True)]
+
+    def nearest(self, x: float, y: float, z: float = 0.0,
+                predicate: Optional[Callable[[StorageBin], bool]] = None
+                ) -> Optional[StorageBin]:
+        """Get the nearest bin, optionally filtered by a predicate."""
+        result = self.knn(x, y, 1, z=z, predicate=predicate)
+        return result[0][1] if result else None
+
+    def within(self, x: float, y: float, radius: float,
+               z: float = 0.0) -> List[Tuple[float, StorageBin]]:
+        """Get bins within a radius and their distances, sorted by distance."""
+        point = self._query_point(x, y, z)
+        low = self._cell(tuple(coord - radius for coord in point))
+        high = self._cell(tuple(coord + radius for coord in point))
+        result = []
+        for cell in itertools.product(*(range(lo, hi + 1) for lo, hi in zip(low, high))):
+            for key in self._cells.get(cell, ()):
+                dist = math.dist(point, self._points[key])
+                if dist <= radius:
+                    result.append((dist, key))
+        result.sort()
+        return [(dist, self._bins[key]) for dist, key in result]
+
+    def distances(self, keys_a: Sequence[BinKey], keys_b: Sequence[BinKey]) -> Any:
+        """Get pairwise distances between two lists of bins in the index."""
+        return pairwise_distances(
+            [self._points[key] for key in keys_a], [self._points[key] for key in keys_b])
@@ -64,6 +64,39 @@ class StorageBin:
         default=0.0, validator=validate_annotation, converter=float)
 
 
+@attr.s(slots=True, frozen=True)
+class FrozenStorageBin:
+    """
+    Slotted and immutable variant of StorageBin.
+
+    Equality and hash use the SAP keys only, thus it could be used as dictionary key for the
+    storage bin. Converters ensure the attribute types, there are no extra validators.
+    """
+
+    # SAP keys
+    lgnum: str = attr.ib(converter=strstrip)
+    lgpla: str = attr.ib(converter=strstrip)
+    # SAP values
+    lgtyp: str = attr.ib(default='', converter=strstrip, eq=False)
+    lgber: str = attr.ib(default='', converter=strstrip, eq=False)
+    lptyp: str = attr.ib(default='', converter=strstrip, eq=False)
+    aisle: str = attr.ib(default='', converter=strstrip, eq=False)
+    stack: str = attr.ib(default='', converter=strstrip, eq=False)
+    lvlv: str = attr.ib(default='', converter=strstrip, eq=False)
+    xcord: float = attr.ib(default=0.0, converter=float, eq=False)
+    ycord: float = attr.ib(default=0.0, converter=float, eq=False)
+    zcord: float = attr.ib(default=0.0, converter=float, eq=False)
+
+    @classmethod
+    def from_mutable(cls, storagebin: StorageBin) -> 'FrozenStorageBin':
+        """Create from a StorageBin."""
+        return cls(**attr.asdict(storagebin, recurse=False))
+
+    def to_mutable(self) -> StorageBin:
+        """Create a StorageBin."""
+        return StorageBin(**attr.asdict(self, recurse=False))
+
+
 @attr.s
 class Warehouse:
     """SAP EWM Warehouse type."""
@@ -12,7 +12,7 @@
 
 """Warehouse order related data types."""
 
-from typing import List
+from typing import Any, List, Tuple
 import attr
 
 from .helper import strstrip, validate_annotation, datetime_now_iso
@@ -118,6 +118,102 @@ class WarehouseOrder:
             iterable_validator=attr.validators.instance_of(list)))
 
 
+# Slotted and immutable variants of SAP OData Types are starting here
+
+@attr.s(slots=True, frozen=True)
+class FrozenWarehouseTask:
+    """
+    Slotted and immutable variant of WarehouseTask.
+
+    Equality and hash use the SAP keys only, thus it could be used as dictionary key for the
+    warehouse task. Converters ensure the attribute types, there are no extra validators.
+    """
+
+    # SAP keys
+    lgnum: str = attr.ib(converter=strstrip)
+    tanum: str = attr.ib(converter=strstrip)
+    # SAP values
+    procty: str = attr.ib(default='', converter=strstrip, eq=False)
+    flghuto: bool = attr.ib(default=False, converter=bool, eq=False)
+    tostat: str = attr.ib(default='', converter=strstrip, eq=False)
+    priority: int = attr.ib(default=0, converter=int, eq=False)
+    weight: float = attr.ib(default=0.0, converter=float, eq=False)
+    unitw: str = attr.ib(default='', converter=strstrip, eq=False)
+    volum: float = attr.ib(default=0.0, converter=float, eq=False)
+    unitv: str = attr.ib(default='', converter=strstrip, eq=False)
+    vltyp: str = attr.ib(default='', converter=strstrip, eq=False)
+    vlber: str = attr.ib(default='', converter=strstrip, eq=False)
+    vlpla: str = attr.ib(default='', converter=strstrip, eq=False)
+    vlenr: str = attr.ib(default='', converter=strstrip, eq=False)
+    nltyp: str = attr.ib(default='', converter=strstrip, eq=False)
+    nlber: str = attr.ib(default='', converter=strstrip, eq=False)
+    nlpla: str = attr.ib(default='', converter=strstrip, eq=False)
+    nlenr: str = attr.ib(default='', converter=strstrip, eq=False)
+    who: str = attr.ib(default='', converter=strstrip, eq=False)
+
+    @classmethod
+    def from_mutable(cls, wht: WarehouseTask) -> 'FrozenWarehouseTask':
+        """Create from a WarehouseTask."""
+        return cls(**attr.asdict(wht, recurse=False))
+
+    def to_mutable(self) -> WarehouseTask:
+        """Create a WarehouseTask."""
+        return WarehouseTask(**attr.asdict(self, recurse=False))
+
+
+def freeze_warehousetasks(data: Any) -> Tuple[FrozenWarehouseTask, ...]:
+    """Convert warehouse tasks or their dictionaries to a tuple of FrozenWarehouseTask."""
+    warehousetasks = []
+    for wht in data:
+        if isinstance(wht, FrozenWarehouseTask):
+            warehousetasks.append(wht)
+        elif isinstance(wht, WarehouseTask):
+            warehousetasks.append(FrozenWarehouseTask.from_mutable(wht))
+        else:
+            warehousetasks.append(FrozenWarehouseTask(**wht))
+    return tuple(warehousetasks)
+
+
+@attr.s(slots=True, frozen=True)
+class FrozenWarehouseOrder:
+    """
+    Slotted and immutable variant of WarehouseOrder.
+
+    Equality and hash use the SAP keys only, thus it could be used as dictionary key for the
+    warehouse order. Converters ensure the attribute types, there are no extra validators.
+    """
+
+    # SAP keys
+    lgnum: str = attr.ib(converter=strstrip)
+    who: str = attr.ib(converter=strstrip)
+    # SAP values
+    status: str = attr.ib(default='', converter=strstrip, eq=False)
+    areawho: str = attr.ib(default='', converter=strstrip, eq=False)
+    lgtyp: str = attr.ib(default='', converter=strstrip, eq=False)
+    lgpla: str = attr.ib(default='', converter=strstrip, eq=False)
+    queue: str = attr.ib(default='', converter=strstrip, eq=False)
+    rsrc: str = attr.ib(default='', converter=strstrip, eq=False)
+    lsd: int = attr.ib(default=0, converter=int, eq=False)
+    topwhoid: str = attr.ib(default='', converter=strstrip, eq=False)
+    refwhoid: str = attr.ib(default='', converter=strstrip, eq=False)
+    flgwho: bool = attr.ib(default=False, converter=bool, eq=False)
+    flgto: bool = attr.ib(default=False, converter=bool, eq=False)
+    # Tuple of dependend SAP objects
+    warehousetasks: Tuple[FrozenWarehouseTask, ...] = attr.ib(
+        default=(), converter=freeze_warehousetasks, eq=False)
+
+    @classmethod
+    def from_mutable(cls, who: WarehouseOrder) -> 'FrozenWarehouseOrder':
+        """Create from a WarehouseOrder."""
+        return cls(**attr.asdict(who, recurse=False))
+
+    def to_mutable(self) -> WarehouseOrder:
+        """Create a WarehouseOrder."""
+        values = attr.asdict(self, recurse=False)
+        values['warehousetasks'] = [wht.to_mutable() for wht in self.warehousetasks]
+        return WarehouseOrder(**values)
+
+
 # Non SAP OData Types are starting here
 
 @attr.s
@@ -166,6 +262,35 @@ class ConfirmWarehouseTask:
             raise ValueError('Attribute "confirmationtype" must be SUCCESS or ERROR')
 
 
+@attr.s(slots=True, frozen=True)
+class FrozenConfirmWarehouseTask:
+    """
+    Slotted and immutable variant of ConfirmWarehouseTask.
+
+    Hashable by all attributes. Converters ensure the attribute types, thus only confirmation
+    number and type are validated.
+    """
+
+    lgnum: str = attr.ib(converter=strstrip)
+    tanum: str = attr.ib(converter=strstrip)
+    confirmationnumber: str = attr.ib(validator=attr.validators.in_(
+        [ConfirmWarehouseTask.FIRST_CONF, ConfirmWarehouseTask.SECOND_CONF]))
+    confirmationtype: str = attr.ib(validator=attr.validators.in_(
+        [ConfirmWarehouseTask.CONF_SUCCESS, ConfirmWarehouseTask.CONF_ERROR]))
+    confirmationdate: str = attr.ib(factory=datetime_now_iso, converter=str)
+    who: str = attr.ib(default='', converter=strstrip)
+    rsrc: str = attr.ib(default='', converter=strstrip)
+
+    @classmethod
+    def from_mutable(cls, conf: ConfirmWarehouseTask) -> 'FrozenConfirmWarehouseTask':
+        """Create from a ConfirmWarehouseTask."""
+        return cls(**attr.asdict(conf, recurse=False))
+
+    def to_mutable(self) -> ConfirmWarehouseTask:
+        """Create a ConfirmWarehouseTask."""
+        return ConfirmWarehouseTask(**attr.asdict(self, recurse=False))
+
+
 @attr.s
 class WarehouseOrderIdent:
     """Warehouse Order identitfier."""
@@ -18,6 +18,10 @@ REQUIRES = [
     'cattrs==1.9.0'
     ]
 
+EXTRAS_REQUIRE = {
+    'numpy': ['numpy']
+    }
+
 setup(
     name='robcoewmtypes',
     version='0.2.0',
@@ -28,5 +32,6 @@ setup(
     license='Apache License 2.0',
     packages=find_packages(),
     package_data={'robcoewmtypes': ['k8s-files/*']},
-    install_requires=REQUIRES
+    install_requires=REQUIRES,
+    extras_require=EXTRAS_REQUIRE
 )
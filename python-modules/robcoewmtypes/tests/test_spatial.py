@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+#
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved.
+#
+# This file is part of ewm-cloud-robotics
+# (see https://github.com/SAP/ewm-cloud-robotics).
+#
+# This file is licensed under the Apache Software License, v. 2 except as noted
+# otherwise in the LICENSE file (https://github.com/SAP/ewm-cloud-robotics/blob/main/LICENSE)
+#
+
+
+"""Tests for spatial index of storage bins."""
+
+import unittest
+
+from unittest import mock
+
+from robcoewmtypes import spatial
+from robcoewmtypes.spatial import StorageBinIndex, pairwise_distances
+from robcoewmtypes.warehouse import StorageBin
+
+
+def as_lists(matrix) -> list:
+    """Convert a numpy or list distance matrix to lists."""
+    return [list(row) for row in matrix]
+
+
+class TestPairwiseDistances(unittest.TestCase):
+    """Tests for pairwise_distances."""
+
+    def check_distances(self) -> None:
+        """Check distances and shapes of empty inputs."""
+        self.assertEqual(as_lists(pairwise_distances([(0, 0)], [(3, 4), (0, 1)])), [[5.0, 1.0]])
+        self.assertEqual(as_lists(pairwise_distances([], [(3, 4)])), [])
+        self.assertEqual(as_lists(pairwise_distances([(3, 4), (0, 1)], [])), [[], []])
+        self.assertEqual(as_lists(pairwise_distances([], [])), [])
+
+    @unittest.skipIf(spatial.np is None, 'numpy is not installed')
+    def test_numpy(self) -> None:
+        """Distances with numpy."""
+        self.check_distances()
+        self.assertEqual(pairwise_distances([(1, 2)], []).shape, (1, 0))
+
+    def test_pure_python(self) -> None:
+        """Distances without numpy."""
+        with mock.patch.object(spatial, 'np', None):
+            self.check_distances()
+
+
+class TestStorageBinIndex(unittest.TestCase):
+    """Tests for StorageBinIndex."""
+
+    def setUp(self) -> None:
+        """Create an index of some bins."""
+        self.index = StorageBinIndex([
+            StorageBin(lgnum='1710', lgpla='A', xcord=0.0, ycord=0.0),
+            StorageBin(lgnum='1710', lgpla='B', xcord=3.0, ycord=4.0)])
+
+    def test_distances(self) -> None:
+        """Distances between bins of the index."""
+        self.assertEqual(
+            as_lists(self.index.distances([('1710', 'A')], [('1710', 'B')])), [[5.0]])
+
+    def test_distances_empty(self) -> None:
+        """Distances with an empty list of bins."""
+        self.assertEqual(as_lists(self.index.distances([], [('1710', 'B')])), [])
+        self.assertEqual(as_lists(self.index.distances([('1710', 'A')], [])), [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()